@@ -18,7 +18,7 @@ from fastapi import FastAPI, HTTPException, Query
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
 
-from detector import RealtimeDetector
+from detector import RealtimeDetector, _to_native_types
 
 # Configure logging
 logging.basicConfig(
@@ -41,12 +41,38 @@ async def lifespan(app: FastAPI):
     logger.info("Starting ICS Anomaly Detection API")
     
     # Initialize detector
+    # One or more sensor logs: path, glob or comma-separated list
     log_file = os.getenv('LOG_FILE', '/data/zeek/modbus_detailed-current.log')
     model_path = os.getenv('MODEL_PATH', '/data/models/anomaly_detector.pkl')
     output_dir = os.getenv('OUTPUT_DIR', '/data/detections')
-    window_seconds = int(os.getenv('WINDOW_SECONDS', '300'))
-    poll_interval = int(os.getenv('POLL_INTERVAL', '5'))
+    # One size or several (e.g. "10,60,300"); MODEL_PATH then contains {window}
+    window_seconds = os.getenv('WINDOW_SECONDS', '300')
+    poll_interval = float(os.getenv('POLL_INTERVAL', '5'))
     anomaly_threshold = float(os.getenv('ANOMALY_THRESHOLD', '-0.5'))
+    use_inotify = os.getenv('USE_INOTIFY', 'true').lower() == 'true'
+    max_batch_bytes = int(os.getenv('MAX_BATCH_BYTES', str(8 * 1024 * 1024))) or None
+    max_batch_records = int(os.getenv('MAX_BATCH_RECORDS', '50000')) or None
+    parser = os.getenv('PARSER', 'arrow')
+    checkpoint_path = os.getenv('CHECKPOINT_PATH', '/data/detections/state/detector.ckpt') or None
+    checkpoint_interval = float(os.getenv('CHECKPOINT_INTERVAL', '30'))
+    allowed_lateness = float(os.getenv('ALLOWED_LATENESS', '10'))
+    idle_timeout = float(os.getenv('WINDOW_IDLE_TIMEOUT', '60')) or None
+    max_registers = int(os.getenv('MAX_REGISTERS', '100000')) or None
+    # Provisional alerts from open windows every N event-time seconds (0 = off)
+    early_warning_interval = float(os.getenv('EARLY_WARNING_INTERVAL', '0')) or None
+    early_warning_threshold = os.getenv('EARLY_WARNING_THRESHOLD')
+    # Check the model files for a new version every N seconds (0 = only via POST /model/reload)
+    model_reload_interval = float(os.getenv('MODEL_RELOAD_INTERVAL', '30')) or None
+    # Pipeline stages off the event loop that serves this API (thread, process or inline)
+    executor = os.getenv('DETECTION_EXECUTOR', 'thread')
+    workers = int(os.getenv('DETECTION_WORKERS', '2'))
+    pipeline_depth = int(os.getenv('PIPELINE_DEPTH', '2'))
+    # Memoize scores of repeating steady-state feature vectors (0 = off)
+    score_cache_size = int(os.getenv('SCORE_CACHE_SIZE', '0')) or None
+    score_cache_precision = float(os.getenv('SCORE_CACHE_PRECISION', '0.01'))
+    # Flag each device pair below this quantile of its own scores once it has history (0 = off)
+    adaptive_quantile = float(os.getenv('ADAPTIVE_QUANTILE', '0')) or None
+    adaptive_min_windows = int(os.getenv('ADAPTIVE_MIN_WINDOWS', '100'))
     
     detector = RealtimeDetector(
         log_file=log_file,
@@ -54,7 +80,26 @@ async def lifespan(app: FastAPI):
         output_dir=output_dir,
         window_seconds=window_seconds,
         poll_interval=poll_interval,
-        anomaly_threshold=anomaly_threshold
+        anomaly_threshold=anomaly_threshold,
+        use_inotify=use_inotify,
+        max_batch_bytes=max_batch_bytes,
+        max_batch_records=max_batch_records,
+        parser=parser,
+        checkpoint_path=checkpoint_path,
+        checkpoint_interval=checkpoint_interval,
+        allowed_lateness=allowed_lateness,
+        idle_timeout=idle_timeout,
+        max_registers=max_registers,
+        early_warning_interval=early_warning_interval,
+        early_warning_threshold=float(early_warning_threshold) if early_warning_threshold else None,
+        model_reload_interval=model_reload_interval,
+        executor=executor,
+        workers=workers,
+        pipeline_depth=pipeline_depth,
+        score_cache_size=score_cache_size,
+        score_cache_precision=score_cache_precision,
+        adaptive_quantile=adaptive_quantile,
+        adaptive_min_windows=adaptive_min_windows
     )
     
     # Start detection loop in background
@@ -105,14 +150,25 @@ class StatusResponse(BaseModel):
     anomalies_detected: int
     last_check: Optional[str]
     current_window: Optional[int]
+    startup_seconds: Optional[float] = None
+    backlog_bytes: int = 0
+    ingest_records_per_sec: float = 0.0
+    stage_seconds: Dict[str, float] = {}
+    sources: List[Dict] = []
+    windowing: Dict = {}
+    early_warnings: Optional[Dict] = None
+    pipeline: Dict = {}
 
 
 class Anomaly(BaseModel):
     """Anomaly detection result"""
     time_window: int
+    window_seconds: Optional[int] = None
     src: str
     dst: str
     anomaly_score: float
+    anomaly_threshold: Optional[float] = None
+    model_id: Optional[str] = None
     detected_at: str
     value_mean_mean: Optional[float] = None
     read_count_sum: Optional[int] = None
@@ -149,8 +205,10 @@ async def root():
             "health": "/health",
             "status": "/status",
             "current": "/anomalies/current",
+            "early_warnings": "/anomalies/early-warnings",
             "history": "/anomalies/history",
-            "stats": "/anomalies/stats"
+            "stats": "/anomalies/stats",
+            "model": "/model"
         }
     }
 
@@ -179,7 +237,15 @@ async def get_status():
         records_processed=status['records_processed'],
         anomalies_detected=status['anomalies_detected'],
         last_check=status['last_check'],
-        current_window=status['current_window']
+        current_window=status['current_window'],
+        startup_seconds=status['startup_seconds'],
+        backlog_bytes=status['backlog_bytes'],
+        ingest_records_per_sec=status['ingest_records_per_sec'],
+        stage_seconds=status['stage_seconds'],
+        sources=status['sources'],
+        windowing=status['windowing'],
+        pipeline=status['pipeline'],
+        early_warnings=status['early_warnings']
     )
 
 
@@ -199,6 +265,22 @@ async def get_current_anomalies(
     )
 
 
+@app.get("/anomalies/early-warnings", response_model=AnomaliesResponse)
+async def get_early_warnings(
+    limit: int = Query(20, ge=1, le=100, description="Number of recent early warnings")
+):
+    """Get provisional alerts from open windows and whether they were confirmed"""
+    if detector is None:
+        raise HTTPException(status_code=503, detail="Detector not initialized")
+    
+    warnings = detector.get_early_warnings(limit=limit)
+    
+    return AnomaliesResponse(
+        count=len(warnings),
+        anomalies=warnings
+    )
+
+
 @app.post("/anomalies/history", response_model=AnomaliesResponse)
 async def query_historical_anomalies(query: HistoricalQuery):
     """
@@ -257,8 +339,8 @@ async def query_historical_anomalies(query: HistoricalQuery):
         all_anomalies = all_anomalies.sort_values('detected_at', ascending=False)
         all_anomalies = all_anomalies.head(query.limit)
         
-        # Convert to list of dicts
-        results = all_anomalies.to_dict('records')
+        # Convert to list of dicts (top_registers is read back as a NumPy array)
+        results = [_to_native_types(record) for record in all_anomalies.to_dict('records')]
         
         return AnomaliesResponse(
             count=len(results),
@@ -336,6 +418,49 @@ async def get_anomaly_stats():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/model")
+async def get_model():
+    """Current and previous (rollback) model of each window size"""
+    if not detector:
+        raise HTTPException(status_code=503, detail="Detector not initialized")
+    
+    return detector.get_models()
+
+
+@app.post("/model/reload")
+async def reload_model():
+    """
+    Load the model files now and swap in a new version if it validates
+    
+    The current model keeps scoring while the new one loads; it is kept
+    for POST /model/rollback.
+    """
+    if not detector:
+        raise HTTPException(status_code=503, detail="Detector not initialized")
+    
+    return {"results": await detector.reload_models()}
+
+
+@app.post("/model/rollback")
+async def rollback_model():
+    """Swap back to the model that scored before the last reload"""
+    if not detector:
+        raise HTTPException(status_code=503, detail="Detector not initialized")
+    
+    return {"results": await detector.rollback_models()}
+
+
+@app.get("/thresholds")
+async def get_thresholds(
+    limit: int = Query(100, ge=1, le=10000, description="Device pairs per window size")
+):
+    """Per-device-pair score history and anomaly threshold under the current model"""
+    if not detector:
+        raise HTTPException(status_code=503, detail="Detector not initialized")
+    
+    return detector.get_thresholds(limit=limit)
+
+
 @app.post("/control/retrain")
 async def trigger_retraining():
     """
@@ -354,6 +479,7 @@ async def get_feature_info():
     return {
         "num_features": 28,
         "window_seconds": detector.window_seconds if detector else 300,
+        "window_sizes": detector.window_sizes if detector else [300],
         "features": [
             "value_mean_mean", "value_mean_std", "value_mean_min", "value_mean_max",
             "value_std_mean", "value_std_max",
@@ -0,0 +1,527 @@
+#!/usr/bin/env python3
+"""
+Detection Pipeline Benchmarks
+Micro-benchmarks for the hot stages of the real-time detector
+
+Usage:
+    python benchmark.py parsers --records 200000
+    python benchmark.py parsers --log /zeek/logs/modbus_detailed.log
+    python benchmark.py features --records 200000 --pairs 500 --window 60
+    python benchmark.py values --records 200000
+    python benchmark.py kernels --records 200000 --pairs 500
+    python benchmark.py scoring --model /data/models/anomaly_detector.pkl --pairs 1000
+    python benchmark.py scoring --features /data/features/features_advanced.csv
+    python benchmark.py coldstart --model /data/models/anomaly_detector.pkl
+    python benchmark.py api --model /data/models/anomaly_detector.pkl --records 200000 --pairs 500
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import pickle
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from detector import RealtimeDetector, _to_native_types
+from feature_library import RegisterAggregates, flatten_values, modbus_features, register_value
+from parity import reference_register_features
+from parsers import PARSERS, make_parser
+from models import ModelVersion
+from score_cache import ScoreCache
+import forest
+
+import modbus_kernels  # noqa: E402  (scripts/, made importable by feature_library)
+
+
+# Zeek #fields/#types for the synthetic modbus_detailed log
+SYNTHETIC_FIELDS = [
+    ('ts', 'time'), ('uid', 'string'), ('id.orig_h', 'addr'), ('id.orig_p', 'port'),
+    ('id.resp_h', 'addr'), ('id.resp_p', 'port'), ('func', 'string'),
+    ('request_response', 'string'), ('address', 'count'), ('register_start', 'count'),
+    ('quantity', 'count'), ('response_values', 'vector[count]'),
+]
+
+
+def synthetic_records(n_records: int, seed: int = 42, t0: float = 1762600000.0,
+                      n_pairs: int = 6) -> List[Dict]:
+    """Generate modbus_detailed records resembling ICSSIM HMI polling (or a scan, with many pairs)"""
+    rng = random.Random(seed)
+    pairs = [(f'192.168.0.{20 + h}', f'192.168.0.{10 + p}') for h in (1, 2, 3) for p in (1, 2)]
+    pairs += [(f'10.0.{i // 250}.{i % 250 + 1}', '192.168.0.11') for i in range(max(n_pairs - len(pairs), 0))]
+    pairs = pairs[:n_pairs]
+    records = []
+    ts = t0
+    for i in range(n_records):
+        ts += rng.expovariate(50.0)
+        src, dst = rng.choice(pairs)
+        address = rng.choice([0, 1, 2, 3, 10, 11])
+        values = [rng.randint(0, 1)] + [rng.randint(90, 110) for _ in range(rng.randint(0, 4))]
+        records.append({
+            'ts': ts,
+            'uid': f'C{i:x}',
+            'id.orig_h': src,
+            'id.orig_p': 40000 + i % 1000,
+            'id.resp_h': dst,
+            'id.resp_p': 502,
+            'func': 'READ_HOLDING_REGISTERS',
+            'request_response': 'RESPONSE',
+            'address': address,
+            'register_start': address,
+            'quantity': len(values),
+            'response_values': values,
+        })
+    return records
+
+
+def synthetic_modbus_log(n_records: int, seed: int = 42, fmt: str = 'json', n_pairs: int = 6) -> bytes:
+    """Render synthetic records as Zeek NDJSON or native TSV"""
+    records = synthetic_records(n_records, seed, n_pairs=n_pairs)
+    if fmt == 'json':
+        return ('\n'.join(json.dumps(r) for r in records) + '\n').encode()
+
+    lines = [
+        '#separator \\x09',
+        '#set_separator\t,',
+        '#empty_field\t(empty)',
+        '#unset_field\t-',
+        '#path\tmodbus_detailed',
+        '#fields\t' + '\t'.join(name for name, _ in SYNTHETIC_FIELDS),
+        '#types\t' + '\t'.join(zeek_type for _, zeek_type in SYNTHETIC_FIELDS),
+    ]
+    for r in records:
+        row = []
+        for name, _ in SYNTHETIC_FIELDS:
+            value = r[name]
+            if isinstance(value, list):
+                value = ','.join(map(str, value)) if value else '(empty)'
+            row.append(str(value))
+        lines.append('\t'.join(row))
+    return ('\n'.join(lines) + '\n').encode()
+
+
+def _time(fn, repeat: int) -> float:
+    """Best wall time of fn() over repeat runs"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_parsers(args) -> int:
+    """Compare log parsers on the same records"""
+    buffers = {}
+    if args.log:
+        data = Path(args.log).read_bytes()
+        buffers['tsv' if data.startswith(b'#') else 'json'] = data
+    else:
+        buffers['json'] = synthetic_modbus_log(args.records, fmt='json')
+        buffers['tsv'] = synthetic_modbus_log(args.records, fmt='tsv')
+
+    print(f"Best of {args.repeat} runs")
+    baseline = None
+    for name, parser_cls in PARSERS.items():
+        data = buffers.get('tsv' if name == 'tsv' else 'json')
+        if data is None:
+            continue
+        n_lines = data.count(b'\n')
+        parser = parser_cls()
+        elapsed = _time(lambda: parser.parse(data), args.repeat)
+        rate = n_lines / elapsed
+        baseline = baseline or rate
+        print(f"  {name:8s} {len(data) / 1e6:7.1f} MB {elapsed * 1000:9.1f} ms "
+              f"{rate:12,.0f} lines/s  {rate / baseline:5.1f}x")
+    return 0
+
+
+def bench_values(args) -> int:
+    """Compare register value extraction from Python lists and from Arrow list buffers"""
+    data = synthetic_modbus_log(args.records, fmt='json')
+    columns = {
+        'python lists': pd.Series([json.loads(line)['response_values'] for line in data.splitlines()]),
+        'arrow flat': make_parser('arrow').parse(data)['response_values'],
+    }
+
+    results = {name: register_value(*flatten_values(column)) for name, column in columns.items()}
+    expected = results['python lists']
+    mismatches = sum(int(np.sum(values != expected)) for values in results.values())
+    print(f"{args.records:,} records; {mismatches} mismatching register values")
+
+    print(f"Best of {args.repeat} runs")
+    baseline = None
+    for name, column in columns.items():
+        elapsed = _time(lambda: register_value(*flatten_values(column)), args.repeat)
+        rate = len(column) / elapsed
+        baseline = baseline or rate
+        memory = column.memory_usage(deep=True, index=False)
+        print(f"  {name:12s} {elapsed * 1000:9.1f} ms {rate:12,.0f} records/s  {rate / baseline:5.1f}x"
+              f"  {memory / 1e6:7.1f} MB")
+    return 0 if mismatches == 0 else 1
+
+
+def bench_kernels(args) -> int:
+    """Compare the NumPy and Numba register value kernels on the histogram of one window"""
+    data = make_parser('arrow').parse(synthetic_modbus_log(args.records, fmt='json', n_pairs=args.pairs))
+    aggregates = _vectorized_features_state(data, args.window)
+    hist_rows, hist_values, hist_counts = aggregates._compact()
+    reads = aggregates.columns['reads']
+    arguments = (hist_rows, hist_values, hist_counts, reads,
+                 modbus_features.ENTROPY_BINS, modbus_features.OUTLIER_MIN_READS)
+
+    kernels = {'numpy': modbus_kernels.histogram_stats_numpy}
+    if modbus_kernels.numba is not None:
+        kernels['numba'] = modbus_kernels.histogram_stats_numba
+        modbus_kernels.histogram_stats_numba(*arguments)  # Compile outside the timing
+    else:
+        print("Numba is not installed, timing the NumPy kernel only")
+
+    expected = kernels['numpy'](*arguments)
+    worst = 0.0
+    for kernel in kernels.values():
+        result = kernel(*arguments)
+        for name in modbus_kernels.STAT_NAMES:
+            x, y = expected[name], result[name]
+            finite = np.isfinite(x)
+            if not np.array_equal(finite, np.isfinite(y)):
+                worst = float('inf')
+                continue
+            diff = np.abs(x[finite] - y[finite]) / np.maximum(np.abs(x[finite]), 1.0)
+            worst = max(worst, float(diff.max()) if len(diff) else 0.0)
+    print(f"{len(data):,} records, {len(reads):,} registers, {len(hist_rows):,} histogram entries; "
+          f"max relative difference {worst:.2e}")
+
+    print(f"Best of {args.repeat} runs")
+    baseline = None
+    for name, kernel in kernels.items():
+        elapsed = _time(lambda: kernel(*arguments), args.repeat)
+        rate = len(reads) / elapsed
+        baseline = baseline or rate
+        print(f"  {name:8s} {elapsed * 1000:9.2f} ms {rate:12,.0f} registers/s  {rate / baseline:5.1f}x")
+    return 0 if worst < 1e-9 else 1
+
+
+def _reference_features(data, window_seconds: int):
+    """Group-by-register loop, as the training pipeline originally computed features"""
+    return reference_register_features(data.rename(columns={'src': 'id.orig_h', 'dst': 'id.resp_h'}),
+                                       window_seconds)
+
+
+def _vectorized_features_state(data, window_seconds: int, batch_records: int = 50000) -> RegisterAggregates:
+    """Fold records batch by batch into RegisterAggregates, as the detector does"""
+    aggregates = RegisterAggregates()
+    for start in range(0, len(data), batch_records):
+        batch = data.iloc[start:start + batch_records]
+        ts = batch['ts'].to_numpy(dtype=np.float64)
+        aggregates.update(np.floor_divide(ts, window_seconds).astype(np.int64),
+                          batch['src'].to_numpy(), batch['dst'].to_numpy(),
+                          batch['address'].to_numpy(dtype=np.float64), ts,
+                          register_value(*flatten_values(batch['response_values'])))
+    return aggregates
+
+
+def _vectorized_features(data, window_seconds: int, batch_records: int):
+    """Batch-wise aggregation with RegisterAggregates, as the detector does"""
+    return _vectorized_features_state(data, window_seconds, batch_records).features(window_seconds)
+
+
+def bench_features(args) -> int:
+    """Compare the per-register loop and vectorized register features on the same records"""
+    data = make_parser('arrow').parse(synthetic_modbus_log(args.records, fmt='json', n_pairs=args.pairs))
+    # Some reads without response values
+    data.loc[data.index % 97 == 0, 'response_values'] = None
+
+    keys = ['time_window', 'src', 'dst', 'address']
+    reference = _reference_features(data, args.window).sort_values(keys, ignore_index=True)
+    vectorized = _vectorized_features(data, args.window, args.batch_records).sort_values(keys, ignore_index=True)
+    if len(reference) != len(vectorized):
+        print(f"Row count differs: {len(reference)} reference vs {len(vectorized)} vectorized")
+        return 1
+    expected = reference[modbus_features.REGISTER_FEATURES].to_numpy(dtype=np.float64)
+    actual = vectorized[modbus_features.REGISTER_FEATURES].to_numpy(dtype=np.float64)
+    worst = float(np.max(np.abs(actual - expected) / np.maximum(np.abs(expected), 1.0))) if len(reference) else 0.0
+    print(f"{len(data):,} records, {len(reference)} registers; max relative difference {worst:.2e}")
+
+    print(f"Best of {args.repeat} runs")
+    baseline = None
+    for name, fn in (('per-register', lambda: _reference_features(data, args.window)),
+                     ('vectorized', lambda: _vectorized_features(data, args.window, args.batch_records))):
+        elapsed = _time(fn, args.repeat)
+        rate = len(data) / elapsed
+        baseline = baseline or rate
+        print(f"  {name:12s} {elapsed * 1000:9.1f} ms {rate:12,.0f} records/s  {rate / baseline:5.1f}x")
+    return 0 if worst < 1e-9 else 1
+
+
+def _compiled_scorer(compiled: forest.CompiledForest, use_numba: bool):
+    """score_samples of the compiled forest with a fixed kernel"""
+    def score(X):
+        forest.USE_NUMBA = use_numba
+        return compiled.score_samples(X)
+    return score
+
+
+def bench_scoring(args) -> int:
+    """Compare sklearn scoring (per pair and batched) with the compiled forest on one cycle's features"""
+    path = forest.compiled_model_path(args.model)
+    if not path.exists():
+        print(f"No compiled forest at {path}; export it with train_model.py --export-only {args.model}")
+        return 1
+    start = time.perf_counter()
+    compiled = forest.CompiledForest.load(path)
+    print(f"Compiled forest loaded in {(time.perf_counter() - start) * 1000:.1f} ms: "
+          f"{compiled.n_trees} trees, {compiled.n_nodes:,} nodes")
+
+    if args.features:
+        # Training features, prepared as train_model.py does
+        X = pd.read_csv(args.features)[compiled.feature_names].to_numpy(dtype=np.float64)
+        X = np.nan_to_num(X, nan=0.0, posinf=1e6, neginf=-1e6)
+        args.pairs = len(X)
+    else:
+        rng = np.random.default_rng(42)
+        # Feature vectors around the scaler's training distribution
+        X = rng.normal(compiled.mean, compiled.scale, size=(args.pairs, len(compiled.feature_names)))
+
+    scorers = {}
+    try:
+        start = time.perf_counter()
+        with open(args.model, 'rb') as f:
+            model_data = pickle.load(f)
+        print(f"sklearn model unpickled in {(time.perf_counter() - start) * 1000:.1f} ms")
+        model, scaler = model_data['model'], model_data['scaler']
+        scorers['sklearn per-pair'] = lambda X: np.array(
+            [model.score_samples(scaler.transform(row.reshape(1, -1)))[0] for row in X]
+        )
+        scorers['sklearn batched'] = lambda X: model.score_samples(scaler.transform(X))
+    except ImportError:
+        print("scikit-learn is not installed, timing the compiled forest only")
+    scorers['compiled numpy'] = _compiled_scorer(compiled, False)
+    if forest.numba is not None:
+        scorers['compiled numba'] = _compiled_scorer(compiled, True)
+        scorers['compiled numba'](X[:1])  # Compile outside the timing
+
+    expected = next(iter(scorers.values()))(X)
+    worst = max(float(np.max(np.abs(score(X) - expected))) for score in scorers.values())
+    print(f"{args.pairs:,} device pairs, {len(compiled.feature_names)} features; max difference {worst:.2e}")
+
+    # Score cache with the fastest kernel: every vector new, and every vector seen before
+    forest.USE_NUMBA = forest.numba is not None
+    version = ModelVersion(path, compiled.feature_names, compiled.model_id, forest=compiled)
+
+    def cache_misses(X):
+        cache = ScoreCache(len(X), args.cache_precision)
+        cache.invalidate(version.model_id)
+        return cache.score(version, X)
+    warm = ScoreCache(len(X), args.cache_precision)
+    warm.invalidate(version.model_id)
+    cache_misses(X)
+    warm.score(version, X)
+    scorers['cache misses'] = cache_misses
+    scorers['cache hits'] = lambda X: warm.score(version, X)
+    cached = float(np.max(np.abs(warm.score(version, X) - expected)))
+    print(f"Score cache at {args.cache_precision:g} std: {warm.get_status()['entries']:,} "
+          f"cells for {args.pairs:,} vectors; max difference {cached:.2e}")
+
+    print(f"Best of {args.repeat} runs")
+    baseline = None
+    for name, score in scorers.items():
+        elapsed = _time(lambda: score(X), args.repeat)
+        rate = args.pairs / elapsed
+        baseline = baseline or rate
+        print(f"  {name:16s} {elapsed * 1000:9.1f} ms {rate:12,.0f} pairs/s  {rate / baseline:6.1f}x")
+    forest.USE_NUMBA = forest.numba is not None
+    return 0 if worst < 1e-9 else 1
+
+
+# Run in a fresh interpreter: imports, model loading and detector setup
+_COLDSTART_SCRIPT = """
+import logging, sys, time
+start = time.perf_counter()
+logging.disable(logging.CRITICAL)
+from detector import RealtimeDetector
+imported = time.perf_counter()
+RealtimeDetector(log_file=sys.argv[1], model_path=sys.argv[2], output_dir=sys.argv[3], use_inotify=False)
+print(imported - start, time.perf_counter() - imported)
+"""
+
+
+def bench_coldstart(args) -> int:
+    """Time detector cold start (fresh process) with the compiled forest and with the sklearn pickle"""
+    workdir = Path(tempfile.mkdtemp(prefix='coldstart_'))
+    try:
+        log_file = workdir / 'modbus_detailed.log'
+        log_file.write_bytes(b'')
+        # The pickle alone, without a compiled forest next to it
+        pickle_only = workdir / 'pickle' / Path(args.model).name
+        pickle_only.parent.mkdir()
+        shutil.copy(args.model, pickle_only)
+
+        models = {'compiled': args.model, 'pickle': str(pickle_only)}
+        print(f"Best of {args.repeat} fresh processes")
+        for name, model in models.items():
+            if name == 'compiled' and not forest.compiled_model_path(model).exists():
+                print(f"  {name:10s} no compiled forest at {forest.compiled_model_path(model)}")
+                continue
+            runs = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                result = subprocess.run(
+                    [sys.executable, '-c', _COLDSTART_SCRIPT, str(log_file), model, str(workdir / 'out')],
+                    cwd=Path(__file__).parent, capture_output=True, text=True
+                )
+                total = time.perf_counter() - start
+                if result.returncode != 0:
+                    print(f"  {name:10s} failed: {result.stderr.strip().splitlines()[-1]}")
+                    break
+                imports, setup = map(float, result.stdout.split())
+                runs.append((total, imports, setup))
+            if runs:
+                total, imports, setup = min(runs)
+                print(f"  {name:10s} {total * 1000:8.0f} ms process  "
+                      f"{imports * 1000:7.0f} ms imports  {setup * 1000:7.0f} ms detector setup")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+def _status_client(loop: asyncio.AbstractEventLoop, request, done: threading.Event,
+                   interval: float, latencies: List[float]):
+    """Client thread: send requests to the event loop at a fixed rate and time the replies"""
+    while not done.is_set():
+        start = time.perf_counter()
+        asyncio.run_coroutine_threadsafe(request(), loop).result()
+        latencies.append(time.perf_counter() - start)
+        time.sleep(interval)
+
+
+async def _api_latency_run(executor: str, data: bytes, args, workdir: Path) -> Dict:
+    """Run the log through a detector while a client polls its status on the same event loop"""
+    logging_level = logging.getLogger().level
+    logging.getLogger().setLevel(logging.ERROR)
+    detector = RealtimeDetector(
+        log_file=str(workdir / 'modbus_detailed.log'), model_path=args.model, output_dir=str(workdir / executor),
+        window_seconds=args.window, use_inotify=False, idle_timeout=None, executor=executor, workers=args.workers
+    )
+    source = detector.sources[0]
+    lines = data.splitlines(keepends=True)
+
+    async def status():
+        # What GET /status does
+        return json.dumps(_to_native_types(detector.get_status()))
+
+    latencies = []
+    done = threading.Event()
+    client = threading.Thread(target=_status_client,
+                              args=(asyncio.get_running_loop(), status, done, args.interval / 1000, latencies))
+    client.start()
+    start = time.perf_counter()
+    try:
+        for i in range(0, len(lines), args.batch_records):
+            batch = await detector.pools.parse(source, b''.join(lines[i:i + args.batch_records]))
+            await detector.process_batch(batch)
+        await detector.flush_windows()
+        elapsed = time.perf_counter() - start
+    finally:
+        done.set()
+        await asyncio.to_thread(client.join)
+        detector.pools.shutdown()
+        logging.getLogger().setLevel(logging_level)
+
+    latencies = np.array(latencies) * 1000
+    return {
+        'records_per_sec': len(lines) / elapsed,
+        'requests': len(latencies),
+        'p50': np.percentile(latencies, 50),
+        'p99': np.percentile(latencies, 99),
+        'max': latencies.max(),
+    }
+
+
+def bench_api(args) -> int:
+    """API latency during heavy detection cycles, stages on the event loop vs in worker pools"""
+    data = synthetic_modbus_log(args.records, n_pairs=args.pairs)
+    workdir = Path(tempfile.mkdtemp(prefix='api_latency_'))
+    try:
+        print(f"{args.records:,} records, {args.pairs} device pairs, {args.window}s windows, "
+              f"{args.batch_records:,} records per cycle, status request every {args.interval:g} ms")
+        for executor in args.executors.split(','):
+            result = asyncio.run(_api_latency_run(executor, data, args, workdir))
+            print(f"  {executor:8s} {result['records_per_sec']:>10,.0f} rec/s  {result['requests']:6d} requests  "
+                  f"p50 {result['p50']:7.1f} ms  p99 {result['p99']:7.1f} ms  max {result['max']:7.1f} ms")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark detection pipeline stages')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    p = subparsers.add_parser('parsers', help='Log line parsers (json vs arrow vs tsv)')
+    p.add_argument('--records', type=int, default=200000, help='Synthetic records to generate')
+    p.add_argument('--log', help='Use an existing modbus_detailed log (JSON or TSV) instead')
+    p.add_argument('--repeat', type=int, default=3, help='Runs per parser (best is reported)')
+    p.set_defaults(func=bench_parsers)
+
+    p = subparsers.add_parser('values', help='response_values flattening (Python lists vs Arrow buffers)')
+    p.add_argument('--records', type=int, default=200000, help='Synthetic records to generate')
+    p.add_argument('--repeat', type=int, default=3, help='Runs per representation (best is reported)')
+    p.set_defaults(func=bench_values)
+
+    p = subparsers.add_parser('kernels', help='Register value statistics (NumPy vs Numba kernel)')
+    p.add_argument('--records', type=int, default=200000, help='Synthetic records to generate')
+    p.add_argument('--pairs', type=int, default=500, help='Device pairs (more pairs = more registers)')
+    p.add_argument('--window', type=int, default=300, help='Time window in seconds')
+    p.add_argument('--repeat', type=int, default=5, help='Runs per kernel (best is reported)')
+    p.set_defaults(func=bench_kernels)
+
+    p = subparsers.add_parser('features', help='Register feature extraction (per-register loop vs vectorized)')
+    p.add_argument('--records', type=int, default=200000, help='Synthetic records to generate')
+    p.add_argument('--window', type=int, default=300, help='Time window in seconds')
+    p.add_argument('--pairs', type=int, default=6, help='Device pairs (raise to simulate a scan)')
+    p.add_argument('--batch-records', type=int, default=50000, help='Records per vectorized batch')
+    p.add_argument('--repeat', type=int, default=3, help='Runs per implementation (best is reported)')
+    p.set_defaults(func=bench_features)
+
+    p = subparsers.add_parser('scoring', help='Model scoring (sklearn per pair / batched vs compiled forest)')
+    p.add_argument('--model', default='/data/models/anomaly_detector.pkl', help='Trained model')
+    p.add_argument('--pairs', type=int, default=1000, help='Device pair feature vectors to score')
+    p.add_argument('--features', help='Score a features CSV (e.g. the training features) instead')
+    p.add_argument('--cache-precision', type=float, default=0.01,
+                   help='Score cache cell width in training standard deviations')
+    p.add_argument('--repeat', type=int, default=3, help='Runs per implementation (best is reported)')
+    p.set_defaults(func=bench_scoring)
+
+    p = subparsers.add_parser('coldstart', help='Detector cold start (compiled forest vs sklearn pickle)')
+    p.add_argument('--model', default='/data/models/anomaly_detector.pkl', help='Trained model')
+    p.add_argument('--repeat', type=int, default=3, help='Fresh processes per model (best is reported)')
+    p.set_defaults(func=bench_coldstart)
+
+    p = subparsers.add_parser('api', help='Status latency during detection cycles (inline vs worker pools)')
+    p.add_argument('--model', default='/data/models/anomaly_detector.pkl', help='Trained model')
+    p.add_argument('--records', type=int, default=200000, help='Synthetic records to generate')
+    p.add_argument('--pairs', type=int, default=500, help='Device pairs (more pairs = heavier cycles)')
+    p.add_argument('--window', type=int, default=60, help='Time window in seconds')
+    p.add_argument('--batch-records', type=int, default=50000, help='Records per detection cycle')
+    p.add_argument('--executors', default='inline,thread,process', help='Executors to compare')
+    p.add_argument('--workers', type=int, default=2, help='Worker threads/processes per pool')
+    p.add_argument('--interval', type=float, default=10, help='Milliseconds between status requests')
+    p.set_defaults(func=bench_api)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
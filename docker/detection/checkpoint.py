@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Detector Checkpointing
+Periodic atomic snapshots of detector state so restarts resume warm
+
+A snapshot is data only, never pickled objects: a zip archive in NumPy's
+.npz layout with a JSON manifest of the state tree and one .npy member per
+array, read back with allow_pickle=False. Each component rebuilds its
+objects from that data on restore, so whoever can write the state volume
+can at worst corrupt the history, not run code in the detector.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+CHECKPOINT_VERSION = 13
+
+MANIFEST = 'manifest.json'
+ARRAY_KEY = '__array__'  # Manifest placeholder {ARRAY_KEY: member name} for an array
+
+
+def _encode(value, arrays: Dict[str, np.ndarray]):
+    """JSON-compatible copy of a state tree, with its arrays moved into arrays"""
+    if isinstance(value, np.ndarray):
+        if value.dtype.hasobject:
+            raise TypeError("Object arrays cannot be checkpointed")
+        name = f'a{len(arrays)}'
+        arrays[name] = value
+        return {ARRAY_KEY: name}
+    if isinstance(value, dict):
+        if not all(isinstance(key, str) for key in value):
+            raise TypeError(f"Checkpoint keys must be strings: {list(value)[:5]}")
+        return {key: _encode(item, arrays) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(item, arrays) for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    raise TypeError(f"Cannot checkpoint a {type(value).__name__}")
+
+
+def _decode(value, arrays: Dict[str, np.ndarray]):
+    """Inverse of _encode (tuples come back as lists)"""
+    if isinstance(value, dict):
+        if list(value) == [ARRAY_KEY]:
+            return arrays[value[ARRAY_KEY]]
+        return {key: _decode(item, arrays) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_decode(item, arrays) for item in value]
+    return value
+
+
+class CheckpointStore:
+    """Write and read detector state snapshots atomically"""
+
+    def __init__(self, path: str, interval: float = 30.0):
+        """
+        Initialize the store
+
+        Args:
+            path: Snapshot file (written via temp file + rename)
+            interval: Minimum seconds between periodic snapshots
+        """
+        self.path = Path(path)
+        self.interval = interval
+        self.last_saved = time.monotonic()
+        self.logger = logging.getLogger(__name__)
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def due(self) -> bool:
+        """Whether a periodic snapshot should be taken now"""
+        return time.monotonic() - self.last_saved >= self.interval
+
+    def save(self, state: Dict):
+        """
+        Atomically replace the snapshot with state
+
+        Args:
+            state: Tree of dicts (string keys), lists, scalars and non-object
+                   NumPy arrays
+        """
+        start = time.perf_counter()
+        arrays: Dict[str, np.ndarray] = {}
+        manifest = json.dumps({'version': CHECKPOINT_VERSION, **_encode(state, arrays)})
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, prefix=f'.{self.path.name}.')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                with zipfile.ZipFile(f, 'w') as archive:
+                    archive.writestr(MANIFEST, manifest)
+                    for name, array in arrays.items():
+                        with archive.open(f'{name}.npy', 'w', force_zip64=True) as member:
+                            np.lib.format.write_array(member, np.ascontiguousarray(array), allow_pickle=False)
+                f.flush()
+                os.fsync(f.fileno())
+                size = f.tell()
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        self.last_saved = time.monotonic()
+        self.logger.debug(
+            f"Checkpoint saved: {size / 1024:.1f} KB ({len(arrays)} arrays) in "
+            f"{(time.perf_counter() - start) * 1000:.1f} ms"
+        )
+
+    def load(self) -> Optional[Dict]:
+        """Read the latest snapshot, or None if missing/unreadable/incompatible"""
+        if not self.path.exists():
+            return None
+        try:
+            with zipfile.ZipFile(self.path) as archive:
+                manifest = json.loads(archive.read(MANIFEST))
+                if manifest.get('version') != CHECKPOINT_VERSION:
+                    self.logger.warning(f"Ignoring checkpoint version {manifest.get('version')}")
+                    return None
+                arrays = {}
+                for name in archive.namelist():
+                    if name.endswith('.npy'):
+                        with archive.open(name) as member:
+                            arrays[name[:-len('.npy')]] = np.lib.format.read_array(member, allow_pickle=False)
+            return _decode(manifest, arrays)
+        except Exception as e:
+            # Includes snapshots in the old pickle format, which are never unpickled
+            self.logger.warning(f"Ignoring unreadable checkpoint {self.path}: {e}")
+            return None
@@ -7,17 +7,29 @@ Monitors Zeek logs and detects anomalies using Isolation Forest with temporal fe
 import asyncio
 import logging
 import os
-import pickle
+import threading
 import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
 import pandas as pd
 import pyarrow as pa
 import pyarrow.parquet as pq
 
+from checkpoint import CheckpointStore
+from early_warning import EarlyWarnings
+from executors import StagePools
+from feature_library import RegisterAggregates
+from models import ModelVersion, load_model_version, model_fingerprint
+from resolutions import WindowResolution, model_path_for, parse_window_sizes
+from sources import LogSource, expand_log_paths
+from windowing import window_records
+
 
 def _to_native_types(obj):
     """Convert numpy types to native Python types for JSON serialization"""
@@ -35,70 +47,224 @@ def _to_native_types(obj):
     return obj
 
 
+def write_anomalies(output_dir: Path, anomalies: List[Dict]) -> Path:
+    """
+    Write the anomalies of one scored window to a new Parquet file
+    
+    The name carries the wall-clock second, window size and window id plus a
+    random suffix: replay and backlog catch-up save many windows per second,
+    and a file must never replace an earlier one.
+    """
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    first = anomalies[0]
+    output_file = Path(output_dir) / (
+        f"anomalies_{timestamp}_{first['window_seconds']}s_{first['time_window']}_{uuid.uuid4().hex[:8]}.parquet"
+    )
+    pq.write_table(pa.Table.from_pandas(pd.DataFrame(anomalies)), output_file)
+    return output_file
+
+
 class RealtimeDetector:
     """Real-time anomaly detection engine with temporal feature support"""
     
     def __init__(self,
-                 log_file: str,
+                 log_file: Union[str, Sequence[str]],
                  model_path: str,
                  output_dir: str,
-                 window_seconds: int = 300,
-                 poll_interval: int = 5,
-                 anomaly_threshold: float = -0.5):
+                 window_seconds: Union[int, str, Sequence[int]] = 300,
+                 poll_interval: float = 5,
+                 anomaly_threshold: float = -0.5,
+                 use_inotify: bool = True,
+                 max_batch_bytes: Optional[int] = 8 * 1024 * 1024,
+                 max_batch_records: Optional[int] = 50000,
+                 parser: str = 'arrow',
+                 checkpoint_path: Optional[str] = None,
+                 checkpoint_interval: float = 30.0,
+                 allowed_lateness: float = 10.0,
+                 idle_timeout: Optional[float] = 60.0,
+                 max_registers: Optional[int] = 100000,
+                 early_warning_interval: Optional[float] = None,
+                 early_warning_threshold: Optional[float] = None,
+                 model_reload_interval: Optional[float] = 30.0,
+                 executor: str = 'thread',
+                 workers: int = 2,
+                 pipeline_depth: int = 2,
+                 score_cache_size: Optional[int] = None,
+                 score_cache_precision: float = 0.01,
+                 adaptive_quantile: Optional[float] = None,
+                 adaptive_min_windows: int = 100):
         """
         Initialize the detector
         
         Args:
-            log_file: Path to Zeek Modbus log file
-            model_path: Path to trained model pickle file
+            log_file: Zeek Modbus log file(s): a path, glob, comma-separated list or
+                      sequence of those; all sources share one windowing state
+            model_path: Path to trained model pickle file; with several window sizes
+                        it must contain {window}, replaced by each size in seconds
             output_dir: Directory to save detected anomalies
-            window_seconds: Time window size in seconds
-            poll_interval: How often to check for new data (seconds)
+            window_seconds: Time window size in seconds, or several sizes (e.g. "10,60,300")
+                            scored side by side from the same parsed records
+            poll_interval: Longest wait between checks for new data (seconds)
             anomaly_threshold: Threshold for anomaly detection
+            use_inotify: Wake on file events instead of polling when available
+            max_batch_bytes: Max bytes read from the log per batch (None = unbounded)
+            max_batch_records: Max records handed to the pipeline per batch (None = unbounded)
+            parser: Log line parser ('arrow' columnar JSON fast path, 'json' reference,
+                    or 'tsv' for Zeek's native tab-separated format)
+            checkpoint_path: State snapshot file for warm restarts (None = disabled)
+            checkpoint_interval: Seconds between periodic snapshots
+            allowed_lateness: Event-time slack (seconds) for out-of-order records before a
+                              window closes; with several sources the watermark follows
+                              the slowest one that delivered records within idle_timeout
+            idle_timeout: Close open windows after this many seconds without records
+                          (None = wait for newer records)
+            max_registers: (pair, register) entries tracked per open window; beyond
+                           this, registers with too few reads to be scored are evicted
+                           (None = unbounded)
+            early_warning_interval: Event-time seconds between scorings of still-open
+                                    windows for provisional alerts (None = disabled)
+            early_warning_threshold: Score below which an open window raises a provisional
+                                     alert (None = anomaly_threshold - 0.1)
+            model_reload_interval: Seconds between checks of the model files for a new
+                                   version to hot-swap (None = only on reload_models())
+            executor: Where CPU-heavy stages run: 'thread' pools, 'process' (parsing in
+                      worker processes) or 'inline' on the event loop (see executors.py)
+            workers: Threads (or processes) for reading/parsing and for scoring each
+            pipeline_depth: Featurized cycles queued for the scoring stage before the
+                            feature stage waits
+            score_cache_size: Scores cached per window size for repeating feature vectors
+                              (None = every vector is scored)
+            score_cache_precision: Score cache cell width in training standard deviations
+            adaptive_quantile: Flag a device pair below this quantile of its own score history
+                               instead of anomaly_threshold once it has adaptive_min_windows
+                               scored windows under the current model (None = disabled)
+            adaptive_min_windows: Scored windows a pair needs before its quantile applies
         """
-        self.log_file = Path(log_file)
-        self.model_path = Path(model_path)
+        init_start = time.perf_counter()
+        self.log_files = expand_log_paths(log_file)
+        self.model_path = model_path
         self.output_dir = Path(output_dir)
-        self.window_seconds = window_seconds
+        self.window_sizes = parse_window_sizes(window_seconds)
+        self.window_seconds = self.window_sizes[0]  # Primary resolution
         self.poll_interval = poll_interval
         self.anomaly_threshold = anomaly_threshold
+        self.max_batch_bytes = max_batch_bytes
+        self.max_batch_records = max_batch_records
+        self.model_reload_interval = model_reload_interval
+        self.pipeline_depth = pipeline_depth
         
         # Create output directory
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
         # State tracking
         self.running = False
-        # Start reading from end of file to avoid processing old data
-        self.last_position = self.log_file.stat().st_size if self.log_file.exists() else 0
+        self.sources = [
+            LogSource(path, parser=parser, poll_interval=poll_interval, use_inotify=use_inotify)
+            for path in self.log_files
+        ]
+        self._batches: Optional[asyncio.Queue] = None
+        self._cycles: Optional[asyncio.Queue] = None  # Featurized cycles for the scoring stage
+        self._cycle_lock = asyncio.Lock()  # Held while a cycle is featurized and queued
+        self._tail_tasks: List[asyncio.Task] = []
+        self.pools = StagePools(executor, workers)
         self.records_processed = 0
+        self.ingest_rate = 0.0  # records/s over the last detection cycle
         self.anomalies_detected = 0
         self.started_at = None
         self.last_check = None
-        self.current_window = None
         self.recent_anomalies: List[Dict] = []
-        self.window_history: Dict[str, List[Dict]] = {}  # Track window history for temporal features
+        self.stage_seconds: Dict[str, float] = defaultdict(float)  # Cumulative time per pipeline stage
+        self._stage_lock = threading.Lock()  # Stages are timed from worker threads
+        self._model_lock = asyncio.Lock()  # One model reload or rollback at a time
         
         # Setup logging
         self.logger = logging.getLogger(__name__)
         
-        # Load model
-        self.logger.info(f"Loading model from {model_path}")
-        self._load_model()
+        # One set of windows, temporal history and model per window size
+        self.resolutions = []
+        for size in self.window_sizes:
+            path = model_path_for(model_path, size, len(self.window_sizes))
+            self.logger.info(f"Loading model for {size}s windows from {path}")
+            self.resolutions.append(WindowResolution(size, path, allowed_lateness, idle_timeout, max_registers,
+                                                     score_cache_size, score_cache_precision,
+                                                     adaptive_quantile, adaptive_min_windows))
+            if len(self.sources) > 1:
+                # A sensor log that lags behind holds windows open instead of losing its records
+                self.resolutions[-1].windower.expect_sources([source.name for source in self.sources])
+        
+        # Provisional alerts from partial windows, confirmed or retracted at close
+        self.early_warnings = None
+        if early_warning_interval:
+            if early_warning_threshold is None:
+                early_warning_threshold = anomaly_threshold - 0.1
+            self.early_warnings = EarlyWarnings(early_warning_interval, early_warning_threshold)
+        
+        # Resume from the last checkpoint instead of skipping to end of file
+        self.checkpoint = CheckpointStore(checkpoint_path, checkpoint_interval) if checkpoint_path else None
+        if self.checkpoint:
+            self._restore_checkpoint()
+        
+        # Model loading and checkpoint restore (module imports not included)
+        self.startup_seconds = time.perf_counter() - init_start
+        self.logger.info(f"Detector initialized in {self.startup_seconds * 1000:.0f} ms")
+    
+    @property
+    def current_window(self) -> Optional[int]:
+        """Last scored window of the primary resolution"""
+        return self.resolutions[0].current_window
     
-    def _load_model(self):
-        """Load the trained anomaly detection model"""
+    def _checkpoint_state(self) -> Dict:
+        """Everything needed to resume exactly where processing stopped"""
+        return {
+            'saved_at': time.time(),
+            'tailers': {source.name: source.committed_state for source in self.sources},
+            'records_processed': self.records_processed,
+            'anomalies_detected': self.anomalies_detected,
+            'recent_anomalies': self.recent_anomalies,
+            'resolutions': [[resolution.window_seconds, resolution.state()] for resolution in self.resolutions],
+            'early_warnings': self.early_warnings.state() if self.early_warnings else None,
+        }
+    
+    def _restore_checkpoint(self):
+        """Load the last checkpoint, if any, into detector state"""
+        state = self.checkpoint.load()
+        if state is None:
+            self.logger.info("No checkpoint found, starting fresh")
+            return
+        
+        for source in self.sources:
+            if source.name in state['tailers']:
+                source.tailer.restore(state['tailers'][source.name])
+                source.committed_state = source.tailer.state()
+        self.records_processed = state['records_processed']
+        self.anomalies_detected = state['anomalies_detected']
+        self.recent_anomalies = state['recent_anomalies']
+        saved = {window_seconds: resolution_state for window_seconds, resolution_state in state['resolutions']}
+        for resolution in self.resolutions:
+            # A newly added window size starts without history
+            if resolution.window_seconds in saved:
+                resolution.restore(saved[resolution.window_seconds])
+        if self.early_warnings and state['early_warnings']:
+            self.early_warnings.restore(state['early_warnings'])
+        
+        age = time.time() - state['saved_at']
+        self.logger.info(
+            f"Restored checkpoint from {age:.0f}s ago: {len(state['tailers'])} source offsets, "
+            + ", ".join(
+                f"{r.name}: {len(r.temporal_context)} device pairs of history, "
+                f"{len(r.windower.open_windows)} open windows"
+                for r in self.resolutions
+            )
+        )
+    
+    def save_checkpoint(self):
+        """Write a checkpoint now"""
+        if self.checkpoint is None:
+            return
         try:
-            with open(self.model_path, 'rb') as f:
-                model_data = pickle.load(f)
-            
-            self.model = model_data['model']
-            self.scaler = model_data['scaler']
-            self.feature_columns = model_data['feature_columns']
-            
-            self.logger.info(f"Model loaded successfully: {len(self.feature_columns)} features")
+            self.checkpoint.save(self._checkpoint_state())
         except Exception as e:
-            self.logger.error(f"Failed to load model: {e}")
-            raise
+            self.logger.error(f"Failed to save checkpoint: {e}", exc_info=True)
     
     def get_status(self) -> Dict:
         """Get current detector status"""
@@ -108,382 +274,505 @@ class RealtimeDetector:
             'records_processed': self.records_processed,
             'anomalies_detected': self.anomalies_detected,
             'last_check': self.last_check.isoformat() if self.last_check else None,
-            'current_window': self.current_window
+            'current_window': self.current_window,
+            'startup_seconds': round(self.startup_seconds, 3),
+            'event_driven': all(source.tailer.event_driven for source in self.sources),
+            'log_rotations': sum(source.tailer.rotations for source in self.sources),
+            'backlog_bytes': sum(source.tailer.backlog_bytes for source in self.sources),
+            'sources': [source.get_status() for source in self.sources],
+            'windowing': {resolution.name: resolution.get_status() for resolution in self.resolutions},
+            'early_warnings': self.early_warnings.get_status() if self.early_warnings else None,
+            'ingest_records_per_sec': round(self.ingest_rate, 1),
+            'pipeline': {**self.pools.get_status(),
+                         'queued_cycles': self._cycles.qsize() if self._cycles else 0},
+            'stage_seconds': self.get_stage_timings()
         }
     
+    @contextmanager
+    def _stage(self, name: str):
+        """Accumulate wall time spent in a pipeline stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._stage_lock:
+                self.stage_seconds[name] += elapsed
+    
+    async def _run_stage(self, pool: str, stage: str, fn, *args):
+        """Run fn(*args) in a worker pool, timed as stage in the worker"""
+        def timed():
+            with self._stage(stage):
+                return fn(*args)
+        return await self.pools.run(pool, timed)
+    
+    def get_stage_timings(self) -> Dict[str, float]:
+        """Cumulative seconds spent per pipeline stage"""
+        with self._stage_lock:
+            return {stage: round(seconds, 4) for stage, seconds in self.stage_seconds.items()}
+    
     def get_recent_anomalies(self, limit: int = 20) -> List[Dict]:
         """Get most recent anomalies from memory"""
         anomalies = self.recent_anomalies[-limit:]
         return [_to_native_types(a) for a in anomalies]
     
+    def get_early_warnings(self, limit: int = 20) -> List[Dict]:
+        """Get most recent provisional alerts and their outcome"""
+        if self.early_warnings is None:
+            return []
+        return [_to_native_types(a) for a in self.early_warnings.recent[-limit:]]
+    
     async def start(self):
         """Start the detection engine"""
         self.running = True
         self.started_at = datetime.now()
         
         self.logger.info("Starting real-time detection engine")
-        self.logger.info(f"Monitoring: {self.log_file}")
-        self.logger.info(f"Model: {self.model_path}")
-        self.logger.info(f"Window: {self.window_seconds}s, Poll: {self.poll_interval}s")
+        self.logger.info(f"Monitoring: {', '.join(source.name for source in self.sources)}")
+        self.logger.info(f"Models: {', '.join(str(r.model_path) for r in self.resolutions)}")
+        self.logger.info(f"Windows: {', '.join(r.name for r in self.resolutions)}, Poll: {self.poll_interval}s")
+        
+        self.logger.info(f"Stages: {self.pools.executor} executor, {self.pools.workers} workers, "
+                         f"{self.pipeline_depth} cycles queued for scoring")
+        
+        # Bounded queues between the stages: each source is tailed and parsed by its
+        # own task into one batch queue; the detection loop featurizes batches into
+        # the cycle queue; the scoring loop scores, outputs and commits offsets
+        self._batches = asyncio.Queue(maxsize=2 * len(self.sources))
+        self._cycles = asyncio.Queue(maxsize=self.pipeline_depth)
+        self._tail_tasks = [asyncio.create_task(self._tail_source(source)) for source in self.sources]
+        tasks = self._tail_tasks + [asyncio.create_task(self._scoring_loop())]
+        if self.model_reload_interval:
+            tasks.append(asyncio.create_task(self._watch_models()))
         
+        try:
+            while self.running:
+                try:
+                    await self._detection_loop()
+                except asyncio.CancelledError:
+                    break
+                except Exception as e:
+                    self.logger.error(f"Error in detection loop: {e}", exc_info=True)
+                    await asyncio.sleep(self.poll_interval)
+            # Stopped: the scoring stage finishes the cycles already queued (stop() waits for them)
+            await self._cycles.join()
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.pools.shutdown()
+    
+    async def stop(self):
+        """Stop the detection engine"""
+        self.logger.info("Stopping detection engine")
+        self.running = False
+        # No new reads; a cancelled task's read may still be running on a read thread
+        for task in self._tail_tasks:
+            task.cancel()
+        await asyncio.gather(*self._tail_tasks, return_exceptions=True)
+        if self._cycles is not None:
+            # Score what was already featurized, so the checkpoint is consistent
+            async with self._cycle_lock:
+                await self._cycles.join()
+        self.save_checkpoint()
+        # Sources are closed only once no read thread is using them
+        await self.pools.drain('read')
+        for source in self.sources:
+            source.close()
+    
+    async def _tail_source(self, source: LogSource):
+        """Read and parse one source, handing batches to the detection loop"""
         while self.running:
             try:
-                await self._detection_loop()
-                await asyncio.sleep(self.poll_interval)
+                data = await self._run_stage('read', 'read', source.read_batch,
+                                             self.max_batch_bytes, self.max_batch_records)
+                
+                if data:
+                    with self._stage('parse'):
+                        batch = await self.pools.parse(source, data)
+                    if batch is not None:
+                        # Bounded queue: a fast source waits instead of piling up memory
+                        await self._batches.put((source, batch, source.tailer.state()))
+                
+                if source.tailer.has_backlog:
+                    await asyncio.sleep(0)
+                else:
+                    await source.tailer.wait()
             except asyncio.CancelledError:
-                break
+                raise
             except Exception as e:
-                self.logger.error(f"Error in detection loop: {e}", exc_info=True)
+                self.logger.error(f"Error reading {source.name}: {e}", exc_info=True)
                 await asyncio.sleep(self.poll_interval)
     
-    async def stop(self):
-        """Stop the detection engine"""
-        self.logger.info("Stopping detection engine")
-        self.running = False
+    async def _watch_models(self):
+        """Reload a resolution's model when its files change on disk"""
+        while self.running:
+            await asyncio.sleep(self.model_reload_interval)
+            for resolution in self.resolutions:
+                try:
+                    if resolution.model_changed():
+                        await self.reload_model(resolution)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.logger.error(f"Error watching model {resolution.model_path}: {e}", exc_info=True)
     
-    async def _detection_loop(self):
-        """Main detection loop - process new data"""
-        self.last_check = datetime.now()
-        
-        # Check if log file exists
-        if not self.log_file.exists():
-            self.logger.warning(f"Log file not found: {self.log_file}")
-            return
-        
-        # Read new data from log
-        new_data = self._read_new_data()
-        
-        if new_data is None or len(new_data) == 0:
-            return
-        
-        self.records_processed += len(new_data)
+    async def reload_model(self, resolution: WindowResolution) -> Dict:
+        """
+        Load, validate and swap in the model at the resolution's path
         
-        # Group into time windows and detect anomalies
-        windows = self._group_into_windows(new_data)
+        Loading runs in a worker thread, so scoring continues on the current
+        model meanwhile. The new model must use the same feature columns; it
+        is swapped in between scoring cycles and the current one is kept for
+        rollback. A model that fails is not retried until its files change.
         
-        for window_id, window_data in windows.items():
-            self.current_window = window_id
-            await self._process_window(window_id, window_data)
+        Returns:
+            Outcome: 'swapped', 'unchanged' (same model_id) or 'rejected' with the error
+        """
+        async with self._model_lock:
+            fingerprint = model_fingerprint(resolution.model_path)
+            current = resolution.model_version
+            try:
+                candidate = await asyncio.to_thread(load_model_version, resolution.model_path)
+                await asyncio.to_thread(candidate.validate, current.feature_columns)
+            except Exception as e:
+                resolution.keep_model(fingerprint, error=str(e))
+                self.logger.error(f"Rejected new model for {resolution.name} windows, "
+                                  f"keeping {current.model_id}: {e}")
+                return {'resolution': resolution.name, 'outcome': 'rejected', 'error': str(e),
+                        'model_id': current.model_id}
+            
+            if candidate.model_id == current.model_id:
+                resolution.keep_model(fingerprint)
+                self.logger.info(f"Model for {resolution.name} windows unchanged ({current.model_id})")
+                return {'resolution': resolution.name, 'outcome': 'unchanged', 'model_id': current.model_id}
+            
+            resolution.swap(candidate, fingerprint)
+            return {'resolution': resolution.name, 'outcome': 'swapped', 'model_id': candidate.model_id,
+                    'previous_model_id': current.model_id}
     
-    def _read_new_data(self) -> Optional[pd.DataFrame]:
-        """Read new data from log file since last position"""
-        try:
-            # Get file size
-            file_size = self.log_file.stat().st_size
-            
-            if file_size <= self.last_position:
-                # File hasn't grown or was rotated
-                if file_size < self.last_position:
-                    self.logger.info("Log file rotated, resetting position")
-                    self.last_position = 0
-                else:
-                    return None
-            
-            # Read from last position
-            with open(self.log_file, 'r') as f:
-                f.seek(self.last_position)
-                lines = f.readlines()
-                self.last_position = f.tell()
-            
-            if not lines:
-                return None
-            
-            # Parse TSV data (skip comment lines starting with #)
-            # Parse JSON data (skip empty lines)
-            data_lines = [line.strip() for line in lines if line.strip()]
-            
-            if not data_lines:
-                return None
-            
-            # Parse JSON lines
-            import json
-            records = []
-            for line in data_lines:
-                try:
-                    record = json.loads(line)
-                    records.append(record)
-                except json.JSONDecodeError:
+    async def reload_models(self) -> List[Dict]:
+        """Reload the models of all resolutions (see reload_model)"""
+        return [await self.reload_model(resolution) for resolution in self.resolutions]
+    
+    async def rollback_models(self) -> List[Dict]:
+        """Swap every resolution that has a previous model back to it"""
+        results = []
+        async with self._model_lock:
+            for resolution in self.resolutions:
+                if resolution.previous_version is None:
+                    results.append({'resolution': resolution.name, 'outcome': 'no_previous',
+                                    'model_id': resolution.model_version.model_id})
                     continue
-            
-            if not records:
-                return None
-            
-            df = pd.DataFrame(records)
-            # Rename columns for easier access
-            df = df.rename(columns={
-                'id.orig_h': 'src',
-                'id.resp_h': 'dst',
-            })
-            
-            # Convert timestamp to float
-            df['ts'] = pd.to_numeric(df['ts'], errors='coerce')
-            
-            
-            return df
-            
-        except Exception as e:
-            self.logger.error(f"Error reading log file: {e}", exc_info=True)
-            return None
+                version = resolution.rollback()
+                results.append({'resolution': resolution.name, 'outcome': 'rolled_back', 'model_id': version.model_id,
+                                'previous_model_id': resolution.previous_version.model_id})
+        return results
     
-    def _parse_response_values(self, val):
-        """Parse response values string into list of integers"""
-        if pd.isna(val) or val == '-':
-            return []
-        try:
-            return [int(x) for x in str(val).split(',') if x.strip()]
-        except:
-            return []
+    def get_models(self) -> Dict:
+        """Current and previous model per resolution"""
+        return {
+            resolution.name: {
+                'path': str(resolution.model_path),
+                'current': resolution.model_version.describe(),
+                'previous': resolution.previous_version.describe() if resolution.previous_version else None,
+                'reload_error': resolution.reload_error,
+            }
+            for resolution in self.resolutions
+        }
     
-    def _group_into_windows(self, data: pd.DataFrame) -> Dict[int, pd.DataFrame]:
-        """Group data into time windows"""
-        if data.empty:
-            return {}
-        
-        # Drop rows with invalid timestamps
-        data = data.dropna(subset=['ts'])
-        
-        if data.empty:
-            return {}
+    def get_thresholds(self, limit: int = 100) -> Dict:
+        """Score history and anomaly threshold of the device pairs with the longest history, per resolution"""
+        thresholds = {}
+        for resolution in self.resolutions:
+            pairs = resolution.score_quantiles.describe(resolution.model_version.model_id, self.anomaly_threshold)
+            thresholds[resolution.name] = {
+                **resolution.score_quantiles.get_status(resolution.model_version.model_id),
+                'model_id': resolution.model_version.model_id,
+                'device_pairs': sorted(pairs, key=lambda pair: pair['windows'], reverse=True)[:limit],
+            }
+        return thresholds
+    
+    async def _detection_loop(self):
+        """Main detection loop - process new data"""
+        self.last_check = datetime.now()
         
-        # Convert timestamp to window ID
-        self.logger.info(f"Grouping {len(data)} rows into windows (window_size={self.window_seconds}s)")
-        self.logger.info(f"Timestamp range: {data['ts'].min()} to {data['ts'].max()}")
+        try:
+            items = [await asyncio.wait_for(self._batches.get(), timeout=self.poll_interval)]
+        except asyncio.TimeoutError:
+            items = []
+        while not self._batches.empty():
+            items.append(self._batches.get_nowait())
         
-        data['window_id'] = (data['ts'] // self.window_seconds).astype(int)
+        if items:
+            cycle_start = time.perf_counter()
+            
+            # Merge sources by event time into one batch
+            batches = [batch for _, batch, _ in items]
+            merged = pd.concat(batches, ignore_index=True) if len(batches) > 1 else batches[0]
+            merged = merged.sort_values('ts', kind='stable', ignore_index=True)
+            offsets = [(source, tailer_state) for source, _, tailer_state in items]
+            # Event-time progress per source: the watermark follows the slowest one
+            progress = {}
+            for source, batch, _ in items:
+                batch_max = batch['ts'].max()
+                if pd.notna(batch_max):
+                    progress[source.name] = max(progress.get(source.name, batch_max), float(batch_max))
         
-        self.logger.info(f"Window IDs: {sorted(data['window_id'].unique())}")
+        async with self._cycle_lock:
+            if not self.running:
+                return
+            if items:
+                self.records_processed += len(merged)
+                cycle = await self.pools.run('pipeline', self._window_batch, merged, progress)
+                # Waits while the scoring stage is pipeline_depth cycles behind
+                await self._cycles.put((cycle, offsets, len(merged), cycle_start))
+            else:
+                # Quiet sources: don't hold the last windows open forever
+                cycle = await self.pools.run('pipeline', self._close_windows, 'idle')
+                await self._cycles.put((cycle, [], 0, None))
+            
+            if self.checkpoint and self.checkpoint.due():
+                # Only featurized-and-scored state is consistent with the committed offsets
+                await self._cycles.join()
+                self.save_checkpoint()
+    
+    async def _scoring_loop(self):
+        """Scoring stage: score featurized cycles in order and commit their source offsets"""
+        while True:
+            cycle, offsets, n_records, cycle_start = await self._cycles.get()
+            try:
+                await self._score_cycle(cycle)
+                
+                # Batches are fully processed, so their offsets are safe to persist
+                for source, tailer_state in offsets:
+                    source.committed_state = tailer_state
+                
+                if n_records:
+                    elapsed = time.perf_counter() - cycle_start
+                    self.ingest_rate = n_records / elapsed if elapsed > 0 else 0.0
+            except Exception as e:
+                self.logger.error(f"Error in scoring stage: {e}", exc_info=True)
+            finally:
+                self._cycles.task_done()
+    
+    async def process_batch(self, data: pd.DataFrame):
+        """Buffer parsed records by event time and score the windows they close"""
+        self.records_processed += len(data)
+        await self._score_cycle(await self.pools.run('pipeline', self._window_batch, data))
+    
+    async def flush_windows(self):
+        """Score all still-open windows (end of replay or shutdown)"""
+        await self._score_cycle(await self.pools.run('pipeline', self._close_windows, 'all'))
+    
+    def _window_batch(self, data: pd.DataFrame, progress: Optional[Dict[str, float]] = None) -> Tuple[List, List]:
+        """
+        Feature stage of a cycle (pipeline worker): fold a batch into the windows
         
-        # Group by window
-        windows = {}
-        for window_id in data['window_id'].unique():
-            window_data = data[data['window_id'] == window_id]
-            windows[window_id] = window_data
+        Args:
+            data: Parsed records, merged across sources
+            progress: Newest record timestamp per source in data (None = one source)
         
-        return windows
+        Returns:
+            Features of the windows it closed and, when due, of the open windows
+        """
+        with self._stage('windowing'):
+            # Columns are extracted once and folded into every window size
+            records = window_records(data)
+            closed = [(resolution, resolution.add(records, progress)) for resolution in self.resolutions]
+        featurized = self._featurize_closed(closed)
+        # After the closed windows, which extend the temporal history the previews use
+        partial = self._featurize_open_windows() if self.early_warnings else []
+        return featurized, partial
+    
+    def _close_windows(self, which: str) -> Tuple[List, List]:
+        """Feature stage without a batch (pipeline worker): close 'idle' or 'all' open windows"""
+        closed = [(resolution, resolution.flush_idle() if which == 'idle' else resolution.flush())
+                  for resolution in self.resolutions]
+        return self._featurize_closed(closed), []
+    
+    def _featurize_closed(self, closed: List) -> List:
+        """Feature matrices of closed windows, per resolution"""
+        featurized = []
+        for resolution, windows in closed:
+            if not windows:
+                continue
+            # Feature matrices in event-time order, since each window extends the temporal history
+            prepared = []
+            for window_id, aggregates in windows:
+                resolution.current_window = window_id
+                with self._stage('features'):
+                    window_features, register_features = self._extract_features(resolution, aggregates)
+                prepared.append((window_id, window_features, register_features))
+            featurized.append((resolution, prepared))
+        return featurized
+    
+    def _featurize_open_windows(self) -> List:
+        """Feature matrices of the open windows due for an early-warning scoring"""
+        featurized = []
+        for resolution in self.resolutions:
+            event_ts = resolution.windower.max_event_ts
+            if not self.early_warnings.due(resolution.window_seconds, event_ts):
+                continue
+            
+            with self._stage('early_warning'):
+                partial = []
+                for window_id, aggregates in resolution.windower.open_aggregates():
+                    elapsed = min(event_ts - window_id * resolution.window_seconds, resolution.window_seconds)
+                    # Too little of the window seen to extrapolate from
+                    if elapsed >= self.early_warnings.interval:
+                        features, _ = resolution.partial_features(aggregates, elapsed)
+                        partial.append((window_id, elapsed, features))
+            if partial:
+                featurized.append((resolution, event_ts, partial))
+        return featurized
+    
+    async def _score_cycle(self, cycle: Tuple[List, List]):
+        """Scoring stage of a cycle: closed windows, then provisional alerts from open ones"""
+        featurized, partial = cycle
+        # Window sizes are independent, so their scoring calls run side by side
+        await asyncio.gather(*(self._process_closed(resolution, windows) for resolution, windows in featurized))
+        await asyncio.gather(*(self._score_open_windows(resolution, event_ts, windows)
+                               for resolution, event_ts, windows in partial))
+    
+    async def _score_open_windows(self, resolution: WindowResolution, event_ts: float, partial: List):
+        """Score the running aggregates of open windows and raise provisional alerts"""
+        # All open windows of this size in one scoring call
+        version = resolution.model_version
+        scores = await self._run_stage('scoring', 'early_warning', self._score, resolution,
+                                       pd.concat([features for _, _, features in partial]), version)
+        if scores is None:
+            return
+        offset = 0
+        for window_id, elapsed, features in partial:
+            window_scores = scores[offset:offset + len(features)]
+            offset += len(features)
+            for row in np.flatnonzero(window_scores < self.early_warnings.threshold):
+                src, dst = features.index[row]
+                score = float(window_scores[row])
+                alert = self.early_warnings.raise_alert(
+                    resolution.window_seconds, window_id, src, dst, score, event_ts, elapsed
+                )
+                if alert:
+                    alert['model_id'] = version.model_id
+                    self.logger.warning(
+                        f"EARLY WARNING: {src} → {dst} "
+                        f"(score: {score:.3f}, window: {window_id}, {resolution.name}, "
+                        f"{elapsed:.0f}s in, {alert['lead_seconds']:.0f}s before close)"
+                    )
     
-    async def _process_window(self, window_id: int, window_data: pd.DataFrame):
-        """Process a single time window"""
-        # Group by device pairs (src -> dst)
-        device_pairs = window_data.groupby(['src', 'dst'])
+    async def _process_closed(self, resolution: WindowResolution, windows: List):
+        """Score the featurized windows closed in one cycle in a single call, then output them"""
+        # Every device pair of every closed window through the model at once;
+        # a hot reload takes effect from the next cycle
+        version = resolution.model_version
+        batch = pd.concat([features for _, features, _ in windows])
+        scores = await self._run_stage('scoring', 'scoring', self._score, resolution, batch, version)
+        # A failed scoring call counts as normal but stays out of the pairs' score history
+        scored = scores is not None
+        if not scored:
+            scores = np.zeros(len(batch))
         
-        self.logger.info(f"Analyzing {len(device_pairs)} device pairs from completed window")
+        offset = 0
+        for window_id, window_features, register_features in windows:
+            window_scores = scores[offset:offset + len(window_features)]
+            offset += len(window_features)
+            await self._process_window(resolution, window_id, window_features, register_features,
+                                       window_scores, version.model_id, scored)
+    
+    async def _process_window(self, resolution: WindowResolution, window_id: int, window_features: pd.DataFrame,
+                              register_features: pd.DataFrame, scores: np.ndarray, model_id: str,
+                              scored: bool = True):
+        """Flag, log and save the anomalies of a single scored window"""
+        self.logger.info(f"Analyzing {len(window_features)} device pairs from completed {resolution.name} window")
         
-        # Extract features and detect anomalies for each device pair
-        anomalies = []
+        anomalies = await self._run_stage('scoring', 'scoring', self._anomaly_records, resolution, window_id,
+                                          window_features, register_features, scores, model_id, scored)
+        for anomaly in anomalies:
+            self.logger.warning(
+                f"ANOMALY DETECTED: {anomaly['src']} → {anomaly['dst']} "
+                f"(score: {anomaly['anomaly_score']:.3f}, window: {window_id}, {resolution.name})"
+            )
         
-        for (src, dst), pair_data in device_pairs:
-            features = self._extract_features(pair_data, window_id, src, dst)
-            
-            if features is not None:
-                is_anomaly, score = self._detect_anomaly(features)
-                
-                if is_anomaly:
-                    anomaly_record = {
-                        'time_window': window_id,
-                        'src': src,
-                        'dst': dst,
-                        'anomaly_score': score,
-                        'detected_at': datetime.now().isoformat(),
-                        **{k: v for k, v in features.items() if k not in ['time_window', 'src', 'dst']}
-                    }
-                    anomalies.append(anomaly_record)
-                    
-                    self.logger.warning(
-                        f"ANOMALY DETECTED: {src} → {dst} "
-                        f"(score: {score:.3f}, window: {window_id})"
-                    )
+        if self.early_warnings:
+            pair_scores = dict(zip(window_features.index, scores.tolist()))
+            self._resolve_early_warnings(resolution, window_id, pair_scores, anomalies)
         
         if anomalies:
             self.anomalies_detected += len(anomalies)
+            resolution.anomalies_detected += len(anomalies)
             self.recent_anomalies.extend(anomalies)
             # Keep only last 100 in memory
             if len(self.recent_anomalies) > 100:
                 self.recent_anomalies = self.recent_anomalies[-100:]
             
             # Save to file
-            self._save_anomalies(anomalies)
+            await self._run_stage('scoring', 'output', self._save_anomalies, anomalies)
         else:
             self.logger.info("No anomalies detected in this window")
     
-    def _extract_features(self, window_data: pd.DataFrame, time_window: int, 
-                         src: str, dst: str) -> Optional[Dict]:
-        """Extract behavioral features with temporal context"""
-        try:
-            if window_data.empty:
-                return None
-            
-            # Base features
-            features = {
-                'time_window': time_window,
+    def _anomaly_records(self, resolution: WindowResolution, window_id: int, window_features: pd.DataFrame,
+                         register_features: pd.DataFrame, scores: np.ndarray, model_id: str,
+                         scored: bool = True) -> List[Dict]:
+        """Records of the flagged device pairs of a scored window (scoring worker)"""
+        # Global threshold, or each pair's own score quantile once it has history;
+        # the window's scores join that history only after it has been judged
+        thresholds = resolution.thresholds(window_features.index, model_id, self.anomaly_threshold)
+        if scored:
+            resolution.record(window_features.index, scores, model_id)
+        
+        # Only flagged pairs are turned into records
+        flagged = np.flatnonzero(scores < thresholds)
+        anomalies = []
+        
+        for (src, dst), features, score, threshold in zip(window_features.index[flagged],
+                                                          window_features.iloc[flagged].to_dict('records'),
+                                                          scores[flagged], thresholds[flagged]):
+            anomalies.append({
+                'time_window': window_id,
+                'window_seconds': resolution.window_seconds,
                 'src': src,
-                'dst': dst
-            }
-            
-            # Value statistics
-            if 'response_values' in window_data.columns:
-                values = window_data['response_values'].dropna()
-                if len(values) > 0:
-                    value_means = values.apply(lambda x: np.mean(x) if isinstance(x, list) and len(x) > 0 else 0)
-                    features['value_mean_mean'] = float(value_means.mean())
-                    features['value_mean_std'] = float(value_means.std()) if len(value_means) > 1 else 0.0
-                    features['value_mean_min'] = float(value_means.min())
-                    features['value_mean_max'] = float(value_means.max())
-                    
-                    value_stds = values.apply(lambda x: np.std(x) if isinstance(x, list) and len(x) > 1 else 0)
-                    features['value_std_mean'] = float(value_stds.mean())
-                    features['value_std_max'] = float(value_stds.max())
-                    
-                    value_ranges = values.apply(lambda x: np.ptp(x) if isinstance(x, list) and len(x) > 0 else 0)
-                    features['value_range_mean'] = float(value_ranges.mean())
-                    features['value_range_max'] = float(value_ranges.max())
-                    
-                    changes = values.apply(lambda x: len(set(x)) if isinstance(x, list) and len(x) > 0 else 1)
-                    features['value_changes_sum'] = int(changes.sum().item() if hasattr(changes.sum(), 'item') else changes.sum())
-                    features['value_change_rate_mean'] = float(changes.mean())
-                    
-                    unique_counts = values.apply(lambda x: len(set(x)) if isinstance(x, list) and len(x) > 0 else 1)
-                    features['unique_values_mean'] = float(unique_counts.mean())
-                    
-                    # Entropy calculation
-                    entropies = []
-                    for val_list in values:
-                        if isinstance(val_list, list) and len(val_list) > 1:
-                            unique, counts = np.unique(val_list, return_counts=True)
-                            probs = counts / len(val_list)
-                            entropy = -np.sum(probs * np.log2(probs + 1e-10))
-                            entropies.append(entropy)
-                        else:
-                            entropies.append(0.0)
-                    features['entropy_mean'] = float(np.mean(entropies))
-                else:
-                    for key in ['value_mean_mean', 'value_mean_std', 'value_mean_min', 'value_mean_max',
-                               'value_std_mean', 'value_std_max', 'value_range_mean', 'value_range_max',
-                               'value_changes_sum', 'value_change_rate_mean', 'unique_values_mean', 'entropy_mean']:
-                        features[key] = 0.0
-            else:
-                for key in ['value_mean_mean', 'value_mean_std', 'value_mean_min', 'value_mean_max',
-                           'value_std_mean', 'value_std_max', 'value_range_mean', 'value_range_max',
-                           'value_changes_sum', 'value_change_rate_mean', 'unique_values_mean', 'entropy_mean']:
-                    features[key] = 0.0
-            
-            # Read statistics
-            features['read_count_sum'] = int(len(window_data))
-            window_duration = (window_data['ts'].max() - window_data['ts'].min())
-            features['read_rate_mean'] = float(features['read_count_sum'] / window_duration if window_duration > 0 else 0)
-            
-            # Inter-arrival times
-            if len(window_data) > 1:
-                inter_arrivals = window_data['ts'].diff().dropna()
-                features['inter_read_mean_mean'] = float(inter_arrivals.mean())
-                features['inter_read_std_mean'] = float(inter_arrivals.std())
-            else:
-                features['inter_read_mean_mean'] = 0.0
-                features['inter_read_std_mean'] = 0.0
-            
-            # Outlier detection
-            if 'response_values' in window_data.columns and len(window_data) > 2:
-                values = window_data['response_values'].dropna()
-                if len(values) > 0:
-                    value_means = values.apply(lambda x: np.mean(x) if isinstance(x, list) and len(x) > 0 else 0)
-                    if len(value_means) > 1 and value_means.std() > 0:
-                        z_scores = np.abs((value_means - value_means.mean()) / value_means.std())
-                        features['outlier_count_sum'] = int((z_scores > 3).sum().item() if hasattr((z_scores > 3).sum(), 'item') else (z_scores > 3).sum())
-                        features['max_z_score_max'] = float(z_scores.max())
-                    else:
-                        features['outlier_count_sum'] = 0
-                        features['max_z_score_max'] = 0.0
-                else:
-                    features['outlier_count_sum'] = 0
-                    features['max_z_score_max'] = 0.0
-            else:
-                features['outlier_count_sum'] = 0
-                features['max_z_score_max'] = 0.0
-            
-            # Register access patterns
-            if 'register_start' in window_data.columns:
-                features['registers_accessed'] = int(window_data['register_start'].nunique().item() if hasattr(window_data['register_start'].nunique(), 'item') else window_data['register_start'].nunique())
-            else:
-                features['registers_accessed'] = 0
-            
-            # === TEMPORAL FEATURES ===
-            # Compute rolling statistics over previous windows
-            device_pair = f"{src}_{dst}"
-            
-            # Initialize history for this device pair if needed
-            if device_pair not in self.window_history:
-                self.window_history[device_pair] = []
-            
-            # Get historical features
-            history = self.window_history[device_pair]
-            
-            if len(history) >= 3:  # Need at least 3 windows for meaningful rolling stats
-                # Extract historical values for key metrics (last 10 windows)
-                recent_history = history[-10:]
-                hist_value_means = [h.get('value_mean_mean', 0) for h in recent_history]
-                hist_read_counts = [h.get('read_count_sum', 0) for h in recent_history]
-                hist_change_rates = [h.get('value_change_rate_mean', 0) for h in recent_history]
-                
-                # Compute rolling statistics
-                features['value_mean_mean_rolling_mean'] = float(np.mean(hist_value_means))
-                features['value_mean_mean_rolling_std'] = float(np.std(hist_value_means))
-                features['value_mean_mean_deviation'] = float(features['value_mean_mean'] - features['value_mean_mean_rolling_mean'])
-                
-                features['read_count_sum_rolling_mean'] = float(np.mean(hist_read_counts))
-                features['read_count_sum_rolling_std'] = float(np.std(hist_read_counts))
-                features['read_count_sum_deviation'] = float(features['read_count_sum'] - features['read_count_sum_rolling_mean'])
-                
-                features['value_change_rate_mean_rolling_mean'] = float(np.mean(hist_change_rates))
-                features['value_change_rate_mean_rolling_std'] = float(np.std(hist_change_rates))
-                features['value_change_rate_mean_deviation'] = float(features['value_change_rate_mean'] - features['value_change_rate_mean_rolling_mean'])
+                'dst': dst,
+                'anomaly_score': float(score),
+                'anomaly_threshold': float(threshold),
+                'model_id': model_id,
+                'detected_at': datetime.now().isoformat(),
+                **{k: v for k, v in features.items() if k not in ['time_window', 'src', 'dst']},
+                'top_registers': resolution.top_registers(register_features, src, dst)
+            })
+        return anomalies
+    
+    def _resolve_early_warnings(self, resolution: WindowResolution, window_id: int,
+                                scores: Dict, anomalies: List[Dict]):
+        """Confirm or retract the provisional alerts of a scored window"""
+        by_pair = {(a['src'], a['dst']): a for a in anomalies}
+        for alert in self.early_warnings.resolve_window(resolution.window_seconds, window_id, scores, set(by_pair)):
+            pair = (alert['src'], alert['dst'])
+            if alert['status'] == 'confirmed':
+                by_pair[pair]['early_warning_lead_seconds'] = alert['lead_seconds']
+                self.logger.warning(
+                    f"Early warning confirmed: {pair[0]} → {pair[1]} "
+                    f"(window: {window_id}, {resolution.name}, {alert['lead_seconds']:.0f}s ahead)"
+                )
             else:
-                # Not enough history - use current values as baseline
-                features['value_mean_mean_rolling_mean'] = features['value_mean_mean']
-                features['value_mean_mean_rolling_std'] = 0.0
-                features['value_mean_mean_deviation'] = 0.0
-                
-                features['read_count_sum_rolling_mean'] = float(features['read_count_sum'])
-                features['read_count_sum_rolling_std'] = 0.0
-                features['read_count_sum_deviation'] = 0.0
-                
-                features['value_change_rate_mean_rolling_mean'] = features['value_change_rate_mean']
-                features['value_change_rate_mean_rolling_std'] = 0.0
-                features['value_change_rate_mean_deviation'] = 0.0
-            
-            # Add current features to history (keep last 20 windows)
-            self.window_history[device_pair].append(features.copy())
-            if len(self.window_history[device_pair]) > 20:
-                self.window_history[device_pair] = self.window_history[device_pair][-20:]
-            
-            return features
-            
-        except Exception as e:
-            self.logger.error(f"Error extracting features: {e}", exc_info=True)
-            return None
+                # No final score if the pair had no scorable registers at close
+                final = 'n/a' if alert['final_score'] is None else f"{alert['final_score']:.3f}"
+                self.logger.info(
+                    f"Early warning retracted: {pair[0]} → {pair[1]} "
+                    f"(window: {window_id}, {resolution.name}, final score: {final})"
+                )
     
-    def _detect_anomaly(self, features: Dict) -> tuple[bool, float]:
-        """Detect if features indicate an anomaly"""
+    def _extract_features(self, resolution: WindowResolution, aggregates: RegisterAggregates):
+        """Pair feature matrix of a closed window, indexed by (src, dst), and its register features"""
+        return resolution.extract_features(aggregates)
+    
+    def _score(self, resolution: WindowResolution, features: pd.DataFrame,
+               version: ModelVersion) -> Optional[np.ndarray]:
+        """Anomaly scores of a feature matrix under the given model version (None on error)"""
         try:
-            # Extract feature values in correct order
-            feature_values = []
-            for col in self.feature_columns:
-                feature_values.append(features.get(col, 0.0))
-            
-            X = np.array(feature_values).reshape(1, -1)
-            
-            # Scale features
-            X_scaled = self.scaler.transform(X)
-            
-            # Get anomaly score
-            score = self.model.score_samples(X_scaled)[0]
-            
-            # Determine if anomaly
-            is_anomaly = score < self.anomaly_threshold
-            
-            return is_anomaly, float(score)
-            
+            return resolution.score(features, version)
         except Exception as e:
-            self.logger.error(f"Error detecting anomalies: {e}", exc_info=True)
-            return False, 0.0
+            self.logger.error(f"Error scoring {len(features)} device pairs: {e}", exc_info=True)
+            return None
     
     def _save_anomalies(self, anomalies: List[Dict]):
         """Save detected anomalies to Parquet file"""
@@ -491,16 +780,8 @@ class RealtimeDetector:
             if not anomalies:
                 return
             
-            # Convert to DataFrame
-            df = pd.DataFrame(anomalies)
-            
-            # Generate filename with timestamp
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            output_file = self.output_dir / f'anomalies_{timestamp}.parquet'
-            
-            # Save as Parquet
-            table = pa.Table.from_pandas(df)
-            pq.write_table(table, output_file)
+            # One file per window; window sizes are written concurrently
+            output_file = write_anomalies(self.output_dir, anomalies)
             
             self.logger.info(f"Saved {len(anomalies)} anomalies to {output_file}")
             
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Early Warning for Open Windows
+Scores the running aggregates of still-open windows at a fixed event-time
+cadence, raises provisional alerts under a stricter threshold and confirms
+or retracts them when the window closes and is scored for real
+"""
+
+import logging
+from typing import Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+
+# Register features that grow with the time covered; extrapolated to a full window
+COUNT_FEATURES = ['read_count', 'value_changes', 'outlier_count']
+
+
+def time_normalize(register_features: pd.DataFrame, elapsed: float, window_seconds: int) -> pd.DataFrame:
+    """
+    Extrapolate the register features of a partial window to the full window
+
+    Counts are scaled by window_seconds / elapsed so a flood seen for a few
+    seconds looks like the full window it would fill; ratios, value
+    statistics and inter-read timing are already independent of the
+    window length.
+    """
+    scale = window_seconds / max(elapsed, 1e-9)
+    features = register_features.copy()
+    for name in COUNT_FEATURES:
+        features[name] = features[name] * scale
+    features['read_rate'] = features['read_count'] / window_seconds
+    return features
+
+
+class EarlyWarnings:
+    """Provisional alerts for open windows and their outcome at window close"""
+
+    def __init__(self, interval: float, threshold: float, history: int = 100):
+        """
+        Initialize early warnings
+
+        Args:
+            interval: Event-time seconds between scorings of the open windows
+            threshold: Score below which a provisional alert is raised
+                       (stricter than the anomaly threshold)
+            history: Resolved and pending alerts kept for the API
+        """
+        self.interval = interval
+        self.threshold = threshold
+        self.history = history
+        self.logger = logging.getLogger(__name__)
+
+        # (window_seconds, window_id, src, dst) -> alert
+        self.pending: Dict[Tuple[int, int, str, str], Dict] = {}
+        self.recent: List[Dict] = []
+        self.raised = 0
+        self.confirmed = 0
+        self.retracted = 0
+        self.lead_seconds_total = 0.0
+        self._last_scored: Dict[int, float] = {}  # Per window size: event time of the last scoring
+
+    def due(self, window_seconds: int, event_ts: Optional[float]) -> bool:
+        """Whether the open windows of a window size should be scored again"""
+        if event_ts is None or window_seconds <= self.interval:
+            return False
+        last = self._last_scored.get(window_seconds)
+        if last is not None and event_ts - last < self.interval:
+            return False
+        self._last_scored[window_seconds] = event_ts
+        return True
+
+    def raise_alert(self, window_seconds: int, window_id: int, src: str, dst: str,
+                    score: float, event_ts: float, elapsed: float) -> Optional[Dict]:
+        """Record a provisional alert; None if the pair already has one for this window"""
+        key = (window_seconds, window_id, src, dst)
+        if key in self.pending:
+            return None
+        alert = {
+            'time_window': window_id,
+            'window_seconds': window_seconds,
+            'src': src,
+            'dst': dst,
+            'status': 'provisional',
+            'provisional_score': score,
+            'event_ts': event_ts,
+            'elapsed_seconds': elapsed,
+            'lead_seconds': (window_id + 1) * window_seconds - event_ts,
+        }
+        self.pending[key] = alert
+        self.raised += 1
+        self._remember(alert)
+        return alert
+
+    def resolve_window(self, window_seconds: int, window_id: int,
+                       scores: Dict[Tuple[str, str], float], anomalous: Set[Tuple[str, str]]) -> List[Dict]:
+        """
+        Confirm or retract the provisional alerts of a window that was scored
+
+        Args:
+            window_seconds: Window size
+            window_id: The closed window
+            scores: Final score per (src, dst)
+            anomalous: Pairs flagged at window close
+        """
+        keys = [key for key in self.pending if key[0] == window_seconds and key[1] == window_id]
+        resolved = []
+        for key in keys:
+            alert = self.pending.pop(key)
+            pair = (key[2], key[3])
+            alert['final_score'] = scores.get(pair)
+            if pair in anomalous:
+                alert['status'] = 'confirmed'
+                self.confirmed += 1
+                self.lead_seconds_total += alert['lead_seconds']
+            else:
+                alert['status'] = 'retracted'
+                self.retracted += 1
+            resolved.append(alert)
+        return resolved
+
+    def _remember(self, alert: Dict):
+        self.recent.append(alert)
+        if len(self.recent) > self.history:
+            self.recent = self.recent[-self.history:]
+
+    def state(self) -> Dict:
+        """Pending alerts and counters for checkpointing"""
+        return {
+            'pending': list(self.pending.values()),  # Keys are rebuilt from the alerts
+            'recent': self.recent,
+            'raised': self.raised,
+            'confirmed': self.confirmed,
+            'retracted': self.retracted,
+            'lead_seconds_total': self.lead_seconds_total,
+            'last_scored': [[window_seconds, ts] for window_seconds, ts in self._last_scored.items()],
+        }
+
+    def restore(self, state: Dict):
+        """Resume from a saved state()"""
+        self.pending = {self._key(alert): alert for alert in state['pending']}
+        # A pending alert is also listed in recent: share the object so resolving it updates both
+        self.recent = [self.pending.get(self._key(alert), alert) if alert['status'] == 'provisional' else alert
+                       for alert in state['recent']]
+        self.raised = state['raised']
+        self.confirmed = state['confirmed']
+        self.retracted = state['retracted']
+        self.lead_seconds_total = state['lead_seconds_total']
+        self._last_scored = {window_seconds: ts for window_seconds, ts in state['last_scored']}
+
+    @staticmethod
+    def _key(alert: Dict) -> Tuple[int, int, str, str]:
+        return alert['window_seconds'], alert['time_window'], alert['src'], alert['dst']
+
+    def get_status(self) -> Dict:
+        return {
+            'interval_seconds': self.interval,
+            'threshold': self.threshold,
+            'raised': self.raised,
+            'pending': len(self.pending),
+            'confirmed': self.confirmed,
+            'retracted': self.retracted,
+            'mean_lead_seconds': round(self.lead_seconds_total / self.confirmed, 1) if self.confirmed else None,
+        }
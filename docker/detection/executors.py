@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Worker Pools for the Detection Pipeline
+Runs the CPU-heavy stages of a detection cycle off the asyncio event loop,
+so the API served from that loop stays responsive while a large batch is
+parsed, featurized and scored.
+
+- read: reading the logs (threads; file offsets stay in this process)
+- parse: log parsing, in threads or (executor='process') worker processes;
+  the parser is shipped with each batch and returned with its updated state
+- pipeline: windowing and feature extraction, one thread, since they fold
+  batches into shared window and temporal state in order
+- scoring: model scoring and anomaly output; the NumPy/Numba kernels release
+  the GIL, so several scoring threads use several cores
+
+executor='inline' runs every stage on the event loop, as before.
+"""
+
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+import pandas as pd
+
+EXECUTORS = ['thread', 'process', 'inline']
+
+
+def parse_in_worker(parser, data: bytes) -> Tuple[Optional[pd.DataFrame], object]:
+    """Parse a batch in a worker process; the parser comes back with its updated state"""
+    return parser.parse(data), parser
+
+
+class StagePools:
+    """Executors the detector hands its CPU-heavy stages to"""
+
+    def __init__(self, executor: str = 'thread', workers: int = 2):
+        """
+        Initialize the pools
+
+        Args:
+            executor: 'thread', 'process' (parsing in worker processes, other
+                      stages in threads) or 'inline' (everything on the event loop)
+            workers: Threads (or processes) for reading, parsing and scoring each
+        """
+        if executor not in EXECUTORS:
+            raise ValueError(f"Unknown executor {executor!r} (expected one of {', '.join(EXECUTORS)})")
+        self.executor = executor
+        self.workers = max(1, workers)
+
+        self.pools: Dict[str, Optional[Executor]] = {'read': None, 'parse': None, 'pipeline': None, 'scoring': None}
+        if executor != 'inline':
+            # Workers are started on first use
+            self.pools['read'] = ThreadPoolExecutor(self.workers, thread_name_prefix='detect-read')
+            if executor == 'process':
+                self.pools['parse'] = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self.pools['parse'] = ThreadPoolExecutor(self.workers, thread_name_prefix='detect-parse')
+            self.pools['pipeline'] = ThreadPoolExecutor(1, thread_name_prefix='detect-pipeline')
+            self.pools['scoring'] = ThreadPoolExecutor(self.workers, thread_name_prefix='detect-scoring')
+
+    async def run(self, stage: str, fn: Callable, *args):
+        """Run fn(*args) in the stage's pool (on the event loop when inline)"""
+        pool = self.pools[stage]
+        if pool is None:
+            return fn(*args)
+        return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+
+    async def parse(self, source, data: bytes) -> Optional[pd.DataFrame]:
+        """Parse a batch of one source and update its progress"""
+        if self.executor == 'process':
+            batch, source.parser = await self.run('parse', parse_in_worker, source.parser, data)
+        else:
+            batch = await self.run('parse', source.parser.parse, data)
+        return source.track(batch)
+
+    async def drain(self, stage: str):
+        """Stop the stage's pool, waiting for the calls already running in it"""
+        pool = self.pools[stage]
+        if pool is not None:
+            await asyncio.get_running_loop().run_in_executor(
+                None, lambda: pool.shutdown(wait=True, cancel_futures=True))
+
+    def get_status(self) -> Dict:
+        return {'executor': self.executor, 'workers': self.workers}
+
+    def shutdown(self):
+        for pool in self.pools.values():
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
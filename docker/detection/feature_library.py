@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Shared Feature Library Loader
+The detector scores the features the model was trained on by importing the
+same module as training, scripts/modbus_features.py. The detection image is
+built from the repository root and copies it (with modbus_kernels.py) to
+/app/scripts, beside this file; in a repository checkout it is found in the
+top-level scripts directory.
+"""
+
+import sys
+from pathlib import Path
+
+try:
+    import modbus_features
+except ImportError:
+    _here = Path(__file__).resolve().parent
+    for _scripts in (_here / 'scripts', _here.parent.parent / 'scripts'):
+        if (_scripts / 'modbus_features.py').exists():
+            sys.path.insert(0, str(_scripts))
+            break
+    import modbus_features
+
+from modbus_features import (  # noqa: E402
+    FEATURE_COLUMNS,
+    KEY_COLUMNS,
+    RegisterAggregates,
+    VALUES_TYPE,
+    TemporalContext,
+    ZeekTsvReader,
+    add_temporal_context,
+    aggregate_to_device_pairs,
+    arrow_to_pandas,
+    flatten_values,
+    register_value,
+)
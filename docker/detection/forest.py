@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Compiled Isolation Forest Inference
+Scores feature vectors with the node table exported by scripts/train_model.py
+(export_forest) instead of the pickled sklearn model, so the detection image
+does not need sklearn and scoring skips its per-tree Python overhead. The
+scaler is folded into the split thresholds at export, so raw feature vectors
+are scored without a transform pass. Scores match
+IsolationForest.score_samples on the scaled features.
+
+A model is a directory (anomaly_detector.forest next to the pickle) with a
+JSON manifest and one .npy file per array. The arrays are memory-mapped
+read-only, so loading does not unpickle or copy anything and worker
+processes share the pages of the same model.
+
+A Numba kernel walks the trees sample by sample when Numba is installed;
+otherwise all samples and trees advance one level at a time with NumPy.
+Trees are laid out so that a step is branch-free: the right child directly
+follows the left one and leaves point to themselves. Set
+MODBUS_KERNELS=numpy to force the fallback.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+# Try to import Numba, fall back to NumPy if needed
+try:
+    import numba
+    USE_NUMBA = os.getenv('MODBUS_KERNELS', 'numba').lower() != 'numpy'
+except ImportError:
+    numba = None
+    USE_NUMBA = False
+
+FOREST_FORMAT_VERSION = 3
+COMPILED_SUFFIX = '.forest'
+MANIFEST_FILE = 'manifest.json'
+CHUNK_ROWS = 4096  # Samples traversed together by the NumPy fallback
+LOAD_ATTEMPTS = 3  # Manifest reads before a load gives up on arrays removed by exports
+
+FOREST_ARRAYS = ['scaler_mean', 'scaler_scale', 'feature', 'threshold', 'left', 'leaf_value', 'roots', 'depth']
+
+
+def compiled_model_path(model_path: Union[str, Path]) -> Path:
+    """Compiled forest directory exported next to a model pickle (or the path itself)"""
+    path = Path(model_path)
+    return path if path.suffix == COMPILED_SUFFIX else path.with_suffix(COMPILED_SUFFIX)
+
+
+def path_lengths_numpy(X: np.ndarray, feature: np.ndarray, threshold: np.ndarray, left: np.ndarray,
+                       leaf_value: np.ndarray, roots: np.ndarray, depth: np.ndarray) -> np.ndarray:
+    """
+    Summed path length of every sample over all trees, all trees one level at a time
+
+    Args:
+        X: Raw feature vectors (float64)
+        feature: Split feature per node
+        threshold: Split threshold on the raw feature per node (infinite at leaves)
+        left: Left child per node; the right child is left + 1, leaves point to themselves
+        leaf_value: Path length added by a sample ending in the leaf
+        roots: Root node of each tree
+        depth: Levels of each tree
+    """
+    depths = np.zeros(len(X))
+    levels = int(depth.max()) if len(depth) else 0
+    for start in range(0, len(X), CHUNK_ROWS):
+        chunk = X[start:start + CHUNK_ROWS]
+        rows = np.arange(len(chunk))[:, None]
+        # (sample, tree) positions; samples already in a leaf stay there
+        nodes = np.tile(roots.astype(np.int64), (len(chunk), 1))
+        for _ in range(levels):
+            nodes = left[nodes] + (chunk[rows, feature[nodes]] > threshold[nodes])
+        values = leaf_value[nodes]
+        # Trees are added in order, as sklearn accumulates them
+        for tree in range(values.shape[1]):
+            depths[start:start + len(chunk)] += values[:, tree]
+    return depths
+
+
+def _path_lengths_loop(X, feature, threshold, left, leaf_value, roots, depth):
+    """Sample-by-sample version of path_lengths_numpy, compiled with Numba"""
+    depths = np.zeros(X.shape[0])
+    for tree in range(len(roots)):
+        for i in range(X.shape[0]):
+            node = roots[tree]
+            # Branch-free descent: leaves point to themselves
+            for _ in range(depth[tree]):
+                node = left[node] + (X[i, feature[node]] > threshold[node])
+            depths[i] += leaf_value[node]
+    return depths
+
+
+if numba is not None:
+    _path_lengths_compiled = numba.njit(cache=True, nogil=True)(_path_lengths_loop)
+else:
+    _path_lengths_compiled = None
+
+
+def path_lengths_numba(X: np.ndarray, feature: np.ndarray, threshold: np.ndarray, left: np.ndarray,
+                       leaf_value: np.ndarray, roots: np.ndarray, depth: np.ndarray) -> np.ndarray:
+    """Summed path length per sample with the compiled kernel (arguments as path_lengths_numpy)"""
+    if _path_lengths_compiled is None:
+        raise RuntimeError("Numba is not installed")
+    return _path_lengths_compiled(np.ascontiguousarray(X), feature, threshold, left, leaf_value, roots, depth)
+
+
+class CompiledForest:
+    """Isolation Forest and scaler flattened into NumPy arrays"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray], manifest: Dict):
+        """
+        Initialize from exported arrays
+
+        Args:
+            arrays: The arrays written by export_forest (see FOREST_ARRAYS), used as given
+            manifest: The model's manifest.json
+        """
+        self.manifest = manifest
+        self.feature_names: List[str] = list(manifest['feature_names'])
+        self.denominator = float(manifest['denominator'])
+        # Training distribution, for reference: the scaling is already in the thresholds
+        self.mean = arrays['scaler_mean']
+        self.scale = arrays['scaler_scale']
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.left = arrays['left']
+        self.leaf_value = arrays['leaf_value']
+        self.roots = arrays['roots']
+        self.depth = arrays['depth']
+
+    @classmethod
+    def load(cls, path: Union[str, Path], mmap: bool = True) -> 'CompiledForest':
+        """
+        Load a compiled forest directory written by train_model.py
+
+        An export keeps the arrays of the manifest it replaces, but a load
+        that spans two exports can still find its arrays removed; it then
+        starts over from the new manifest.
+
+        Args:
+            path: Model directory
+            mmap: Memory-map the arrays read-only instead of reading them
+        """
+        path = Path(path)
+        for attempt in range(LOAD_ATTEMPTS):
+            try:
+                return cls._load(path, mmap)
+            except FileNotFoundError:
+                if attempt == LOAD_ATTEMPTS - 1 or not (path / MANIFEST_FILE).exists():
+                    raise
+
+    @classmethod
+    def _load(cls, path: Path, mmap: bool) -> 'CompiledForest':
+        with open(path / MANIFEST_FILE) as f:
+            manifest = json.load(f)
+        version = manifest.get('format_version')
+        if version != FOREST_FORMAT_VERSION:
+            raise ValueError(f"Unsupported compiled forest version {version} in {path} "
+                             f"(expected {FOREST_FORMAT_VERSION}); re-export the model")
+
+        arrays = {}
+        for name in FOREST_ARRAYS:
+            spec = manifest['arrays'][name]
+            array = np.load(path / spec['file'], mmap_mode='r' if mmap else None, allow_pickle=False)
+            if str(array.dtype) != spec['dtype'] or list(array.shape) != spec['shape']:
+                raise ValueError(f"{spec['file']} in {path} does not match its manifest entry")
+            arrays[name] = array
+        return cls(arrays, manifest)
+
+    @property
+    def model_id(self) -> str:
+        """Content digest of the exported model"""
+        return self.manifest['model_id']
+
+    @property
+    def window_seconds(self) -> Optional[int]:
+        """Window size of the training features, if recorded"""
+        return self.manifest.get('window_seconds')
+
+    @property
+    def score_threshold(self) -> float:
+        """Score below which training data was flagged (at the training contamination)"""
+        return self.manifest['score_threshold']
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    def score_samples(self, X: np.ndarray) -> np.ndarray:
+        """Anomaly score of raw feature vectors (lower = more anomalous), as scaler + IsolationForest"""
+        X = np.asarray(X, dtype=np.float64)
+        # As sklearn, which rejects such input; leaves rely on finite values
+        if not np.isfinite(X).all():
+            raise ValueError("Input contains NaN or infinity")
+        kernel = path_lengths_numba if USE_NUMBA else path_lengths_numpy
+        depths = kernel(X, self.feature, self.threshold, self.left, self.leaf_value, self.roots, self.depth)
+        if self.denominator == 0:
+            return -np.full(len(X), 0.5)
+        return -(2 ** (-depths / self.denominator))
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Model Versions for the Real-time Detector
+A loaded model (compiled forest, or the sklearn pickle without one) together
+with its identity, so a resolution can swap models at runtime, keep the
+previous version for rollback and tag every score with the model that
+produced it.
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from feature_library import FEATURE_COLUMNS
+from forest import MANIFEST_FILE, CompiledForest, compiled_model_path
+
+logger = logging.getLogger(__name__)
+
+
+class ModelVersion:
+    """One loaded model, scoring raw feature vectors in feature_columns order"""
+
+    def __init__(self, path: Path, feature_columns: List[str], model_id: str,
+                 forest: Optional[CompiledForest] = None, model=None, scaler=None):
+        """
+        Initialize a model version
+
+        Args:
+            path: File or directory the model was loaded from
+            feature_columns: Feature order the model expects
+            model_id: Identity of the model (content digest)
+            forest: Compiled forest, if loaded from one
+            model: sklearn IsolationForest (without a compiled forest)
+            scaler: sklearn StandardScaler (without a compiled forest)
+        """
+        self.path = Path(path)
+        self.feature_columns = list(feature_columns)
+        self.model_id = model_id
+        self.forest = forest
+        self.model = model
+        self.scaler = scaler
+        self.format = 'compiled' if forest is not None else 'pickle'
+        self.loaded_at = datetime.now().isoformat()
+
+    @property
+    def window_seconds(self) -> Optional[int]:
+        """Window size of the training features, if recorded"""
+        return self.forest.window_seconds if self.forest is not None else None
+
+    @property
+    def mean(self) -> np.ndarray:
+        """Training mean per feature"""
+        return self.forest.mean if self.forest is not None else self.scaler.mean_
+
+    @property
+    def scale(self) -> np.ndarray:
+        """Training standard deviation per feature (1 where constant)"""
+        return self.forest.scale if self.forest is not None else self.scaler.scale_
+
+    def score(self, X: np.ndarray) -> np.ndarray:
+        """Anomaly scores of raw feature vectors (lower = more anomalous)"""
+        if self.forest is not None:
+            return self.forest.score_samples(X)
+        return self.model.score_samples(self.scaler.transform(X))
+
+    def validate(self, feature_columns: List[str]):
+        """
+        Check that this model can replace one scoring feature_columns
+
+        Raises ValueError if the feature order differs or a probe vector
+        does not score within the Isolation Forest range [-1, 0].
+        """
+        if self.feature_columns != list(feature_columns):
+            missing = sorted(set(feature_columns) - set(self.feature_columns))
+            extra = sorted(set(self.feature_columns) - set(feature_columns))
+            detail = f"missing {missing}, extra {extra}" if missing or extra else "same columns, reordered"
+            raise ValueError(f"Feature columns differ from the running model ({detail})")
+        scores = self.score(np.asarray(self.mean, dtype=np.float64).reshape(1, -1))
+        if not (np.isfinite(scores).all() and -1.0 <= scores.min() and scores.max() <= 0.0):
+            raise ValueError(f"Probe vector scored {scores.tolist()}, outside [-1, 0]")
+
+    def describe(self) -> Dict:
+        return {
+            'model_id': self.model_id,
+            'format': self.format,
+            'path': str(self.path),
+            'loaded_at': self.loaded_at,
+        }
+
+
+def model_fingerprint(model_path: Path) -> Tuple:
+    """
+    Cheap change marker of a model: stat of the compiled manifest and the pickle
+
+    The compiled manifest is replaced last when a model is exported, so a
+    changed fingerprint means a complete new model is in place.
+    """
+    marker = []
+    for path in (compiled_model_path(model_path) / MANIFEST_FILE, Path(model_path)):
+        try:
+            stat = os.stat(path)
+            marker.append((str(path), stat.st_ino, stat.st_size, stat.st_mtime_ns))
+        except FileNotFoundError:
+            marker.append((str(path), None))
+    return tuple(marker)
+
+
+def load_model_version(model_path: Path) -> ModelVersion:
+    """
+    Load the model at model_path
+
+    The compiled forest exported next to the pickle (train_model.py) is
+    preferred; the pickled sklearn model is only loaded without one.
+    """
+    compiled = compiled_model_path(model_path)
+    try:
+        if compiled.exists():
+            forest = CompiledForest.load(compiled)
+            return ModelVersion(compiled, forest.feature_names, forest.model_id, forest=forest)
+
+        with open(model_path, 'rb') as f:
+            content = f.read()
+        model_data = pickle.loads(content)
+        # train_model.py stores the column order as 'feature_columns'
+        feature_columns = model_data.get('feature_columns') or model_data.get('feature_names') or FEATURE_COLUMNS
+        return ModelVersion(model_path, feature_columns, hashlib.sha256(content).hexdigest()[:16],
+                            model=model_data['model'], scaler=model_data['scaler'])
+    except ImportError as e:
+        # The detection image ships without sklearn
+        logger.error(
+            f"No compiled forest at {compiled} and the pickled model needs {e.name}; "
+            f"export it with train_model.py --export-only {model_path}"
+        )
+        raise
+    except Exception as e:
+        logger.error(f"Failed to load model {model_path}: {e}")
+        raise
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Train/Serve Feature Parity Check
+Computes features for the same logs with the offline pipeline
+(extract_features.py) and by replaying them through the detector, and checks
+both against a straight transcription of the original per-register loop
+
+Usage:
+    python parity.py "/zeek/logs/modbus_detailed.*.log" --model /data/models/anomaly_detector.pkl
+    python parity.py archive.log --window 60 --batch-records 1000
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import tempfile
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from detector import RealtimeDetector
+from feature_library import FEATURE_COLUMNS, KEY_COLUMNS, modbus_features
+from replay import _expand, replay
+
+import extract_features  # noqa: E402  (scripts/, made importable by feature_library)
+
+
+def reference_register_features(df: pd.DataFrame, window_seconds: int = 300) -> pd.DataFrame:
+    """Register features computed group by group, as training did originally"""
+    df = df.copy()
+    df['value_1'] = df['response_values'].apply(
+        lambda x: x[1] if isinstance(x, (list, np.ndarray)) and len(x) > 1 else 0
+    )
+    df['time_window'] = (df['ts'] // window_seconds).astype('int64')
+
+    features_list = []
+    for (window, src, dst, addr), group in df.groupby(['time_window', 'id.orig_h', 'id.resp_h', 'address']):
+        if len(group) < modbus_features.MIN_REGISTER_READS:
+            continue
+        values = group['value_1'].values
+        feature = {
+            'time_window': window,
+            'src': src,
+            'dst': dst,
+            'address': addr,
+            'value_mean': np.mean(values),
+            'value_std': np.std(values),
+            'value_min': np.min(values),
+            'value_max': np.max(values),
+            'value_range': np.max(values) - np.min(values),
+            'value_changes': np.sum(np.diff(values) != 0),
+            'value_change_rate': np.sum(np.diff(values) != 0) / len(values),
+            'read_count': len(group),
+            'read_rate': len(group) / window_seconds,
+            'inter_read_mean': np.mean(np.diff(group['ts'])),
+            'inter_read_std': np.std(np.diff(group['ts'])) if len(group) > 2 else 0,
+        }
+        if len(values) > modbus_features.OUTLIER_MIN_READS:
+            z_scores = np.abs((values - np.mean(values)) / (np.std(values) + 1e-6))
+            feature['outlier_count'] = np.sum(z_scores > 3)
+            feature['max_z_score'] = np.max(z_scores)
+        else:
+            feature['outlier_count'] = 0
+            feature['max_z_score'] = 0
+        histogram = np.histogram(values, bins=modbus_features.ENTROPY_BINS)[0] / len(values)
+        feature['unique_values'] = len(np.unique(values))
+        feature['entropy'] = -np.sum(histogram * np.log(histogram + 1e-10))
+        features_list.append(feature)
+
+    return pd.DataFrame(features_list)
+
+
+def compare(expected: pd.DataFrame, actual: pd.DataFrame, keys: List[str], columns: List[str],
+            rtol: float = 1e-9) -> Dict:
+    """Join on keys and report rows missing on either side and per-column mismatches"""
+    merged = expected.merge(actual, on=keys, how='outer', suffixes=('_expected', '_actual'), indicator=True)
+    mismatches = {}
+    both = merged[merged['_merge'] == 'both']
+    for column in columns:
+        x = both[f'{column}_expected'].to_numpy(dtype=np.float64)
+        y = both[f'{column}_actual'].to_numpy(dtype=np.float64)
+        bad = ~np.isclose(x, y, rtol=rtol, atol=rtol)
+        if bad.any():
+            mismatches[column] = int(bad.sum())
+    return {
+        'rows': len(both),
+        'only_expected': int((merged['_merge'] == 'left_only').sum()),
+        'only_actual': int((merged['_merge'] == 'right_only').sum()),
+        'mismatches': mismatches,
+    }
+
+
+class _CapturingDetector(RealtimeDetector):
+    """Detector that keeps every feature matrix it scores"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.captured: List[pd.DataFrame] = []
+
+    def _extract_features(self, resolution, aggregates):
+        features, register_features = super()._extract_features(resolution, aggregates)
+        self.captured.append(features.reset_index().assign(time_window=resolution.current_window))
+        return features, register_features
+
+
+def serving_features(files, model: str, window_seconds: int, batch_records: int) -> pd.DataFrame:
+    """Features as scored by the detector when the logs are replayed in batches"""
+    detector = _CapturingDetector(
+        log_file=str(files[0]),
+        model_path=model,
+        output_dir=tempfile.mkdtemp(prefix='parity_'),
+        window_seconds=window_seconds,
+        use_inotify=False,
+        idle_timeout=None,
+        max_registers=None  # Exact, as offline
+    )
+    asyncio.run(replay(files, detector, speed=0, batch_records=batch_records))
+    for source in detector.sources:
+        source.close()
+    return pd.concat(detector.captured, ignore_index=True) if detector.captured else pd.DataFrame(columns=KEY_COLUMNS)
+
+
+def report(name: str, result: Dict) -> bool:
+    ok = not (result['only_expected'] or result['only_actual'] or result['mismatches'])
+    print(f"  {name:28s} {result['rows']:8,} rows  "
+          f"missing {result['only_expected']}/{result['only_actual']}  "
+          f"{'OK' if ok else 'MISMATCH ' + str(result['mismatches'])}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that training and the detector compute identical features')
+    parser.add_argument('logs', nargs='+', help='Log files or glob patterns (in event-time order)')
+    parser.add_argument('--model', default='/data/models/anomaly_detector.pkl', help='Trained model')
+    parser.add_argument('--window', type=int, default=300, help='Time window in seconds')
+    parser.add_argument('--batch-records', type=int, default=5000, help='Records per detector batch')
+    parser.add_argument('--rtol', type=float, default=1e-9, help='Relative tolerance')
+    args = parser.parse_args()
+
+    # Per-window detections are not of interest here, only the comparison
+    logging.disable(logging.WARNING)
+
+    files = _expand(args.logs)
+    df = pd.concat([extract_features.load_detailed_logs(str(f)) for f in files], ignore_index=True)
+
+    # Offline: the training pipeline
+    registers = extract_features.extract_register_features(df.copy(), args.window)
+    offline = extract_features.add_temporal_context(extract_features.aggregate_to_device_pairs(registers))
+
+    # Reference: the original per-register loop
+    reference = reference_register_features(df, args.window)
+
+    # Serving: the detector, batch by batch
+    serving = serving_features(files, args.model, args.window, args.batch_records)
+
+    print(f"{len(df):,} records from {len(files)} file(s), {args.window}s windows")
+    register_keys = ['time_window', 'src', 'dst', 'address']
+    ok = report('register: reference/offline',
+                compare(reference, registers, register_keys, modbus_features.REGISTER_FEATURES, args.rtol))
+    ok &= report('pair: offline/detector', compare(offline, serving, KEY_COLUMNS, FEATURE_COLUMNS, args.rtol))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
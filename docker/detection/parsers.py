@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Parsers for Zeek modbus_detailed Logs
+Turn a buffer of complete log lines (JSON or native TSV) into a DataFrame
+
+The Arrow-based parsers keep response_values as an Arrow list column (flat
+int32 values plus offsets) rather than one Python list per record.
+
+Both JSON parsers produce the same frame for the same lines: a record with a
+mistyped field ("address": "40001", an ISO 8601 ts) is coerced to the
+schema by records_table, not dropped, and only lines that are not a JSON
+object count as malformed.
+"""
+
+import io
+import json
+import logging
+import math
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.json as pa_json
+
+from feature_library import VALUES_TYPE, ZeekTsvReader, arrow_to_pandas
+
+# Columns renamed for easier access downstream
+COLUMN_RENAMES = {
+    'id.orig_h': 'src',
+    'id.resp_h': 'dst',
+}
+
+# Fixed schema for the fields the detector uses; everything else is ignored
+MODBUS_DETAILED_SCHEMA = pa.schema([
+    ('ts', pa.float64()),
+    ('uid', pa.string()),
+    ('id.orig_h', pa.string()),
+    ('id.orig_p', pa.int64()),
+    ('id.resp_h', pa.string()),
+    ('id.resp_p', pa.int64()),
+    ('func', pa.string()),
+    ('address', pa.int64()),
+    ('register_start', pa.int64()),
+    ('quantity', pa.int64()),
+    ('response_values', VALUES_TYPE),
+])
+
+
+def _iso_timestamp(text: str) -> Optional[float]:
+    """Epoch seconds of an ISO 8601 timestamp (Zeek's JSON::TS_ISO8601), UTC unless it has an offset"""
+    try:
+        parsed = datetime.fromisoformat(text)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _coerce_number(value, arrow_type: pa.DataType):
+    """A JSON value as a number of arrow_type, or None if it does not hold one"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            return _iso_timestamp(value.strip()) if pa.types.is_floating(arrow_type) else None
+    if not isinstance(value, (int, float)) or not math.isfinite(value):
+        return None
+    if pa.types.is_floating(arrow_type):
+        return float(value)
+    if value != int(value):
+        return None
+    limit = 1 << (arrow_type.bit_width - 1)
+    return int(value) if -limit <= value < limit else None
+
+
+def _coerce_value(value, arrow_type: pa.DataType):
+    """A decoded JSON value as arrow_type, or None (unset) if it cannot be converted"""
+    if value is None:
+        return None
+    if pa.types.is_list(arrow_type):
+        if not isinstance(value, list):
+            return None
+        return [_coerce_value(item, arrow_type.value_type) for item in value]
+    if pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type):
+        return _coerce_number(value, arrow_type)
+    if pa.types.is_string(arrow_type):
+        if isinstance(value, (dict, list)):
+            return None
+        return value if isinstance(value, str) else str(value)
+    return value
+
+
+def records_table(records: List[Dict], schema: pa.Schema = MODBUS_DETAILED_SCHEMA) -> pa.Table:
+    """
+    Arrow table of decoded JSON records, restricted to the schema's fields
+
+    Values of the wrong JSON type are converted where their meaning is clear:
+    numbers sent as strings, ISO 8601 timestamps in float (time) fields as
+    epoch seconds, numbers in string fields as text. Anything else is null,
+    as if the field were unset.
+    """
+    return pa.Table.from_arrays(
+        [pa.array([_coerce_value(record.get(field.name), field.type) for record in records], field.type)
+         for field in schema],
+        schema=schema
+    )
+
+
+def _decode_record(line: str) -> Optional[Dict]:
+    """The JSON object on a line, or None if the line is malformed"""
+    try:
+        record = json.loads(line)
+    except json.JSONDecodeError:
+        return None
+    return record if isinstance(record, dict) else None
+
+
+class JsonLinesParser:
+    """Line-by-line json.loads into a DataFrame (reference implementation)"""
+
+    name = 'json'
+
+    def __init__(self, schema: pa.Schema = MODBUS_DETAILED_SCHEMA):
+        self.schema = schema
+        self.malformed = 0
+
+    def parse(self, data: bytes) -> Optional[pd.DataFrame]:
+        """Parse a buffer of NDJSON lines, skipping malformed ones"""
+        records = []
+        # Lines end at \n only, as for the Arrow reader (str.splitlines also splits on \u2028 etc.)
+        for line in data.decode('utf-8', errors='replace').split('\n'):
+            line = line.strip()
+            if not line:
+                continue
+            record = _decode_record(line)
+            if record is None:
+                self.malformed += 1
+                continue
+            records.append(record)
+
+        if not records:
+            return None
+
+        return arrow_to_pandas(records_table(records, self.schema)).rename(columns=COLUMN_RENAMES)
+
+
+class ArrowJsonParser:
+    """Columnar NDJSON decoding with pyarrow's JSON reader and a fixed schema"""
+
+    name = 'arrow'
+
+    def __init__(self, schema: pa.Schema = MODBUS_DETAILED_SCHEMA):
+        self.schema = schema
+        self.malformed = 0
+        self.logger = logging.getLogger(__name__)
+        self._parse_options = pa_json.ParseOptions(
+            explicit_schema=schema,
+            unexpected_field_behavior='ignore'
+        )
+
+    def _read_table(self, data: bytes) -> pa.Table:
+        read_options = pa_json.ReadOptions(block_size=max(len(data), 1 << 20))
+        return pa_json.read_json(
+            io.BytesIO(data),
+            read_options=read_options,
+            parse_options=self._parse_options
+        )
+
+    def _read_valid(self, data: bytes) -> List[pa.Table]:
+        """
+        Decode a buffer, isolating lines the reader rejects by bisection
+
+        A clean buffer is a single reader call; each bad line costs
+        O(log n) extra calls instead of falling back to per-line parsing.
+        A rejected line that is a JSON object with mistyped fields is kept,
+        coerced as JsonLinesParser does.
+        """
+        try:
+            return [self._read_table(data)]
+        except pa.ArrowInvalid:
+            pass
+
+        body = data.rstrip(b'\n')
+        if b'\n' not in body:
+            # A single bad line
+            line = body.decode('utf-8', errors='replace').strip()
+            if not line:
+                return []
+            record = _decode_record(line)
+            if record is None:
+                self.malformed += 1
+                return []
+            return [records_table([record], self.schema)]
+
+        mid = body.find(b'\n', len(body) // 2)
+        if mid == -1:
+            mid = body.rfind(b'\n')
+
+        return self._read_valid(data[:mid + 1]) + self._read_valid(data[mid + 1:])
+
+    def parse_table(self, data: bytes) -> Optional[pa.Table]:
+        """Parse a buffer of NDJSON lines into an Arrow table"""
+        tables = [t for t in self._read_valid(data) if t.num_rows]
+        if not tables:
+            return None
+        return pa.concat_tables(tables) if len(tables) > 1 else tables[0]
+
+    def parse(self, data: bytes) -> Optional[pd.DataFrame]:
+        """Parse a buffer of NDJSON lines into a DataFrame"""
+        table = self.parse_table(data)
+        if table is None:
+            return None
+        return arrow_to_pandas(table).rename(columns=COLUMN_RENAMES)
+
+
+class ZeekTsvParser(ZeekTsvReader):
+    """Zeek native TSV logs, read as in training (see modbus_features.ZeekTsvReader)"""
+
+    name = 'tsv'
+
+    def parse(self, data: bytes) -> Optional[pd.DataFrame]:
+        """Parse a buffer of TSV lines into a DataFrame"""
+        table = self.parse_table(data)
+        if table is None:
+            return None
+        return arrow_to_pandas(table).rename(columns=COLUMN_RENAMES)
+
+
+PARSERS = {
+    JsonLinesParser.name: JsonLinesParser,
+    ArrowJsonParser.name: ArrowJsonParser,
+    ZeekTsvParser.name: ZeekTsvParser,
+}
+
+
+def make_parser(name: str):
+    """Create a parser by name ('json', 'arrow' or 'tsv')"""
+    try:
+        return PARSERS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown parser '{name}', expected one of {sorted(PARSERS)}")
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Window Resolutions for the Real-time Detector
+Each resolution is one tumbling window size with its own event-time windows,
+temporal history and model, so short windows catch bursts quickly while long
+windows keep stable baselines for slow drifts. All resolutions are fed from
+the same parsed batches.
+"""
+
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from feature_library import RegisterAggregates, TemporalContext, add_temporal_context, aggregate_to_device_pairs
+from early_warning import time_normalize
+from models import ModelVersion, load_model_version, model_fingerprint
+from score_cache import ScoreCache
+from score_quantiles import PairQuantiles
+from windowing import ClosedWindow, EventTimeWindower, WindowRecords
+
+# Placeholder in MODEL_PATH replaced by the window size in seconds
+WINDOW_PLACEHOLDER = '{window}'
+
+# Register statistics reported with an anomaly, strongest deviation first
+TOP_REGISTER_FIELDS = ['address', 'read_count', 'value_mean', 'value_std', 'value_changes',
+                       'outlier_count', 'max_z_score']
+
+
+def parse_window_sizes(spec: Union[int, str, Sequence[int]]) -> List[int]:
+    """Window sizes from an int, a comma-separated string ("10,60,300") or a sequence"""
+    if isinstance(spec, int):
+        sizes = [spec]
+    elif isinstance(spec, str):
+        sizes = [int(part) for part in spec.split(',') if part.strip()]
+    else:
+        sizes = [int(size) for size in spec]
+    if not sizes or any(size <= 0 for size in sizes):
+        raise ValueError(f"Invalid window sizes: {spec!r}")
+    if len(set(sizes)) != len(sizes):
+        raise ValueError(f"Duplicate window sizes: {spec!r}")
+    return sizes
+
+
+def model_path_for(model_path: str, window_seconds: int, n_resolutions: int) -> Path:
+    """
+    Model file of one resolution
+
+    With several resolutions the path must contain {window}, e.g.
+    /data/models/{window}s/anomaly_detector.pkl, since a model only fits the
+    window size its features were extracted with.
+    """
+    if WINDOW_PLACEHOLDER in model_path:
+        return Path(model_path.replace(WINDOW_PLACEHOLDER, str(window_seconds)))
+    if n_resolutions > 1:
+        raise ValueError(f"MODEL_PATH must contain {WINDOW_PLACEHOLDER} to load one model per window size")
+    return Path(model_path)
+
+
+class WindowResolution:
+    """One window size: event-time windows, per-pair temporal context and model"""
+
+    def __init__(self,
+                 window_seconds: int,
+                 model_path: Path,
+                 allowed_lateness: float = 10.0,
+                 idle_timeout: Optional[float] = 60.0,
+                 max_registers: Optional[int] = None,
+                 score_cache_size: Optional[int] = None,
+                 score_cache_precision: float = 0.01,
+                 adaptive_quantile: Optional[float] = None,
+                 adaptive_min_windows: int = 100):
+        """
+        Initialize a resolution
+
+        Args:
+            window_seconds: Window size in seconds
+            model_path: Model trained on features of this window size
+            allowed_lateness: Event-time slack (seconds) before a window closes
+            idle_timeout: Close open windows after this many seconds without records
+            max_registers: Registers tracked per open window before cold ones are evicted
+            score_cache_size: Scores cached for repeating feature vectors (None = no cache)
+            score_cache_precision: Score cache cell width in training standard deviations
+            adaptive_quantile: Flag a device pair below this quantile of its own scores
+                               once it has history (None = global threshold only)
+            adaptive_min_windows: Scored windows a pair needs before its quantile applies
+        """
+        self.window_seconds = window_seconds
+        self.model_path = Path(model_path)
+        self.name = f'{window_seconds}s'
+        self.logger = logging.getLogger(__name__)
+
+        # Each (window, src, dst) is scored once, after its window closes
+        self.windower = EventTimeWindower(window_seconds, allowed_lateness, idle_timeout, max_registers)
+        self.temporal_context = TemporalContext()  # Per-pair rolling baselines for temporal features
+        self.current_window: Optional[int] = None
+        self.anomalies_detected = 0
+
+        self.score_cache = ScoreCache(score_cache_size, score_cache_precision) if score_cache_size else None
+        self.score_quantiles = PairQuantiles(adaptive_quantile, adaptive_min_windows)  # Per model
+        self.model_version: Optional[ModelVersion] = None
+        self.previous_version: Optional[ModelVersion] = None  # Kept for rollback after a swap
+        self.reload_error: Optional[str] = None
+        self._fingerprint = model_fingerprint(self.model_path)
+        self.load_model()
+
+    def load_model(self):
+        """Load the trained anomaly detection model (see models.load_model_version)"""
+        self.swap(load_model_version(self.model_path), self._fingerprint)
+        self.previous_version = None
+
+    @property
+    def feature_columns(self) -> List[str]:
+        return self.model_version.feature_columns
+
+    def model_changed(self) -> Optional[Tuple]:
+        """New fingerprint of the model files if they changed since the last load, else None"""
+        fingerprint = model_fingerprint(self.model_path)
+        return fingerprint if fingerprint != self._fingerprint else None
+
+    def swap(self, version: ModelVersion, fingerprint: Tuple):
+        """
+        Make version the scoring model, keeping the current one for rollback
+
+        A single attribute assignment, so a scoring batch uses either the old
+        or the new model, never a mix.
+        """
+        self.previous_version = self.model_version
+        self.model_version = version
+        self._fingerprint = fingerprint
+        self.reload_error = None
+        if self.score_cache:
+            self.score_cache.invalidate(version.model_id)
+        self._retain_quantiles()
+        self.logger.info(
+            f"Model {version.model_id} ({version.format}) scores {self.name} windows, "
+            f"loaded from {version.path}: {len(version.feature_columns)} features"
+        )
+        trained_for = version.window_seconds
+        if trained_for is not None and trained_for != self.window_seconds:
+            self.logger.warning(
+                f"Model {version.path} was trained on {trained_for}s windows but scores {self.name} windows"
+            )
+
+    def keep_model(self, fingerprint: Tuple, error: Optional[str] = None):
+        """Keep the current model for files seen at fingerprint (unchanged or rejected)"""
+        self._fingerprint = fingerprint
+        self.reload_error = error
+
+    def rollback(self) -> ModelVersion:
+        """Swap back to the previous model; the rolled-back one becomes the previous"""
+        if self.previous_version is None:
+            raise ValueError(f"No previous model to roll back to for {self.name} windows")
+        self.model_version, self.previous_version = self.previous_version, self.model_version
+        if self.score_cache:
+            self.score_cache.invalidate(self.model_version.model_id)
+        self._retain_quantiles()
+        self.logger.warning(
+            f"Rolled back {self.name} windows from model {self.previous_version.model_id} "
+            f"to {self.model_version.model_id}"
+        )
+        return self.model_version
+
+    def _retain_quantiles(self):
+        """Keep score history only for the models that can score (current and rollback target)"""
+        self.score_quantiles.retain(
+            version.model_id for version in (self.model_version, self.previous_version) if version is not None
+        )
+
+    def thresholds(self, pairs: Sequence[Tuple[str, str]], model_id: str, default: float) -> np.ndarray:
+        """Anomaly threshold per device pair: its own quantile with enough history under model_id, else default"""
+        return self.score_quantiles.thresholds(model_id, pairs, default)
+
+    def record(self, pairs: Sequence[Tuple[str, str]], scores: np.ndarray, model_id: str):
+        """Add the scores of a judged window to the pairs' history under model_id"""
+        self.score_quantiles.record(model_id, pairs, scores)
+
+    def add(self, records: WindowRecords, progress: Optional[Dict[str, float]] = None) -> List[ClosedWindow]:
+        return self.windower.add(records, progress)
+
+    def flush_idle(self) -> List[ClosedWindow]:
+        return self.windower.flush_idle()
+
+    def flush(self) -> List[ClosedWindow]:
+        return self.windower.flush()
+
+    def extract_features(self, aggregates: RegisterAggregates) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Feature matrix of a closed window, indexed by (src, dst), and the
+        register features it was rolled up from
+
+        Uses the training pipeline's definitions (modbus_features): register
+        features, aggregated per device pair, with temporal context.
+        """
+        register_features = aggregates.features(self.window_seconds)
+        pair_features = aggregate_to_device_pairs(register_features)
+        features = add_temporal_context(pair_features, self.temporal_context)
+        return features.set_index(['src', 'dst']).drop(columns='time_window'), register_features
+
+    def partial_features(self, aggregates: RegisterAggregates, elapsed: float) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Feature matrix of an open window from its running aggregates
+
+        Count features are extrapolated from the elapsed event time to the
+        full window, and temporal context is previewed without adding the
+        window to the history.
+        """
+        register_features = time_normalize(aggregates.features(self.window_seconds), elapsed, self.window_seconds)
+        pair_features = aggregate_to_device_pairs(register_features)
+        features = self.temporal_context.add(pair_features, commit=False).fillna(0)
+        return features.set_index(['src', 'dst']).drop(columns='time_window'), register_features
+
+    def score(self, features: pd.DataFrame, version: Optional[ModelVersion] = None) -> np.ndarray:
+        """
+        Anomaly scores of a feature matrix, one row per device pair
+
+        All rows go through the scaler and the model in one call, so the
+        per-call overhead of sklearn (input validation, dispatch over the
+        trees) is paid once per cycle instead of once per pair. Columns the
+        model expects but the matrix lacks are scored as 0. version pins the
+        model (default: the current one), so a cycle is scored by one model
+        even if a reload swaps it meanwhile. With a score cache, rows whose
+        vector falls in an already scored cell skip the model.
+        """
+        version = version or self.model_version
+        if features.empty:
+            return np.zeros(0)
+        X = features.reindex(columns=version.feature_columns, fill_value=0.0).to_numpy(dtype=np.float64)
+        if self.score_cache is not None:
+            return self.score_cache.score(version, X)
+        return version.score(X)
+
+    @staticmethod
+    def top_registers(register_features: pd.DataFrame, src: str, dst: str, limit: int = 3) -> List[Dict]:
+        """
+        Registers of a device pair that deviate most within the window
+
+        A write to a single register barely moves pair-level means; this
+        points at the register(s) behind a pair's anomaly.
+        """
+        registers = register_features[(register_features['src'] == src) & (register_features['dst'] == dst)]
+        registers = registers.sort_values(['max_z_score', 'value_change_rate', 'outlier_count'], ascending=False)
+        return registers[TOP_REGISTER_FIELDS].head(limit).to_dict('records')
+
+    def state(self) -> Dict:
+        """Windows and history for checkpointing"""
+        return {
+            'windower': self.windower.state(),
+            'temporal_context': self.temporal_context.state(),
+            'anomalies_detected': self.anomalies_detected,
+            'score_quantiles': self.score_quantiles.state(),
+        }
+
+    def restore(self, state: Dict):
+        """Resume from a saved state()"""
+        self.windower.restore(state['windower'])
+        self.temporal_context = TemporalContext()
+        self.temporal_context.restore(state['temporal_context'])
+        self.anomalies_detected = state['anomalies_detected']
+        self.score_quantiles.restore(state['score_quantiles'])
+        self._retain_quantiles()
+
+    def get_status(self) -> Dict:
+        return {
+            'window_seconds': self.window_seconds,
+            'model': str(self.model_path),
+            'model_id': self.model_version.model_id,
+            'model_format': self.model_version.format,
+            'model_loaded_at': self.model_version.loaded_at,
+            'previous_model_id': self.previous_version.model_id if self.previous_version else None,
+            'model_reload_error': self.reload_error,
+            'score_cache': self.score_cache.get_status() if self.score_cache else None,
+            'score_quantiles': self.score_quantiles.get_status(self.model_version.model_id),
+            'current_window': self.current_window,
+            'anomalies_detected': self.anomalies_detected,
+            'device_pairs': len(self.temporal_context),
+            **self.windower.get_status(),
+        }
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Score Cache for Steady-State Traffic
+Memoizes anomaly scores of device pairs whose feature vectors repeat window
+after window. Vectors are keyed on a grid in the model's standardized feature
+space (training mean and standard deviation per feature), so the precision
+is the same for every feature regardless of its unit.
+
+A vector in a cell already seen returns the score of the first vector scored
+in that cell; only vectors in new cells go through the trees. Scores are
+therefore approximate to within what the model resolves at that precision.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class ScoreCache:
+    """LRU cache of anomaly scores keyed on quantized, standardized feature vectors"""
+
+    def __init__(self, capacity: int, precision: float = 0.01):
+        """
+        Initialize the cache
+
+        Args:
+            capacity: Cached cells before the least recently used are evicted
+            precision: Cell width in training standard deviations per feature
+        """
+        if capacity <= 0 or precision <= 0:
+            raise ValueError(f"Invalid score cache capacity {capacity} or precision {precision}")
+        self.capacity = capacity
+        self.precision = precision
+
+        self.model_id: Optional[str] = None  # Model the cached scores belong to
+        self._scores: 'OrderedDict[bytes, float]' = OrderedDict()
+        self._lock = threading.Lock()  # Scoring runs in worker threads, swaps on the event loop
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def invalidate(self, model_id: str):
+        """Drop all scores; from now on only scores of model_id are cached"""
+        with self._lock:
+            self._scores.clear()
+            self.model_id = model_id
+            self.invalidations += 1
+
+    def keys(self, version, X: np.ndarray) -> List[bytes]:
+        """Grid cell of each row of X in the version's standardized feature space"""
+        cells = np.rint((X - version.mean) / version.scale / self.precision).astype(np.int64)
+        return [row.tobytes() for row in cells]
+
+    def score(self, version, X: np.ndarray) -> np.ndarray:
+        """
+        Scores of raw feature vectors, from the cache where their cell is known
+
+        Args:
+            version: ModelVersion that scores the misses
+            X: Raw feature vectors in version.feature_columns order
+        """
+        # Another model (a cycle still scoring across a swap) or input the model rejects
+        if version.model_id != self.model_id or not np.isfinite(X).all():
+            return version.score(X)
+
+        keys = self.keys(version, X)
+        scores = np.empty(len(X))
+        missing: Dict[bytes, List[int]] = {}
+        hits = 0
+        with self._lock:
+            for row, key in enumerate(keys):
+                score = self._scores.get(key)
+                if score is None:
+                    missing.setdefault(key, []).append(row)
+                else:
+                    self._scores.move_to_end(key)
+                    scores[row] = score
+                    hits += 1
+            # Counted per row: rows sharing a cell new to the cache are all misses,
+            # even though that cell is scored only once below
+            self.hits += hits
+            self.misses += len(X) - hits
+        if not missing:
+            return scores
+
+        fresh = version.score(X[[rows[0] for rows in missing.values()]])
+        for rows, score in zip(missing.values(), fresh):
+            scores[rows] = score
+        with self._lock:
+            if version.model_id == self.model_id:  # Not swapped meanwhile
+                for key, score in zip(missing, fresh):
+                    self._scores[key] = float(score)
+                while len(self._scores) > self.capacity:
+                    self._scores.popitem(last=False)
+                    self.evictions += 1
+        return scores
+
+    def get_status(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'capacity': self.capacity,
+            'precision': self.precision,
+            'entries': len(self._scores),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
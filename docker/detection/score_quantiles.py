@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Per-Pair Score Quantiles
+Streaming score distribution of every device pair under each model, for
+thresholds relative to a pair's own history: a noisy HMI pair is only
+flagged below its usual low scores, a quiet engineering workstation as soon
+as it leaves its narrow band.
+
+Isolation Forest scores lie in [-1, 0], so each pair's sketch is a
+fixed-width histogram over that range: constant memory per pair (one row
+of SCORE_BINS counters), quantiles accurate to one bin width, and updates and
+lookups for all pairs of a window as single NumPy operations. Sketches are
+only kept while adaptive thresholds are enabled.
+"""
+
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+SCORE_BINS = 200  # Bins over [-1, 0]: quantiles within one bin (0.005)
+BIN_WIDTH = 1.0 / SCORE_BINS
+
+Pair = Tuple[str, str]
+
+
+class ScoreSketches:
+    """Score histograms of the device pairs scored by one model"""
+
+    def __init__(self):
+        self.rows: Dict[Pair, int] = {}
+        self.counts = np.zeros((0, SCORE_BINS), dtype=np.uint32)
+        self.totals = np.zeros(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _rows(self, pairs: Sequence[Pair]) -> np.ndarray:
+        """Row of each pair, adding rows for new pairs"""
+        new = [pair for pair in dict.fromkeys(pairs) if pair not in self.rows]
+        needed = len(self.rows) + len(new)
+        if needed > len(self.counts):
+            # Grow geometrically, as TemporalContext does, before any new row is indexed
+            capacity = max(needed, 2 * len(self.counts), 64)
+            counts = np.zeros((capacity, SCORE_BINS), dtype=np.uint32)
+            counts[:len(self.counts)] = self.counts
+            totals = np.zeros(capacity, dtype=np.int64)
+            totals[:len(self.totals)] = self.totals
+            self.counts, self.totals = counts, totals
+        for pair in new:
+            self.rows[pair] = len(self.rows)
+        return np.array([self.rows[pair] for pair in pairs], dtype=np.int64)
+
+    def add(self, pairs: Sequence[Pair], scores: np.ndarray):
+        """Add one score per pair (pairs are unique within a window)"""
+        rows = self._rows(pairs)
+        bins = np.clip(((np.asarray(scores) + 1.0) / BIN_WIDTH).astype(np.int64), 0, SCORE_BINS - 1)
+        self.counts[rows, bins] += 1
+        self.totals[rows] += 1
+
+    def windows(self, pairs: Sequence[Pair]) -> np.ndarray:
+        """Scores recorded per pair (0 for unknown pairs)"""
+        return np.array([self.totals[self.rows[pair]] if pair in self.rows else 0 for pair in pairs],
+                        dtype=np.int64)
+
+    def quantiles(self, pairs: Sequence[Pair], q: float) -> np.ndarray:
+        """q-quantile of each pair's scores, interpolated within the bin (NaN for unknown pairs)"""
+        result = np.full(len(pairs), np.nan)
+        known = [i for i, pair in enumerate(pairs) if pair in self.rows]
+        if not known:
+            return result
+        rows = np.array([self.rows[pairs[i]] for i in known])
+        counts = self.counts[rows].astype(np.float64)
+        cumulative = np.cumsum(counts, axis=1)
+        target = q * cumulative[:, -1]
+        bins = np.minimum((cumulative < target[:, None]).sum(axis=1), SCORE_BINS - 1)
+        below = cumulative[np.arange(len(rows)), bins] - counts[np.arange(len(rows)), bins]
+        inside = counts[np.arange(len(rows)), bins]
+        fraction = np.divide(target - below, inside, out=np.zeros(len(rows)), where=inside > 0)
+        result[known] = -1.0 + (bins + fraction) * BIN_WIDTH
+        return result
+
+    def nbytes(self) -> int:
+        return self.counts.nbytes + self.totals.nbytes
+
+    def state(self) -> Dict:
+        """Pairs and their histograms as plain data (for checkpointing)"""
+        n_pairs = len(self.rows)
+        return {
+            'pairs': [list(pair) for pair in self.rows],
+            'counts': self.counts[:n_pairs],
+            'totals': self.totals[:n_pairs],
+        }
+
+    def restore(self, state: Dict):
+        """Resume from a saved state()"""
+        self.rows = {tuple(pair): row for row, pair in enumerate(state['pairs'])}
+        self.counts = np.asarray(state['counts'], dtype=np.uint32).reshape(-1, SCORE_BINS)
+        self.totals = np.asarray(state['totals'], dtype=np.int64)
+
+
+class PairQuantiles:
+    """Per-pair, per-model score sketches and the adaptive thresholds derived from them"""
+
+    def __init__(self, quantile: Optional[float] = None, min_windows: int = 100):
+        """
+        Initialize the sketches
+
+        Args:
+            quantile: Flag a pair's window below this quantile of its own scores
+                      (None = no sketches are kept and the global threshold is used)
+            min_windows: Scores a pair needs under the current model before its
+                         quantile replaces the global threshold
+        """
+        if quantile is not None and not 0 < quantile < 1:
+            raise ValueError(f"Adaptive quantile must be between 0 and 1, got {quantile}")
+        self.quantile = quantile
+        self.min_windows = min_windows
+        self.sketches: Dict[str, ScoreSketches] = {}  # model_id -> pair histograms
+        self._lock = threading.Lock()  # Recorded from scoring workers, read by /status and /thresholds
+
+    def thresholds(self, model_id: str, pairs: Sequence[Pair], default: float) -> np.ndarray:
+        """Threshold per pair: its quantile once it has enough history, else default"""
+        with self._lock:
+            return self._thresholds(model_id, pairs, default)
+
+    def _thresholds(self, model_id: str, pairs: Sequence[Pair], default: float) -> np.ndarray:
+        thresholds = np.full(len(pairs), default)
+        sketches = self.sketches.get(model_id)
+        if not self.enabled or sketches is None:
+            return thresholds
+        ready = sketches.windows(pairs) >= self.min_windows
+        if ready.any():
+            thresholds[ready] = sketches.quantiles(pairs, self.quantile)[ready]
+        return thresholds
+
+    @property
+    def enabled(self) -> bool:
+        return self.quantile is not None
+
+    def record(self, model_id: str, pairs: Sequence[Pair], scores: np.ndarray):
+        """Record the scores of one window under the model that produced them (no-op when disabled)"""
+        if self.enabled and len(pairs):
+            with self._lock:
+                self.sketches.setdefault(model_id, ScoreSketches()).add(pairs, scores)
+
+    def retain(self, model_ids: Iterable[str]):
+        """Drop the sketches of models that can no longer score (not current or previous)"""
+        keep = set(model_ids)
+        with self._lock:
+            self.sketches = {model_id: s for model_id, s in self.sketches.items() if model_id in keep}
+
+    def describe(self, model_id: str, default: float) -> List[Dict]:
+        """History, median and threshold of every pair under a model"""
+        with self._lock:
+            sketches = self.sketches.get(model_id)
+            if sketches is None:
+                return []
+            pairs = list(sketches.rows)
+            windows = sketches.windows(pairs)
+            medians = sketches.quantiles(pairs, 0.5)
+            thresholds = self._thresholds(model_id, pairs, default)
+        return [
+            {'src': src, 'dst': dst, 'windows': int(n), 'median_score': round(float(median), 4),
+             'threshold': round(float(threshold), 4),
+             'adaptive': self.enabled and bool(n >= self.min_windows)}
+            for (src, dst), n, median, threshold in zip(pairs, windows, medians, thresholds)
+        ]
+
+    def state(self) -> Dict[str, Dict]:
+        """Sketches per model for checkpointing"""
+        with self._lock:
+            return {model_id: sketches.state() for model_id, sketches in self.sketches.items()}
+
+    def restore(self, state: Dict[str, Dict]):
+        """Resume from a saved state() (sketches are dropped when disabled)"""
+        sketches = {}
+        for model_id, sketches_state in (state.items() if self.enabled else ()):
+            sketches[model_id] = ScoreSketches()
+            sketches[model_id].restore(sketches_state)
+        with self._lock:
+            self.sketches = sketches
+
+    def get_status(self, model_id: str) -> Dict:
+        with self._lock:
+            sketches = self.sketches.get(model_id)
+            pairs = len(sketches) if sketches else 0
+            adaptive = int((sketches.totals >= self.min_windows).sum()) if sketches and self.enabled else 0
+            return {
+                'quantile': self.quantile,
+                'min_windows': self.min_windows,
+                'pairs': pairs,
+                'adaptive_pairs': adaptive,
+                'models': len(self.sketches),
+                'bytes': sum(s.nbytes() for s in self.sketches.values()),
+            }
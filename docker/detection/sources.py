@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Log Sources for Multi-Sensor Ingestion
+One tailer + parser per Zeek sensor log, with per-source progress and lag
+"""
+
+import glob
+import logging
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+import pandas as pd
+
+from parsers import make_parser
+from tailer import LogTailer
+
+
+def expand_log_paths(spec: Union[str, Sequence[str]]) -> List[Path]:
+    """
+    Resolve log sources from a path, glob or comma-separated list of either
+
+    Patterns that match nothing yet are kept as literal paths so a sensor
+    that has not written its log yet is picked up once it does.
+    """
+    if isinstance(spec, (str, Path)):
+        spec = [p.strip() for p in str(spec).split(',') if p.strip()]
+
+    paths = []
+    for pattern in spec:
+        matches = sorted(glob.glob(str(pattern))) if glob.has_magic(str(pattern)) else []
+        for match in matches or [pattern]:
+            path = Path(match)
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+
+class LogSource:
+    """A single sensor log being tailed into the detector"""
+
+    def __init__(self,
+                 path: Path,
+                 parser: str = 'arrow',
+                 poll_interval: float = 5,
+                 use_inotify: bool = True):
+        """
+        Initialize the source
+
+        Args:
+            path: Zeek modbus_detailed log of this sensor
+            parser: Parser name (see parsers.make_parser)
+            poll_interval: Longest wait between checks for new data (seconds)
+            use_inotify: Wake on file events instead of polling when available
+        """
+        self.path = Path(path)
+        self.name = str(self.path)
+        self.logger = logging.getLogger(__name__)
+
+        self.parser = make_parser(parser)
+        if hasattr(self.parser, 'prime') and self.path.exists():
+            # Starting mid-file: the TSV header is only at the top
+            self.parser.prime(self.path)
+
+        # Start reading from end of file to avoid processing old data
+        self.tailer = LogTailer(
+            self.path,
+            start_at_end=True,
+            max_poll_interval=poll_interval,
+            use_inotify=use_inotify
+        )
+        # Tailer position whose records have been fully processed (checkpointed)
+        self.committed_state = self.tailer.state()
+
+        self.records = 0
+        self.bytes_ingested = 0
+        self.last_event_ts: Optional[float] = None
+        self._warned_missing = False
+
+    def read_batch(self, max_bytes: Optional[int], max_lines: Optional[int]) -> bytes:
+        """Read the next bounded batch of complete lines"""
+        if self.tailer.inode is None and not self.path.exists():
+            if not self._warned_missing:
+                self.logger.warning(f"Log file not found: {self.path}")
+                self._warned_missing = True
+            return b''
+        self._warned_missing = False
+
+        data = self.tailer.read(max_bytes=max_bytes, max_lines=max_lines)
+        self.bytes_ingested += len(data)
+        return data
+
+    def parse(self, data: bytes) -> Optional[pd.DataFrame]:
+        """Parse a batch and update event-time progress"""
+        return self.track(self.parser.parse(data))
+
+    def track(self, batch: Optional[pd.DataFrame]) -> Optional[pd.DataFrame]:
+        """Update event-time progress with a parsed batch (None if it has no records)"""
+        if batch is None or batch.empty:
+            return None
+
+        self.records += len(batch)
+        batch_max_ts = batch['ts'].max()
+        if pd.notna(batch_max_ts):
+            self.last_event_ts = max(self.last_event_ts or 0.0, float(batch_max_ts))
+        return batch
+
+    @property
+    def lag_seconds(self) -> Optional[float]:
+        """Wall-clock time since the newest event read from this source"""
+        if self.last_event_ts is None:
+            return None
+        return max(time.time() - self.last_event_ts, 0.0)
+
+    def get_status(self) -> Dict:
+        """Per-source progress for the status endpoint"""
+        lag = self.lag_seconds
+        return {
+            'path': self.name,
+            'records': self.records,
+            'backlog_bytes': self.tailer.backlog_bytes,
+            'last_event_ts': self.last_event_ts,
+            'lag_seconds': round(lag, 3) if lag is not None else None,
+            'event_driven': self.tailer.event_driven,
+            'log_rotations': self.tailer.rotations,
+            'malformed_lines': self.parser.malformed,
+        }
+
+    def close(self):
+        self.tailer.close()
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Log Tailer for Zeek Logs
+Follows a growing log file across rotations, waking on inotify events
+(with adaptive polling as fallback) and handing off complete lines only
+"""
+
+import asyncio
+import ctypes
+import ctypes.util
+import hashlib
+import logging
+import os
+import struct
+from pathlib import Path
+from typing import Dict, Optional
+
+# inotify event masks (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+               IN_CREATE | IN_DELETE)
+_EVENT_HEADER = struct.Struct('iIII')
+
+# Leading bytes that identify a file's content, so a truncated file that was
+# refilled past the old offset between two reads is not resumed mid-record
+HEAD_BYTES = 1024
+
+
+class _Inotify:
+    """Minimal ctypes binding for a single inotify directory watch"""
+
+    def __init__(self, directory: Path):
+        libc_name = ctypes.util.find_library('c')
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError("inotify not available on this platform")
+
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        wd = libc.inotify_add_watch(self.fd, str(directory).encode(), _WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {directory}")
+
+    def read_names(self) -> set:
+        """Drain pending events and return the file names they refer to"""
+        names = set()
+        while True:
+            try:
+                buf = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not buf:
+                break
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(buf):
+                _, _, _, name_len = _EVENT_HEADER.unpack_from(buf, offset)
+                offset += _EVENT_HEADER.size
+                names.add(buf[offset:offset + name_len].rstrip(b'\0').decode(errors='replace'))
+                offset += name_len
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class LogTailer:
+    """Follow a log file by device/inode, surviving rotation and truncation"""
+
+    def __init__(self,
+                 path: str,
+                 start_at_end: bool = True,
+                 min_poll_interval: float = 0.05,
+                 max_poll_interval: float = 5.0,
+                 use_inotify: bool = True):
+        """
+        Initialize the tailer
+
+        Args:
+            path: Path to the log file to follow
+            start_at_end: Skip existing content and only hand off new lines
+            min_poll_interval: Shortest sleep between polls when data is flowing
+            max_poll_interval: Longest sleep between polls (and inotify safety timeout)
+            use_inotify: Wake on inotify events when the platform supports it
+        """
+        self.path = Path(path)
+        self.min_poll_interval = min_poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.use_inotify = use_inotify
+
+        self.logger = logging.getLogger(__name__)
+
+        self._fh = None
+        self._dev: Optional[int] = None
+        self._ino: Optional[int] = None
+        self._head = b''  # First bytes of the followed file (up to HEAD_BYTES)
+        self._size = 0  # File size at the last check
+        self._pending = b''
+        self._interval = min_poll_interval
+        self._inotify: Optional[_Inotify] = None
+        self._event: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.rotations = 0
+        # Recorded by whichever thread reads, so status readers never touch the file handle
+        self.backlog_bytes = 0
+        self._open(seek_end=start_at_end)
+
+    @property
+    def position(self) -> int:
+        """Byte offset in the current file up to the last line handed off"""
+        if self._fh is None:
+            return 0
+        return self._fh.tell() - len(self._pending)
+
+    @property
+    def inode(self) -> Optional[tuple]:
+        """(device, inode) of the file currently being followed"""
+        if self._ino is None:
+            return None
+        return (self._dev, self._ino)
+
+    @property
+    def event_driven(self) -> bool:
+        """Whether the tailer is woken by inotify rather than polling"""
+        return self._inotify is not None
+
+    def _open(self, seek_end: bool = False) -> bool:
+        """Open the path and remember its identity"""
+        try:
+            fh = open(self.path, 'rb')
+        except FileNotFoundError:
+            return False
+
+        st = os.fstat(fh.fileno())
+        if seek_end:
+            fh.seek(0, os.SEEK_END)
+        self._fh = fh
+        self._dev, self._ino = st.st_dev, st.st_ino
+        self._remember_content(st.st_size)
+        self.backlog_bytes = self._measure_backlog()
+        self.logger.info(f"Following {self.path} (inode {self._ino}, offset {fh.tell()})")
+        return True
+
+    def _close_file(self):
+        if self._fh is not None:
+            self._fh.close()
+        self._fh = None
+        self._dev = self._ino = None
+        self._head = b''
+        self._size = 0
+        self.backlog_bytes = 0
+
+    def _read_head(self, fh=None) -> bytes:
+        fh = fh or self._fh
+        return os.pread(fh.fileno(), HEAD_BYTES, 0)
+
+    def _remember_content(self, size: int):
+        """Record the size and, until it is complete, the head of the followed file"""
+        self._size = size
+        if len(self._head) < HEAD_BYTES:
+            self._head = self._read_head()
+
+    def _truncated(self, size: int) -> bool:
+        """Whether the followed file was truncated since the last check, even if refilled since"""
+        if size < self._size or size < self._fh.tell():
+            return True
+        # Truncated and rewritten past our offset: the size alone cannot tell
+        return bool(self._head) and self._read_head()[:len(self._head)] != self._head
+
+    @staticmethod
+    def _digest(head: bytes) -> str:
+        return hashlib.sha256(head).hexdigest()
+
+    def state(self) -> Dict:
+        """Resumable position: file identity plus offset of the last line handed off"""
+        return {
+            'path': str(self.path),
+            'device': self._dev,
+            'inode': self._ino,
+            'offset': self.position,
+            # Content fingerprint: the inode survives truncation (copytruncate)
+            'head_size': len(self._head),
+            'head_digest': self._digest(self._head),
+        }
+
+    def restore(self, state: Dict) -> bool:
+        """
+        Resume from a saved state()
+
+        If the file was rotated while we were down, the old inode is looked
+        up next to the log and drained from the saved offset before moving
+        on to the current file. A file with the saved inode whose leading
+        bytes changed was truncated and rewritten, so it is not resumed.
+        """
+        if state.get('inode') is None:
+            return False
+
+        identity = (state['device'], state['inode'])
+        candidates = [self.path]
+        if self.path.parent.exists():
+            candidates += sorted(p for p in self.path.parent.iterdir() if p != self.path)
+
+        for candidate in candidates:
+            try:
+                st = os.stat(candidate)
+            except OSError:
+                continue
+            if (st.st_dev, st.st_ino) != identity or st.st_size < state['offset']:
+                continue
+
+            fh = open(candidate, 'rb')
+            head = self._read_head(fh)[:state.get('head_size', 0)]
+            if state.get('head_digest') is not None and self._digest(head) != state['head_digest']:
+                fh.close()
+                self.logger.warning(f"{candidate} was rewritten since the checkpoint (inode {state['inode']})")
+                continue
+
+            self._close_file()
+            self._pending = b''
+            fh.seek(state['offset'])
+            self._fh = fh
+            self._dev, self._ino = identity
+            self._remember_content(st.st_size)
+            self.backlog_bytes = self._measure_backlog()
+            self.logger.info(f"Resumed {candidate} at offset {state['offset']}")
+            return True
+
+        # Saved file is gone or rewritten: read the current one from the start rather than skip it
+        self.logger.warning(
+            f"Checkpointed inode {state['inode']} not found or rewritten, reading {self.path} from start"
+        )
+        self._close_file()
+        self._pending = b''
+        self._open()
+        return False
+
+    def _measure_backlog(self) -> int:
+        """Bytes written to the current file but not yet handed off (reading thread only)"""
+        if self._fh is None:
+            return 0
+        size = os.fstat(self._fh.fileno()).st_size
+        return max(size - self._fh.tell(), 0) + len(self._pending)
+
+    @property
+    def has_backlog(self) -> bool:
+        """Whether another read() would return data without waiting"""
+        if self._fh is None:
+            return False
+        if b'\n' in self._pending or self._measure_backlog() > len(self._pending):
+            return True
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        return (st.st_dev, st.st_ino) != (self._dev, self._ino)
+
+    def _read_bounded(self, max_bytes: Optional[int]) -> bytes:
+        """Read up to max_bytes, extending to the next newline if none was seen"""
+        if max_bytes is None:
+            return self._fh.read()
+
+        chunks = [self._fh.read(max_bytes)]
+        if b'\n' in self._pending or b'\n' in chunks[0]:
+            return chunks[0]
+        # A single line longer than the budget still has to make progress
+        while len(chunks[-1]) == max_bytes:
+            chunks.append(self._fh.read(max_bytes))
+            if b'\n' in chunks[-1]:
+                break
+        return b''.join(chunks)
+
+    def read(self, max_bytes: Optional[int] = None, max_lines: Optional[int] = None) -> bytes:
+        """
+        Read new complete lines since the last call
+
+        After a rotation the remainder of the old file is drained before
+        switching to the new one. A trailing partial line, and anything
+        beyond max_bytes/max_lines, is carried over to the next call.
+
+        Args:
+            max_bytes: Upper bound on bytes read from disk per call
+            max_lines: Upper bound on lines handed off per call
+        """
+        if self._fh is None and not self._open():
+            return b''
+
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            st = None
+
+        rotated = st is not None and (st.st_dev, st.st_ino) != (self._dev, self._ino)
+        if not rotated and st is not None:
+            if self._truncated(st.st_size):
+                self.logger.warning(f"Log file truncated ({self._fh.tell()} -> {st.st_size} bytes), rewinding")
+                self._fh.seek(0)
+                self._pending = b''
+                self._head = b''
+            self._remember_content(st.st_size)
+
+        if max_lines is not None and self._pending.count(b'\n') >= max_lines:
+            # Enough carried-over lines already; don't grow the buffer further
+            data = self._pending
+        else:
+            data = self._pending + self._read_bounded(max_bytes)
+        at_eof = self._fh.tell() >= os.fstat(self._fh.fileno()).st_size
+        if rotated and at_eof and data and not data.endswith(b'\n'):
+            # The old inode is finished, so its unterminated tail is a full line
+            data += b'\n'
+
+        cut = data.rfind(b'\n') + 1
+        if max_lines is not None and data.count(b'\n', 0, cut) > max_lines:
+            cut = 0
+            for _ in range(max_lines):
+                cut = data.index(b'\n', cut) + 1
+        self._pending = data[cut:]
+        data = data[:cut]
+
+        if rotated and at_eof and not self._pending:
+            # Old file fully handed off: switch to the new inode
+            self.logger.info(f"Log file rotated (inode {self._ino} -> {st.st_ino}), switching")
+            self.rotations += 1
+            self._close_file()
+            self._open()
+
+        # Adaptive polling: speed up while data flows, back off when idle
+        if data:
+            self._interval = self.min_poll_interval
+        else:
+            self._interval = min(self._interval * 2, self.max_poll_interval)
+
+        self.backlog_bytes = self._measure_backlog()
+        return data
+
+    def _setup_inotify(self):
+        """Start watching the log directory if inotify is usable"""
+        if not self.use_inotify or self._inotify is not None:
+            return
+        try:
+            self._inotify = _Inotify(self.path.parent)
+            self._loop = asyncio.get_running_loop()
+            self._event = asyncio.Event()
+            self._loop.add_reader(self._inotify.fd, self._on_inotify)
+            self.logger.info(f"Watching {self.path.parent} with inotify")
+        except (OSError, NotImplementedError, AttributeError) as e:
+            self.logger.info(f"inotify unavailable ({e}), using adaptive polling")
+            if self._inotify is not None:
+                self._inotify.close()
+                self._inotify = None
+            self.use_inotify = False
+
+    def _on_inotify(self):
+        if self.path.name in self._inotify.read_names():
+            self._event.set()
+
+    async def wait(self):
+        """Wait until the log file may have new data"""
+        if self._inotify is None and self.use_inotify and self.path.parent.exists():
+            self._setup_inotify()
+
+        if self._inotify is None:
+            await asyncio.sleep(self._interval)
+            return
+
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout=self.max_poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        self._event.clear()
+
+    def close(self):
+        """Release the file handle and inotify watch"""
+        if self._inotify is not None:
+            if self._loop is not None:
+                self._loop.remove_reader(self._inotify.fd)
+            self._inotify.close()
+            self._inotify = None
+        self._close_file()
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Event-Time Windowing for the Real-time Detector
+Aggregates records per tumbling window and register and releases each
+window exactly once, when the watermark derived from record timestamps has
+passed its end
+
+With several sources the watermark follows the slowest active one, so a
+sensor log that catches up faster cannot push windows closed before the
+records of a slower one arrive.
+"""
+
+import logging
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from feature_library import RegisterAggregates, flatten_values, register_value
+
+# Closed window: (window_id, aggregates of all its registers)
+ClosedWindow = Tuple[int, RegisterAggregates]
+
+
+class WindowRecords(NamedTuple):
+    """Columns of a parsed batch needed for windowing, extracted once per batch"""
+    ts: np.ndarray
+    src: np.ndarray
+    dst: np.ndarray
+    address: np.ndarray
+    value: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    def take(self, mask: np.ndarray) -> 'WindowRecords':
+        return WindowRecords(*(column[mask] for column in self))
+
+
+def window_records(data: pd.DataFrame) -> WindowRecords:
+    """
+    Extract the windowing columns of a parsed batch
+
+    Done once per batch and shared by every window size.
+    """
+    data = data.dropna(subset=['ts'])
+    n = len(data)
+    if 'response_values' in data.columns:
+        value = register_value(*flatten_values(data['response_values']))
+    else:
+        value = np.zeros(n)
+    if 'address' in data.columns:
+        address = pd.to_numeric(data['address'], errors='coerce').to_numpy(dtype=np.float64)
+    else:
+        address = np.full(n, np.nan)
+    return WindowRecords(
+        ts=data['ts'].to_numpy(dtype=np.float64),
+        src=data['src'].to_numpy(),
+        dst=data['dst'].to_numpy(),
+        address=address,
+        value=value,
+    )
+
+
+class EventTimeWindower:
+    """Tumbling event-time windows closed by a watermark"""
+
+    def __init__(self,
+                 window_seconds: int = 300,
+                 allowed_lateness: float = 10.0,
+                 idle_timeout: Optional[float] = 60.0,
+                 max_registers: Optional[int] = None):
+        """
+        Initialize the windower
+
+        Args:
+            window_seconds: Window size in seconds
+            allowed_lateness: How far (seconds of event time) records may arrive
+                              out of order before their window is closed
+            idle_timeout: Close all open windows after this many wall-clock seconds
+                          without new records (None = only close on event time)
+            max_registers: Registers tracked per open window before cold ones
+                           are evicted (None = unbounded)
+        """
+        self.window_seconds = window_seconds
+        self.allowed_lateness = allowed_lateness
+        self.idle_timeout = idle_timeout
+        self.max_registers = max_registers
+        self.logger = logging.getLogger(__name__)
+
+        self.max_event_ts: Optional[float] = None
+        self.source_event_ts: Dict[Optional[str], float] = {}  # Newest record per source
+        self._source_arrival: Dict[Optional[str], float] = {}  # Wall clock of each source's last records
+        self.next_open_window: Optional[int] = None  # Windows below this id are closed
+        self.late_records = 0
+        self.evicted_registers = 0  # In windows already closed
+        self._open: Dict[int, RegisterAggregates] = {}
+        self._last_arrival = time.monotonic()
+
+    @property
+    def watermark(self) -> Optional[float]:
+        """
+        Event time up to which all records are assumed to have arrived
+
+        The newest record of the slowest active source, less the allowed
+        lateness. An expected source that has not delivered yet holds it back
+        as well; a source without records for idle_timeout no longer does.
+        """
+        if self.max_event_ts is None:
+            return None
+        sources = dict(self.source_event_ts)
+        if self.idle_timeout is not None:
+            now = time.monotonic()
+            active = [source for source, arrival in list(self._source_arrival.items())
+                      if now - arrival < self.idle_timeout]
+            if any(source not in sources for source in active):
+                return None
+            sources = {source: sources[source] for source in active} or sources
+        return min(sources.values(), default=self.max_event_ts) - self.allowed_lateness
+
+    def expect_sources(self, sources: List[str]):
+        """Hold the watermark for sources that have not delivered records yet (up to idle_timeout)"""
+        now = time.monotonic()
+        for source in sources:
+            self._source_arrival.setdefault(source, now)
+
+    @property
+    def open_windows(self) -> List[int]:
+        return sorted(self._open)
+
+    @property
+    def buffered_records(self) -> int:
+        return sum(aggregates.reads for aggregates in list(self._open.values()))
+
+    @property
+    def registers(self) -> int:
+        """Registers tracked across open windows"""
+        return sum(len(aggregates) for aggregates in list(self._open.values()))
+
+    def add(self, records: WindowRecords,
+            progress: Optional[Dict[Optional[str], float]] = None) -> List[ClosedWindow]:
+        """
+        Fold a batch into the open windows and return the windows it closed
+
+        Records for a window that was already emitted are dropped and
+        counted in late_records.
+
+        Args:
+            records: Batch of records, possibly merged from several sources
+            progress: Newest record timestamp per source in the batch
+                      (None = a single unnamed source)
+        """
+        if not len(records):
+            return []
+        self._last_arrival = time.monotonic()
+        if progress is None:
+            progress = {None: float(np.nanmax(records.ts))}
+        for source, source_ts in progress.items():
+            self.source_event_ts[source] = max(self.source_event_ts.get(source, source_ts), source_ts)
+            self._source_arrival[source] = self._last_arrival
+
+        window_ids = np.floor_divide(records.ts, self.window_seconds).astype(np.int64)
+        if self.next_open_window is not None:
+            late = window_ids < self.next_open_window
+            if late.any():
+                self.late_records += int(late.sum())
+                self.logger.debug(f"Dropped {int(late.sum())} records behind the watermark")
+                records, window_ids = records.take(~late), window_ids[~late]
+                if not len(records):
+                    return []
+
+        # A batch usually spans one or two windows
+        for window_id in np.unique(window_ids).tolist():
+            mask = window_ids == window_id
+            aggregates = self._open.get(window_id)
+            if aggregates is None:
+                aggregates = self._open[window_id] = RegisterAggregates(self.max_registers)
+            batch = records.take(mask)
+            aggregates.update(window_ids[mask], batch.src, batch.dst, batch.address, batch.ts, batch.value)
+
+        batch_max = float(records.ts.max())
+        self.max_event_ts = batch_max if self.max_event_ts is None else max(self.max_event_ts, batch_max)
+
+        return self._close_until(self.watermark)
+
+    def open_aggregates(self) -> List[ClosedWindow]:
+        """Running aggregates of the open windows, oldest first (not closed)"""
+        return [(window_id, self._open[window_id]) for window_id in sorted(self._open)]
+
+    def flush_idle(self) -> List[ClosedWindow]:
+        """Close every open window if no records arrived within idle_timeout"""
+        if self.idle_timeout is None or not self._open:
+            return []
+        if time.monotonic() - self._last_arrival < self.idle_timeout:
+            return []
+        self.logger.info(f"No records for {self.idle_timeout:.0f}s, closing {len(self._open)} open window(s)")
+        return self.flush()
+
+    def flush(self) -> List[ClosedWindow]:
+        """Close every open window (end of replay or idle sources)"""
+        if not self._open:
+            return []
+        return self._close_until((max(self._open) + 1) * self.window_seconds)
+
+    def _close_until(self, watermark: Optional[float]) -> List[ClosedWindow]:
+        """Emit open windows whose end is at or before the watermark"""
+        if watermark is None:
+            return []
+        # Window w covers [w * size, (w + 1) * size)
+        first_open = int(np.floor(watermark / self.window_seconds))
+        if self.next_open_window is None or first_open > self.next_open_window:
+            self.next_open_window = first_open
+
+        closed = [(window_id, self._open.pop(window_id))
+                  for window_id in sorted(w for w in self._open if w < self.next_open_window)]
+        for window_id, aggregates in closed:
+            if aggregates.evicted:
+                self.evicted_registers += aggregates.evicted
+                self.logger.warning(f"Window {window_id}: evicted {aggregates.evicted} cold registers "
+                                    f"(more than {self.max_registers} registers tracked)")
+        return closed
+
+    def state(self) -> Dict:
+        """Open windows and watermark for checkpointing"""
+        return {
+            'max_event_ts': self.max_event_ts,
+            'source_event_ts': [[source, ts] for source, ts in self.source_event_ts.items()],
+            'next_open_window': self.next_open_window,
+            'late_records': self.late_records,
+            'evicted_registers': self.evicted_registers,
+            'open': [[window_id, aggregates.state()] for window_id, aggregates in self._open.items()],
+        }
+
+    def restore(self, state: Dict):
+        """Resume from a saved state()"""
+        self.max_event_ts = state['max_event_ts']
+        self.source_event_ts = {source: ts for source, ts in state['source_event_ts']}
+        now = time.monotonic()
+        self._source_arrival.update({source: now for source in self.source_event_ts})
+        self.next_open_window = state['next_open_window']
+        self.late_records = state['late_records']
+        self.evicted_registers = state['evicted_registers']
+        self._open = {}
+        for window_id, aggregates_state in state['open']:
+            aggregates = self._open[window_id] = RegisterAggregates(self.max_registers)
+            aggregates.restore(aggregates_state)
+        self._last_arrival = time.monotonic()
+
+    def get_status(self) -> Dict:
+        # Read from the event loop while a pipeline worker folds batches: iterate copies
+        watermark = self.watermark
+        return {
+            'watermark': round(watermark, 3) if watermark is not None else None,
+            'watermark_sources': len(self.source_event_ts),
+            'open_windows': self.open_windows,
+            'buffered_records': self.buffered_records,
+            'registers': self.registers,
+            'late_records': self.late_records,
+            'evicted_registers': self.evicted_registers + sum(a.evicted for a in list(self._open.values())),
+        }
@@ -2,10 +2,14 @@
 """
 Advanced Feature Extraction for ICS Anomaly Detection
 Uses register values, temporal patterns, and behavioral analysis
+
+The feature definitions live in modbus_features.py, which the real-time
+detector uses as well, so the model is served the features it was trained on.
 """
 
 import pandas as pd
-import numpy as np
+import pyarrow as pa
+import pyarrow.json as pa_json
 import argparse
 import glob
 import logging
@@ -14,6 +18,8 @@ import sys
 import json
 from collections import defaultdict
 
+import modbus_features
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s'
@@ -21,8 +27,36 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def load_zeek_tsv(log_file):
+    """
+    Load a Zeek native TSV log using its #fields/#types header
+    Read by modbus_features.ZeekTsvReader, the detector's TSV parser
+    """
+    reader = modbus_features.ZeekTsvReader()
+    table = reader.read_file(log_file)
+    if reader.malformed:
+        logger.warning(f"  Skipped {reader.malformed:,} malformed lines")
+    if table is None:
+        raise ValueError(f"No records in {log_file}")
+    return modbus_features.arrow_to_pandas(table)
+
+
+def load_zeek_json(log_file):
+    """
+    Load a Zeek JSON log with Arrow's JSON reader
+    response_values is decoded straight into flat values plus offsets
+    """
+    table = pa_json.read_json(
+        log_file,
+        parse_options=pa_json.ParseOptions(
+            explicit_schema=pa.schema([('response_values', modbus_features.VALUES_TYPE)])
+        )
+    )
+    return modbus_features.arrow_to_pandas(table)
+
+
 def load_detailed_logs(log_pattern):
-    """Load modbus_detailed logs which have register values"""
+    """Load modbus_detailed logs which have register values (JSON or native TSV)"""
     log_files = glob.glob(log_pattern)
     
     if not log_files:
@@ -34,7 +68,9 @@ def load_detailed_logs(log_pattern):
     for log_file in sorted(log_files):
         logger.info(f"Loading {log_file}...")
         try:
-            df = pd.read_json(log_file, lines=True)
+            with open(log_file, 'rb') as f:
+                is_tsv = f.read(1) == b'#'
+            df = load_zeek_tsv(log_file) if is_tsv else load_zeek_json(log_file)
             logger.info(f"  Loaded {len(df):,} records")
             dfs.append(df)
         except Exception as e:
@@ -54,69 +90,9 @@ def extract_register_features(df, window_seconds=300):
     """
     logger.info(f"Extracting register features (window={window_seconds}s)...")
     
-    # Parse response_values if they're strings
-    if 'response_values' in df.columns:
-        df['value_0'] = df['response_values'].apply(lambda x: x[0] if len(x) > 0 else 0)
-        df['value_1'] = df['response_values'].apply(lambda x: x[1] if len(x) > 1 else 0)
-    
-    df['time_window'] = (df['ts'] // window_seconds).astype('int64')
-    
-    features_list = []
-    
-    # Group by device pair and address (each register)
-    grouped = df.groupby(['time_window', 'id.orig_h', 'id.resp_h', 'address'])
-    
-    for (window, src, dst, addr), group in grouped:
-        if len(group) < 3:  # Need enough samples
-            continue
-        
-        # Register value statistics
-        values = group['value_1'].values  # Main value typically in position 1
-        
-        feature = {
-            'time_window': window,
-            'src': src,
-            'dst': dst,
-            'address': addr,
-            
-            # Value statistics
-            'value_mean': np.mean(values),
-            'value_std': np.std(values),
-            'value_min': np.min(values),
-            'value_max': np.max(values),
-            'value_range': np.max(values) - np.min(values),
-            
-            # Volatility (how much it changes)
-            'value_changes': np.sum(np.diff(values) != 0),
-            'value_change_rate': np.sum(np.diff(values) != 0) / len(values),
-            
-            # Read frequency
-            'read_count': len(group),
-            'read_rate': len(group) / window_seconds,
-            
-            # Timing statistics
-            'inter_read_mean': np.mean(np.diff(group['ts'])),
-            'inter_read_std': np.std(np.diff(group['ts'])) if len(group) > 2 else 0,
-        }
-        
-        # Check for anomalous patterns
-        # 1. Sudden value jumps (>3 std devs)
-        if len(values) > 10:
-            z_scores = np.abs((values - np.mean(values)) / (np.std(values) + 1e-6))
-            feature['outlier_count'] = np.sum(z_scores > 3)
-            feature['max_z_score'] = np.max(z_scores)
-        else:
-            feature['outlier_count'] = 0
-            feature['max_z_score'] = 0
-        
-        # 2. Unusual value patterns (constant when should vary, or vice versa)
-        feature['unique_values'] = len(np.unique(values))
-        feature['entropy'] = -np.sum(np.histogram(values, bins=10)[0] / len(values) * 
-                                     np.log(np.histogram(values, bins=10)[0] / len(values) + 1e-10))
-        
-        features_list.append(feature)
-    
-    features_df = pd.DataFrame(features_list)
+    features_df = modbus_features.register_features(
+        df, window_seconds, src_column='id.orig_h', dst_column='id.resp_h'
+    )
     
     logger.info(f"Extracted {len(features_df):,} register-level feature vectors")
     
@@ -130,38 +106,7 @@ def aggregate_to_device_pairs(register_features):
     """
     logger.info("Aggregating to device-pair level...")
     
-    grouped = register_features.groupby(['time_window', 'src', 'dst'])
-    
-    agg_features = grouped.agg({
-        # Register statistics
-        'value_mean': ['mean', 'std', 'min', 'max'],
-        'value_std': ['mean', 'max'],
-        'value_range': ['mean', 'max'],
-        'value_changes': 'sum',
-        'value_change_rate': 'mean',
-        
-        # Read patterns
-        'read_count': 'sum',
-        'read_rate': 'mean',
-        'inter_read_mean': 'mean',
-        'inter_read_std': 'mean',
-        
-        # Anomaly indicators
-        'outlier_count': 'sum',
-        'max_z_score': 'max',
-        'unique_values': 'mean',
-        'entropy': 'mean',
-        
-        # Number of registers accessed
-        'address': 'nunique',
-    })
-    
-    # Flatten column names
-    agg_features.columns = ['_'.join(col).strip('_') for col in agg_features.columns]
-    agg_features = agg_features.reset_index()
-    
-    # Rename for clarity
-    agg_features = agg_features.rename(columns={'address_nunique': 'registers_accessed'})
+    agg_features = modbus_features.aggregate_to_device_pairs(register_features)
     
     logger.info(f"Aggregated to {len(agg_features):,} device-pair feature vectors")
     
@@ -175,27 +120,7 @@ def add_temporal_context(features_df):
     """
     logger.info("Adding temporal context features...")
     
-    features_df = features_df.sort_values(['src', 'dst', 'time_window'])
-    
-    # For each device pair, compute rolling statistics
-    for (src, dst), group in features_df.groupby(['src', 'dst']):
-        mask = (features_df['src'] == src) & (features_df['dst'] == dst)
-        
-        # Rolling window of last 5 time windows (for baseline)
-        for col in ['value_mean_mean', 'read_count_sum', 'value_change_rate_mean']:
-            if col in features_df.columns:
-                rolling = features_df.loc[mask, col].rolling(window=5, min_periods=1)
-                
-                features_df.loc[mask, f'{col}_rolling_mean'] = rolling.mean()
-                features_df.loc[mask, f'{col}_rolling_std'] = rolling.std()
-                
-                # Deviation from baseline
-                baseline = rolling.mean().shift(1)  # Previous baseline
-                features_df.loc[mask, f'{col}_deviation'] = (
-                    (features_df.loc[mask, col] - baseline) / (baseline + 1)
-                )
-    
-    features_df = features_df.fillna(0)
+    features_df = modbus_features.add_temporal_context(features_df)
     
     logger.info("Temporal context added")
     
@@ -208,7 +133,7 @@ def main():
     )
     parser.add_argument(
         'log_pattern',
-        help='Pattern for modbus_detailed log files'
+        help='Pattern for modbus_detailed log files (Zeek JSON or TSV)'
     )
     parser.add_argument(
         '--output',
@@ -0,0 +1,767 @@
+#!/usr/bin/env python3
+"""
+Modbus Feature Library
+Single, vectorized definition of the behavioral features used both to train
+the model (extract_features.py) and to score live traffic (detector)
+
+Features are built in three steps:
+1. Register level: per (time_window, src, dst, address) statistics of the
+   main register value (response_values[1]) and read timing. The state is
+   mergeable, so logs can be folded in one shot or batch by batch.
+2. Device-pair level: register features aggregated per (time_window, src, dst)
+3. Temporal context: each pair's metrics compared with its recent windows
+
+Zeek's native TSV logs are read by the same code on both sides as well
+(ZeekTsvReader), so column types, unset fields and register value lists
+are decoded identically.
+"""
+
+import io
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+
+from modbus_kernels import histogram_stats
+
+# Register groups with fewer reads are too small for statistics
+MIN_REGISTER_READS = 3
+# Z-score outliers are only counted for registers with more reads than this
+OUTLIER_MIN_READS = 10
+ENTROPY_BINS = 10
+
+# Windows in the rolling baseline of the temporal features
+ROLLING_WINDOWS = 5
+TEMPORAL_METRICS = ['value_mean_mean', 'read_count_sum', 'value_change_rate_mean']
+
+REGISTER_FEATURES = [
+    'value_mean', 'value_std', 'value_min', 'value_max', 'value_range',
+    'value_changes', 'value_change_rate', 'read_count', 'read_rate',
+    'inter_read_mean', 'inter_read_std', 'outlier_count', 'max_z_score',
+    'unique_values', 'entropy',
+]
+
+# Register feature -> aggregations at device-pair level
+PAIR_AGGREGATIONS = {
+    # Register statistics
+    'value_mean': ['mean', 'std', 'min', 'max'],
+    'value_std': ['mean', 'max'],
+    'value_range': ['mean', 'max'],
+    'value_changes': 'sum',
+    'value_change_rate': 'mean',
+
+    # Read patterns
+    'read_count': 'sum',
+    'read_rate': 'mean',
+    'inter_read_mean': 'mean',
+    'inter_read_std': 'mean',
+
+    # Anomaly indicators
+    'outlier_count': 'sum',
+    'max_z_score': 'max',
+    'unique_values': 'mean',
+    'entropy': 'mean',
+
+    # Number of registers accessed
+    'address': 'nunique',
+}
+
+BASE_FEATURES = [
+    'value_mean_mean', 'value_mean_std', 'value_mean_min', 'value_mean_max',
+    'value_std_mean', 'value_std_max', 'value_range_mean', 'value_range_max',
+    'value_changes_sum', 'value_change_rate_mean', 'read_count_sum', 'read_rate_mean',
+    'inter_read_mean_mean', 'inter_read_std_mean', 'outlier_count_sum', 'max_z_score_max',
+    'unique_values_mean', 'entropy_mean', 'registers_accessed',
+]
+
+TEMPORAL_FEATURES = [
+    f'{metric}_{suffix}'
+    for metric in TEMPORAL_METRICS
+    for suffix in ('rolling_mean', 'rolling_std', 'deviation')
+]
+
+FEATURE_COLUMNS = BASE_FEATURES + TEMPORAL_FEATURES
+KEY_COLUMNS = ['time_window', 'src', 'dst']
+
+# Modbus registers are 16-bit; response_values is kept as an Arrow list
+# (one flat int32 value buffer plus row offsets) instead of Python lists
+VALUES_COLUMN = 'response_values'
+VALUES_TYPE = pa.list_(pa.int32())
+
+
+def arrow_to_pandas(table: pa.Table) -> pd.DataFrame:
+    """
+    Convert a parsed log table to pandas with response_values as VALUES_TYPE
+
+    List columns stay Arrow-backed (pd.ArrowDtype), so no Python list is
+    created per record; flatten_values reads their buffers directly.
+    """
+    index = table.schema.get_field_index(VALUES_COLUMN)
+    if index != -1 and table.schema.field(index).type != VALUES_TYPE:
+        table = table.set_column(index, VALUES_COLUMN, table.column(index).cast(VALUES_TYPE))
+    return table.to_pandas(types_mapper=lambda t: pd.ArrowDtype(t) if pa.types.is_list(t) else None)
+
+
+# Zeek TSV type names -> Arrow types (containers are parsed separately)
+ZEEK_TYPES = {
+    'time': pa.float64(),
+    'interval': pa.float64(),
+    'double': pa.float64(),
+    'count': pa.int64(),
+    'int': pa.int64(),
+    'port': pa.int64(),
+    'bool': pa.bool_(),
+}
+
+
+def zeek_arrow_type(zeek_type: str) -> pa.DataType:
+    """Map a Zeek #types entry to the Arrow type of the parsed column"""
+    if zeek_type.startswith(('vector[', 'set[')):
+        inner = zeek_type[zeek_type.index('[') + 1:-1]
+        return pa.list_(ZEEK_TYPES.get(inner, pa.string()))
+    return ZEEK_TYPES.get(zeek_type, pa.string())
+
+
+def parse_zeek_container(column: pa.Array, value_type: pa.DataType,
+                         set_separator: str = ',', empty_field: str = '(empty)') -> pa.ListArray:
+    """
+    Vectorized parse of a Zeek vector/set column ("1,2,3") into a list array
+
+    Unset fields (null) stay null, empty containers become empty lists.
+    """
+    if isinstance(column, pa.ChunkedArray):
+        column = column.combine_chunks()
+    is_null = column.is_null()
+    text = pc.fill_null(column, '')
+    text = pc.if_else(pc.equal(text, empty_field), '', text)
+
+    parts = pc.split_pattern(text, set_separator)
+    lengths = pc.if_else(pc.equal(text, ''), 0, pc.list_value_length(parts))
+    flat = pc.list_flatten(parts)
+    flat = flat.filter(pc.not_equal(flat, ''))
+
+    offsets = np.zeros(len(column) + 1, dtype=np.int32)
+    np.cumsum(lengths.to_numpy(zero_copy_only=False), out=offsets[1:])
+    return pa.ListArray.from_arrays(
+        pa.array(offsets),
+        flat.cast(value_type),
+        mask=is_null
+    )
+
+
+class ZeekTsvReader:
+    """
+    Zeek native TSV logs parsed with Arrow's CSV reader using the #fields/#types header
+
+    Header lines are applied wherever they appear (a rotated log starts a new
+    header block, #close ends it), so the same reader loads whole training
+    logs and parses the detector's tailed batches.
+    """
+
+    def __init__(self):
+        self.fields: Optional[List[str]] = None
+        self.types: Optional[List[str]] = None
+        self.separator = '\t'
+        self.set_separator = ','
+        self.empty_field = '(empty)'
+        self.unset_field = '-'
+        self.malformed = 0
+        self.logger = logging.getLogger(__name__)
+
+    def _header_line(self, line: str):
+        """Update parser state from a '#' header line"""
+        if line.startswith('#separator '):
+            self.separator = line.split(' ', 1)[1].encode().decode('unicode_escape')
+            return
+
+        key, *values = line[1:].split(self.separator)
+        if key == 'fields':
+            self.fields = values
+        elif key == 'types':
+            self.types = values
+        elif key == 'set_separator' and values:
+            self.set_separator = values[0]
+        elif key == 'empty_field' and values:
+            self.empty_field = values[0]
+        elif key == 'unset_field' and values:
+            self.unset_field = values[0]
+
+    def prime(self, path: Path):
+        """Read the header of an existing log so a mid-file start can be parsed"""
+        with open(path, 'r', errors='replace') as f:
+            for line in f:
+                if not line.startswith('#'):
+                    break
+                self._header_line(line.rstrip('\n'))
+
+    def _column_types(self) -> Dict[str, pa.DataType]:
+        column_types = {}
+        for field, zeek_type in zip(self.fields, self.types or []):
+            arrow_type = zeek_arrow_type(zeek_type)
+            # Containers are read as text, then split in _read_body
+            column_types[field] = pa.string() if pa.types.is_list(arrow_type) else arrow_type
+        return column_types
+
+    def _read_body(self, body: bytes) -> Optional[pa.Table]:
+        """Parse header-less TSV rows with the current #fields/#types"""
+        if self.fields is None:
+            self.logger.warning("TSV data without #fields header, skipping batch")
+            self.malformed += body.count(b'\n')
+            return None
+
+        def skip_invalid(row):
+            self.malformed += 1
+            return 'skip'
+
+        table = pa_csv.read_csv(
+            io.BytesIO(body),
+            read_options=pa_csv.ReadOptions(
+                column_names=self.fields,
+                block_size=max(len(body), 1 << 20)
+            ),
+            parse_options=pa_csv.ParseOptions(
+                delimiter=self.separator,
+                quote_char=False,
+                double_quote=False,
+                invalid_row_handler=skip_invalid
+            ),
+            convert_options=pa_csv.ConvertOptions(
+                column_types=self._column_types(),
+                null_values=[self.unset_field],
+                true_values=['T'],
+                false_values=['F'],
+                strings_can_be_null=True
+            )
+        )
+
+        for i, (field, zeek_type) in enumerate(zip(self.fields, self.types or [])):
+            arrow_type = zeek_arrow_type(zeek_type)
+            if pa.types.is_list(arrow_type):
+                table = table.set_column(i, field, parse_zeek_container(
+                    table.column(i), arrow_type.value_type,
+                    self.set_separator, self.empty_field
+                ))
+        return table
+
+    def parse_table(self, data: bytes) -> Optional[pa.Table]:
+        """Parse a buffer of TSV lines, applying any header lines it contains"""
+        tables = []
+        body_start = 0
+        pos = 0 if data.startswith(b'#') else data.find(b'\n#')
+        while pos != -1:
+            line_start = pos if data[pos:pos + 1] == b'#' else pos + 1
+            if line_start > body_start:
+                tables.append(self._read_body(data[body_start:line_start]))
+            line_end = data.find(b'\n', line_start)
+            line_end = len(data) if line_end == -1 else line_end
+            self._header_line(data[line_start:line_end].decode(errors='replace'))
+            body_start = line_end + 1
+            pos = data.find(b'\n#', line_end)
+        if body_start < len(data):
+            tables.append(self._read_body(data[body_start:]))
+        return self._concat(tables)
+
+    def read_file(self, path: Union[str, Path], chunk_bytes: int = 64 << 20) -> Optional[pa.Table]:
+        """Parse a whole log file, chunk_bytes of complete lines at a time"""
+        tables = []
+        pending = b''
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_bytes), b''):
+                data = pending + chunk
+                end = data.rfind(b'\n') + 1
+                pending = data[end:]
+                if end:
+                    tables.append(self.parse_table(data[:end]))
+        if pending:
+            tables.append(self.parse_table(pending))
+        return self._concat(tables)
+
+    @staticmethod
+    def _concat(tables: List[Optional[pa.Table]]) -> Optional[pa.Table]:
+        """Join parsed pieces; header blocks may differ in their columns"""
+        tables = [t for t in tables if t is not None and t.num_rows]
+        if not tables:
+            return None
+        return pa.concat_tables(tables, promote_options='default') if len(tables) > 1 else tables[0]
+
+
+def flatten_values(column) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Flatten a response_values column into (values, offsets)
+
+    Record i owns values[offsets[i]:offsets[i + 1]]; records without a
+    value list (unset field) are empty. Arrow list columns (see
+    arrow_to_pandas) are read from their buffers; object columns of Python
+    lists, as from the json parser, are flattened record by record.
+    """
+    if isinstance(column, pd.Series) and isinstance(column.dtype, pd.ArrowDtype):
+        column = pa.array(column)
+    if isinstance(column, pa.ChunkedArray):
+        column = column.combine_chunks()
+    if isinstance(column, (pa.ListArray, pa.LargeListArray)):
+        lengths = pc.fill_null(pc.list_value_length(column), 0).to_numpy(zero_copy_only=False)
+        offsets = np.zeros(len(column) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        return pc.list_flatten(column).to_numpy(zero_copy_only=False), offsets
+
+    n = len(column)
+    present = [v if isinstance(v, (list, np.ndarray)) else () for v in column]
+    lengths = np.fromiter(map(len, present), dtype=np.int64, count=n)
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    if offsets[-1]:
+        values = np.concatenate([v for v in present if len(v)]).astype(np.float64, copy=False)
+    else:
+        values = np.zeros(0, dtype=np.float64)
+    return values, offsets
+
+
+def register_value(values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """Main register value of each record: response_values[1], or 0 if absent"""
+    has_value = np.diff(offsets) > 1
+    result = np.zeros(len(offsets) - 1)
+    result[has_value] = values[offsets[:-1][has_value] + 1]
+    return result
+
+
+def merge_moments(n_a, mean_a, m2_a, n_b, mean_b, m2_b) -> tuple:
+    """Vectorized Chan et al. merge of (count, mean, M2) partials"""
+    n = n_a + n_b
+    safe_n = np.maximum(n, 1)
+    delta = mean_b - mean_a
+    mean = mean_a + delta * n_b / safe_n
+    m2 = m2_a + m2_b + delta * delta * n_a * n_b / safe_n
+    return n, mean, m2
+
+
+def _segment_moments(groups: np.ndarray, x: np.ndarray, n_groups: int) -> tuple:
+    """(count, mean, M2) of x per group"""
+    count = np.bincount(groups, minlength=n_groups).astype(np.float64)
+    mean = np.bincount(groups, weights=x, minlength=n_groups) / np.maximum(count, 1)
+    deviation = x - mean[groups]
+    m2 = np.bincount(groups, weights=deviation * deviation, minlength=n_groups)
+    return count, mean, m2
+
+
+def _histogram(rows: np.ndarray, values: np.ndarray, counts: np.ndarray) -> tuple:
+    """Merge (row, value, count) entries: distinct (row, value) sorted, counts summed"""
+    order = np.lexsort((values, rows))
+    rows, values, counts = rows[order], values[order], counts[order]
+    first = np.ones(len(rows), dtype=bool)
+    first[1:] = (rows[1:] != rows[:-1]) | (values[1:] != values[:-1])
+    starts = np.flatnonzero(first)
+    return rows[starts], values[starts], np.add.reduceat(counts, starts) if len(starts) else counts[:0]
+
+
+# Columnar per-register state of RegisterAggregates: name -> initial value
+_COLUMNS = {
+    'reads': 0.0, 'last_ts': np.nan, 'last_value': np.nan, 'changes': 0.0,
+    'gap_n': 0.0, 'gap_mean': 0.0, 'gap_m2': 0.0,
+}
+
+
+class RegisterAggregates:
+    """
+    Mergeable per-(time_window, src, dst, address) statistics
+
+    Batches of records are folded in with grouped NumPy reductions; the
+    register values are kept as a (value, count) histogram, which makes
+    distinct counts, entropy and z-score outliers exact. Folding a log in
+    one call or in any number of arrival-ordered batches gives the same
+    features.
+
+    With max_registers set, registers that are still cold (fewer than
+    MIN_REGISTER_READS reads) are evicted once the table grows past it, so
+    a register scan cannot grow the state without bound. An evicted register
+    that is read again starts over.
+    """
+
+    # Compact the histogram once this many batch blocks have accumulated
+    MAX_HISTOGRAM_BLOCKS = 32
+
+    def __init__(self, max_registers: Optional[int] = None):
+        self.max_registers = max_registers
+        self.evicted = 0
+        self.keys: List[tuple] = []
+        self._rows: Dict[tuple, int] = {}
+        self._columns = {name: np.zeros(0) for name in _COLUMNS}  # Allocated rows, len(keys) in use
+        self._blocks: List[tuple] = []  # (rows, values, counts) histogram blocks
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @property
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Per-register state of the keys in use (views into the allocated columns)"""
+        n_keys = len(self.keys)
+        return {name: column[:n_keys] for name, column in self._columns.items()}
+
+    @property
+    def reads(self) -> int:
+        return int(self.columns['reads'].sum())
+
+    def _key_rows(self, keys: list) -> np.ndarray:
+        """Row of each distinct key in the batch, appending new keys"""
+        new = [key for key in keys if key not in self._rows]
+        if new:
+            for key in new:
+                self._rows[key] = len(self.keys)
+                self.keys.append(key)
+            self._grow(len(self.keys))
+        return np.fromiter((self._rows[key] for key in keys), dtype=np.int64, count=len(keys))
+
+    def _grow(self, n_keys: int):
+        """Resize geometrically so a register scan stays amortized O(1) per key"""
+        allocated = len(self._columns['reads'])
+        if n_keys <= allocated:
+            return
+        extra = max(n_keys, 2 * allocated, 64) - allocated
+        for name, initial in _COLUMNS.items():
+            self._columns[name] = np.concatenate([self._columns[name], np.full(extra, initial)])
+
+    def update(self, time_window: np.ndarray, src: np.ndarray, dst: np.ndarray, address: np.ndarray,
+               ts: np.ndarray, value: np.ndarray):
+        """
+        Fold one batch of records, in arrival order
+
+        Args:
+            time_window: Window id of each record
+            src, dst: Device pair of each record
+            address: Register address (records with a missing address are ignored)
+            ts: Record timestamps
+            value: Main register value (see register_value)
+        """
+        address = np.asarray(address, dtype=np.float64)
+        keep = ~np.isnan(address)
+        if not keep.all():
+            time_window, src, dst, address, ts, value = (
+                np.asarray(column)[keep] for column in (time_window, src, dst, address, ts, value)
+            )
+        if len(ts) == 0:
+            return
+
+        codes, uniques = pd.factorize(pd.MultiIndex.from_arrays([time_window, src, dst, address]))
+        groups = len(uniques)
+        rows = self._key_rows(list(uniques))
+        c = self.columns
+
+        # Arrival order within each group
+        order = np.argsort(codes, kind='stable')
+        sorted_codes = codes[order]
+        sorted_ts = np.asarray(ts, dtype=np.float64)[order]
+        sorted_value = np.asarray(value, dtype=np.float64)[order]
+        starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+        ends = np.r_[starts[1:], len(sorted_codes)] - 1
+        same = sorted_codes[1:] == sorted_codes[:-1]
+        pair_groups = sorted_codes[1:][same]
+
+        # Continue each group from where the previous batch left off
+        previous_ts = c['last_ts'][rows]
+        bridged = ~np.isnan(previous_ts)
+        bridged_groups = np.flatnonzero(bridged)
+
+        gaps = np.concatenate([np.diff(sorted_ts)[same], sorted_ts[starts][bridged] - previous_ts[bridged]])
+        gap_groups = np.concatenate([pair_groups, bridged_groups])
+        c['gap_n'][rows], c['gap_mean'][rows], c['gap_m2'][rows] = merge_moments(
+            c['gap_n'][rows], c['gap_mean'][rows], c['gap_m2'][rows],
+            *_segment_moments(gap_groups, gaps, groups)
+        )
+
+        changed = np.concatenate([
+            np.diff(sorted_value)[same] != 0,
+            sorted_value[starts][bridged] != c['last_value'][rows][bridged],
+        ])
+        c['changes'][rows] += np.bincount(gap_groups, weights=changed, minlength=groups)
+
+        c['reads'][rows] += np.bincount(codes, minlength=groups)
+        c['last_ts'][rows] = sorted_ts[ends]
+        c['last_value'][rows] = sorted_value[ends]
+
+        self._blocks.append(_histogram(rows[codes], np.asarray(value, dtype=np.float64),
+                                       np.ones(len(codes))))
+        if len(self._blocks) > self.MAX_HISTOGRAM_BLOCKS:
+            self._compact()
+        if self.max_registers is not None and len(self.keys) > self.max_registers:
+            self.evict_cold()
+
+    def evict_cold(self) -> int:
+        """Drop registers with fewer than MIN_REGISTER_READS reads; returns how many"""
+        keep = self.columns['reads'] >= MIN_REGISTER_READS
+        n_evicted = int(len(keep) - keep.sum())
+        if n_evicted == 0:
+            return 0
+
+        new_rows = np.cumsum(keep) - 1
+        self.keys = [key for key, kept in zip(self.keys, keep) if kept]
+        self._rows = {key: row for row, key in enumerate(self.keys)}
+        self._columns = {name: column[keep] for name, column in self.columns.items()}
+        blocks = []
+        for rows, values, counts in self._blocks:
+            kept = keep[rows]
+            blocks.append((new_rows[rows[kept]], values[kept], counts[kept]))
+        self._blocks = blocks
+        self.evicted += n_evicted
+        return n_evicted
+
+    def _compact(self) -> tuple:
+        """Merge the histogram blocks into one"""
+        if not self._blocks:
+            empty = np.zeros(0)
+            return empty.astype(np.int64), empty, empty
+        if len(self._blocks) > 1:
+            self._blocks = [_histogram(*(np.concatenate(block) for block in zip(*self._blocks)))]
+        return self._blocks[0]
+
+    def state(self) -> Dict:
+        """Registers, running statistics and value histogram as plain data (for checkpointing)"""
+        time_window, src, dst, address = (list(column) for column in zip(*self.keys)) if self.keys else ([],) * 4
+        rows, values, counts = self._compact()
+        return {
+            'time_window': np.array(time_window, dtype=np.int64),
+            'src': src,
+            'dst': dst,
+            'address': np.array(address, dtype=np.float64),
+            'columns': self.columns,
+            'histogram': {'rows': rows, 'values': values, 'counts': counts},
+            'evicted': self.evicted,
+        }
+
+    def restore(self, state: Dict):
+        """Resume from a saved state()"""
+        self.keys = list(zip(state['time_window'].tolist(), state['src'], state['dst'], state['address'].tolist()))
+        self._rows = {key: row for row, key in enumerate(self.keys)}
+        self._columns = {name: np.asarray(state['columns'][name], dtype=np.float64) for name in _COLUMNS}
+        histogram = state['histogram']
+        self._blocks = [(histogram['rows'], histogram['values'], histogram['counts'])] if len(histogram['rows']) else []
+        self.evicted = state['evicted']
+
+    def features(self, window_seconds: int) -> pd.DataFrame:
+        """Register-level features of groups with at least MIN_REGISTER_READS reads"""
+        c = self.columns
+        reads = c['reads']
+        hist_rows, hist_values, hist_counts = self._compact()
+        safe_reads = np.maximum(reads, 1)
+
+        # Value statistics from the histogram (Numba kernel when available)
+        stats = histogram_stats(hist_rows, hist_values, hist_counts, reads, ENTROPY_BINS, OUTLIER_MIN_READS)
+
+        keys = pd.DataFrame(self.keys, columns=['time_window', 'src', 'dst', 'address'])
+        features = pd.DataFrame({
+            'time_window': keys['time_window'].astype('int64'),
+            'src': keys['src'],
+            'dst': keys['dst'],
+            'address': keys['address'].astype('int64'),
+            'value_mean': stats['mean'],
+            'value_std': stats['std'],
+            'value_min': stats['min'],
+            'value_max': stats['max'],
+            'value_range': stats['max'] - stats['min'],
+            'value_changes': c['changes'],
+            'value_change_rate': c['changes'] / safe_reads,
+            'read_count': reads,
+            'read_rate': reads / window_seconds,
+            'inter_read_mean': c['gap_mean'],
+            'inter_read_std': np.where(reads > 2, np.sqrt(np.maximum(c['gap_m2'], 0) / np.maximum(c['gap_n'], 1)), 0.0),
+            'outlier_count': stats['outlier_count'],
+            'max_z_score': stats['max_z'],
+            'unique_values': stats['unique'],
+            'entropy': stats['entropy'],
+        })
+        return features[reads >= MIN_REGISTER_READS].sort_values(
+            ['time_window', 'src', 'dst', 'address'], ignore_index=True
+        )
+
+
+def register_features(df: pd.DataFrame, window_seconds: int = 300,
+                      src_column: str = 'src', dst_column: str = 'dst') -> pd.DataFrame:
+    """Register-level features of a whole log DataFrame in one pass"""
+    values, offsets = flatten_values(df[VALUES_COLUMN])
+    aggregates = RegisterAggregates()
+    aggregates.update(
+        (df['ts'] // window_seconds).astype('int64').to_numpy(),
+        df[src_column].to_numpy(), df[dst_column].to_numpy(),
+        pd.to_numeric(df['address'], errors='coerce').to_numpy(dtype=np.float64),
+        df['ts'].to_numpy(dtype=np.float64),
+        register_value(values, offsets),
+    )
+    return aggregates.features(window_seconds)
+
+
+def aggregate_to_device_pairs(register_features: pd.DataFrame) -> pd.DataFrame:
+    """Aggregate register features to one vector per (time_window, src, dst)"""
+    agg_features = register_features.groupby(KEY_COLUMNS).agg(PAIR_AGGREGATIONS)
+
+    # Flatten column names
+    agg_features.columns = ['_'.join(col).strip('_') for col in agg_features.columns]
+    agg_features = agg_features.reset_index()
+
+    return agg_features.rename(columns={'address_nunique': 'registers_accessed'})
+
+
+class TemporalContext:
+    """
+    Rolling per-pair baselines of TEMPORAL_METRICS over recent windows
+
+    Each pair keeps its last ROLLING_WINDOWS values in a NumPy ring buffer
+    with rolling sums updated on append. Windows must be added in
+    time order; a pair's history advances only in windows where it appears.
+    """
+
+    def __init__(self, metrics: Sequence[str] = TEMPORAL_METRICS, window: int = ROLLING_WINDOWS):
+        self.metrics = list(metrics)
+        self.window = window
+        self.pairs: List[tuple] = []
+        self._rows: Dict[tuple, int] = {}
+
+        # (pair, slot, metric) ring buffer; head is the next slot to write (the oldest when full)
+        self._values = np.zeros((0, window, len(self.metrics)))
+        self._count = np.zeros(0, dtype=np.int64)
+        self._head = np.zeros(0, dtype=np.int64)
+        self._sum = np.zeros((0, len(self.metrics)))
+        self._sum_sq = np.zeros((0, len(self.metrics)))
+
+    def __len__(self) -> int:
+        return len(self.pairs)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self._values, self._count, self._head, self._sum, self._sum_sq))
+
+    def _pair_rows(self, pairs: list) -> np.ndarray:
+        new = [pair for pair in pairs if pair not in self._rows]
+        if new:
+            for pair in new:
+                self._rows[pair] = len(self.pairs)
+                self.pairs.append(pair)
+            self._grow(len(self.pairs))
+        return np.fromiter((self._rows[pair] for pair in pairs), dtype=np.int64, count=len(pairs))
+
+    def _grow(self, n_pairs: int):
+        """Resize geometrically so adding pairs stays amortized O(1)"""
+        allocated = len(self._count)
+        if n_pairs <= allocated:
+            return
+        extra = max(n_pairs, 2 * allocated, 64) - allocated
+        n_metrics = len(self.metrics)
+        self._values = np.concatenate([self._values, np.zeros((extra, self.window, n_metrics))])
+        self._count = np.concatenate([self._count, np.zeros(extra, dtype=np.int64)])
+        self._head = np.concatenate([self._head, np.zeros(extra, dtype=np.int64)])
+        self._sum = np.concatenate([self._sum, np.zeros((extra, n_metrics))])
+        self._sum_sq = np.concatenate([self._sum_sq, np.zeros((extra, n_metrics))])
+
+    def add(self, window_features: pd.DataFrame, commit: bool = True) -> pd.DataFrame:
+        """
+        Add temporal features to the pair features of one time window
+
+        rolling_mean/rolling_std cover the current window and up to
+        ROLLING_WINDOWS - 1 previous ones; deviation compares the current
+        value with the mean of up to ROLLING_WINDOWS previous windows,
+        normalized by (baseline + 1). Undefined values are NaN. With
+        commit=False the window is not added to the history (a preview of a
+        window that is still open).
+        """
+        features = window_features.copy()
+        if features.empty:
+            for name in TEMPORAL_FEATURES:
+                features[name] = pd.Series(dtype=np.float64)
+            return features
+
+        rows = self._pair_rows(list(zip(features['src'], features['dst'])))
+        current = features[self.metrics].to_numpy(dtype=np.float64)
+        count = self._count[rows][:, None]
+        full = count >= self.window
+        oldest = self._values[rows, self._head[rows]]
+
+        # Previous windows only: baseline for the deviation
+        previous_sum = self._sum[rows]
+        baseline = np.where(count > 0, previous_sum / np.maximum(count, 1), np.nan)
+
+        # Current window plus the most recent window - 1 previous ones
+        n = np.minimum(count, self.window - 1) + 1
+        rolling_sum = previous_sum - np.where(full, oldest, 0.0) + current
+        rolling_sum_sq = self._sum_sq[rows] - np.where(full, oldest * oldest, 0.0) + current * current
+        rolling_mean = rolling_sum / n
+        rolling_var = np.maximum(rolling_sum_sq - n * rolling_mean * rolling_mean, 0.0) / np.maximum(n - 1, 1)
+        rolling_std = np.where(n > 1, np.sqrt(rolling_var), np.nan)
+
+        for i, metric in enumerate(self.metrics):
+            features[f'{metric}_rolling_mean'] = rolling_mean[:, i]
+            features[f'{metric}_rolling_std'] = rolling_std[:, i]
+            features[f'{metric}_deviation'] = (current[:, i] - baseline[:, i]) / (baseline[:, i] + 1)
+
+        if commit:
+            self._append(rows, current)
+        return features
+
+    def state(self) -> Dict:
+        """Pairs and their ring buffers as plain data (for checkpointing)"""
+        n_pairs = len(self.pairs)
+        return {
+            'metrics': self.metrics,
+            'window': self.window,
+            'pairs': [list(pair) for pair in self.pairs],
+            'values': self._values[:n_pairs],
+            'count': self._count[:n_pairs],
+            'head': self._head[:n_pairs],
+            'sum': self._sum[:n_pairs],
+            'sum_sq': self._sum_sq[:n_pairs],
+        }
+
+    def restore(self, state: Dict):
+        """Resume from a saved state()"""
+        if list(state['metrics']) != self.metrics or state['window'] != self.window:
+            raise ValueError(f"Temporal context of {state['metrics']} over {state['window']} windows "
+                             f"does not match {self.metrics} over {self.window}")
+        self.pairs = [tuple(pair) for pair in state['pairs']]
+        self._rows = {pair: row for row, pair in enumerate(self.pairs)}
+        self._values = np.asarray(state['values'], dtype=np.float64)
+        self._count = np.asarray(state['count'], dtype=np.int64)
+        self._head = np.asarray(state['head'], dtype=np.int64)
+        self._sum = np.asarray(state['sum'], dtype=np.float64)
+        self._sum_sq = np.asarray(state['sum_sq'], dtype=np.float64)
+
+    def _append(self, rows: np.ndarray, values: np.ndarray):
+        """Push one window of values; the overwritten slot leaves the rolling sums"""
+        head = self._head[rows]
+        evicted = self._values[rows, head]
+        full = (self._count[rows] >= self.window)[:, None]
+        self._sum[rows] += values - np.where(full, evicted, 0.0)
+        self._sum_sq[rows] += values * values - np.where(full, evicted * evicted, 0.0)
+        self._values[rows, head] = values
+        self._count[rows] = np.minimum(self._count[rows] + 1, self.window)
+        self._head[rows] = (head + 1) % self.window
+
+        # Re-sum exactly once per lap of the ring so rounding cannot accumulate
+        lapped = rows[self._head[rows] == 0]
+        if len(lapped):
+            self._sum[lapped] = self._values[lapped].sum(axis=1)
+            self._sum_sq[lapped] = (self._values[lapped] ** 2).sum(axis=1)
+
+
+def add_temporal_context(pair_features: pd.DataFrame,
+                         context: Optional[TemporalContext] = None) -> pd.DataFrame:
+    """
+    Add temporal features window by window and fill undefined values with 0
+
+    Pass a persistent context to continue the history across calls (the
+    detector adds one window at a time).
+    """
+    if context is None:
+        context = TemporalContext()
+    windows = [context.add(window) for _, window in pair_features.groupby('time_window', sort=True)]
+    if not windows:
+        return context.add(pair_features).fillna(0)
+    features = pd.concat(windows, ignore_index=True) if len(windows) > 1 else windows[0]
+    return features.sort_values(['src', 'dst', 'time_window'], ignore_index=True).fillna(0)
+
+
+def extract_features(df: pd.DataFrame, window_seconds: int = 300, src_column: str = 'src',
+                     dst_column: str = 'dst') -> pd.DataFrame:
+    """Full feature pipeline for a log DataFrame: KEY_COLUMNS + FEATURE_COLUMNS"""
+    registers = register_features(df, window_seconds, src_column, dst_column)
+    return add_temporal_context(aggregate_to_device_pairs(registers))
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Register Value Kernels
+Per-register value statistics (mean, std, min/max, distinct values, entropy
+and z-score outliers) over the (row, value, count) histogram of
+RegisterAggregates, computed in one pass per register.
+
+A Numba-compiled kernel is used when Numba is installed; otherwise the
+grouped NumPy implementation runs. Both give the same features. Set
+MODBUS_KERNELS=numpy to force the fallback.
+"""
+
+import math
+import os
+from typing import Dict
+
+import numpy as np
+
+# Try to import Numba, fall back to NumPy if needed
+try:
+    import numba
+    USE_NUMBA = os.getenv('MODBUS_KERNELS', 'numba').lower() != 'numpy'
+except ImportError:
+    numba = None
+    USE_NUMBA = False
+
+STAT_NAMES = ['mean', 'std', 'min', 'max', 'unique', 'entropy', 'outlier_count', 'max_z']
+
+
+def histogram_stats_numpy(hist_rows: np.ndarray, hist_values: np.ndarray, hist_counts: np.ndarray,
+                          reads: np.ndarray, entropy_bins: int, outlier_min_reads: int) -> Dict[str, np.ndarray]:
+    """
+    Value statistics per register with grouped NumPy reductions
+
+    Args:
+        hist_rows: Register row of each histogram entry (sorted)
+        hist_values: Distinct value of the entry (sorted within a row)
+        hist_counts: Reads of that value
+        reads: Total reads per register row
+        entropy_bins: Equal-width bins between min and max for the entropy
+        outlier_min_reads: Outliers are only counted above this many reads
+    """
+    n_rows = len(reads)
+    safe_reads = np.maximum(reads, 1)
+    mean = np.bincount(hist_rows, weights=hist_values * hist_counts, minlength=n_rows) / safe_reads
+    deviation = hist_values - mean[hist_rows]
+    std = np.sqrt(np.bincount(hist_rows, weights=hist_counts * deviation * deviation, minlength=n_rows) / safe_reads)
+    value_min = np.full(n_rows, np.inf)
+    value_max = np.full(n_rows, -np.inf)
+    np.minimum.at(value_min, hist_rows, hist_values)
+    np.maximum.at(value_max, hist_rows, hist_values)
+    unique = np.bincount(hist_rows, minlength=n_rows).astype(np.float64)
+
+    # Entropy over equal-width bins between min and max (as np.histogram)
+    lo, hi = value_min.copy(), value_max.copy()
+    constant = lo == hi
+    lo[constant] -= 0.5
+    hi[constant] += 0.5
+    step = (hi - lo) / entropy_bins
+    inner_edges = np.arange(1, entropy_bins)[None, :] * step[:, None] + lo[:, None]
+    bins = (hist_values[:, None] >= inner_edges[hist_rows]).sum(axis=1)
+    bin_counts = np.zeros((n_rows, entropy_bins))
+    np.add.at(bin_counts, (hist_rows, bins), hist_counts)
+    p = bin_counts / safe_reads[:, None]
+    entropy = -np.sum(p * np.log(p + 1e-10), axis=1)
+
+    # Z-score outliers for well-sampled registers
+    z = np.abs(deviation) / (std[hist_rows] + 1e-6)
+    sampled = reads[hist_rows] > outlier_min_reads
+    outlier_count = np.bincount(hist_rows, weights=hist_counts * ((z > 3) & sampled), minlength=n_rows)
+    max_z = np.zeros(n_rows)
+    np.maximum.at(max_z, hist_rows[sampled], z[sampled])
+
+    return {
+        'mean': mean, 'std': std, 'min': value_min, 'max': value_max, 'unique': unique,
+        'entropy': entropy, 'outlier_count': outlier_count, 'max_z': max_z,
+    }
+
+
+def _histogram_stats_loop(hist_rows, hist_values, hist_counts, reads, entropy_bins, outlier_min_reads):
+    """Segment-by-segment version of histogram_stats_numpy, compiled with Numba"""
+    n_rows = len(reads)
+    out = np.zeros((8, n_rows))
+    out[2, :] = np.inf
+    out[3, :] = -np.inf
+    bin_counts = np.zeros(entropy_bins)
+
+    n = len(hist_rows)
+    start = 0
+    while start < n:
+        row = hist_rows[start]
+        end = start
+        while end < n and hist_rows[end] == row:
+            end += 1
+        safe_reads = max(reads[row], 1.0)
+
+        total = 0.0
+        lo = np.inf
+        hi = -np.inf
+        for k in range(start, end):
+            total += hist_values[k] * hist_counts[k]
+            lo = min(lo, hist_values[k])
+            hi = max(hi, hist_values[k])
+        mean = total / safe_reads
+
+        squares = 0.0
+        for k in range(start, end):
+            deviation = hist_values[k] - mean
+            squares += hist_counts[k] * deviation * deviation
+        std = math.sqrt(squares / safe_reads)
+
+        # Entropy over equal-width bins between min and max (as np.histogram)
+        bin_lo, bin_hi = lo, hi
+        if bin_lo == bin_hi:
+            bin_lo -= 0.5
+            bin_hi += 0.5
+        step = (bin_hi - bin_lo) / entropy_bins
+        bin_counts[:] = 0.0
+        for k in range(start, end):
+            b = 0
+            for edge in range(1, entropy_bins):
+                if hist_values[k] >= edge * step + bin_lo:
+                    b += 1
+            bin_counts[b] += hist_counts[k]
+        entropy = 0.0
+        for b in range(entropy_bins):
+            p = bin_counts[b] / safe_reads
+            entropy -= p * math.log(p + 1e-10)
+
+        # Z-score outliers for well-sampled registers
+        outliers = 0.0
+        max_z = 0.0
+        if reads[row] > outlier_min_reads:
+            for k in range(start, end):
+                z = abs(hist_values[k] - mean) / (std + 1e-6)
+                if z > 3:
+                    outliers += hist_counts[k]
+                max_z = max(max_z, z)
+
+        out[0, row] = mean
+        out[1, row] = std
+        out[2, row] = lo
+        out[3, row] = hi
+        out[4, row] = end - start
+        out[5, row] = entropy
+        out[6, row] = outliers
+        out[7, row] = max_z
+        start = end
+    return out
+
+
+if numba is not None:
+    _histogram_stats_compiled = numba.njit(cache=True, nogil=True)(_histogram_stats_loop)
+else:
+    _histogram_stats_compiled = None
+
+
+def histogram_stats_numba(hist_rows: np.ndarray, hist_values: np.ndarray, hist_counts: np.ndarray,
+                          reads: np.ndarray, entropy_bins: int, outlier_min_reads: int) -> Dict[str, np.ndarray]:
+    """Value statistics per register with the compiled kernel (arguments as histogram_stats_numpy)"""
+    if _histogram_stats_compiled is None:
+        raise RuntimeError("Numba is not installed")
+    out = _histogram_stats_compiled(
+        np.ascontiguousarray(hist_rows, dtype=np.int64),
+        np.ascontiguousarray(hist_values, dtype=np.float64),
+        np.ascontiguousarray(hist_counts, dtype=np.float64),
+        np.ascontiguousarray(reads, dtype=np.float64),
+        entropy_bins, outlier_min_reads
+    )
+    return dict(zip(STAT_NAMES, out))
+
+
+def histogram_stats(hist_rows: np.ndarray, hist_values: np.ndarray, hist_counts: np.ndarray,
+                    reads: np.ndarray, entropy_bins: int, outlier_min_reads: int) -> Dict[str, np.ndarray]:
+    """Value statistics per register with the fastest available kernel"""
+    kernel = histogram_stats_numba if USE_NUMBA else histogram_stats_numpy
+    return kernel(hist_rows, hist_values, hist_counts, reads, entropy_bins, outlier_min_reads)
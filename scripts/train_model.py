@@ -14,6 +14,9 @@ import logging
 from pathlib import Path
 import sys
 import json
+import hashlib
+import os
+from datetime import datetime
 
 logging.basicConfig(
     level=logging.INFO,
@@ -21,6 +24,10 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Compiled forest read by the detector (docker/detection/forest.py)
+FOREST_FORMAT_VERSION = 3
+MANIFEST_FILE = 'manifest.json'
+
 
 def load_and_prepare_features(features_path):
     """Load and prepare features for training"""
@@ -161,7 +168,229 @@ def save_results(df, output_path):
     logger.info(f"Summary saved to {summary_file}")
 
 
-def save_model(model, scaler, feature_names, output_path):
+def _average_path_length(n_samples):
+    """Average path length of an unsuccessful BST search over n samples, as IsolationForest"""
+    n_samples = np.asarray(n_samples, dtype=np.float64)
+    path_length = np.zeros_like(n_samples)
+    path_length[n_samples == 2] = 1.0
+    deep = n_samples > 2
+    path_length[deep] = (
+        2.0 * (np.log(n_samples[deep] - 1.0) + np.euler_gamma)
+        - 2.0 * (n_samples[deep] - 1.0) / n_samples[deep]
+    )
+    return path_length
+
+
+def _float_keys(x):
+    """Map float64 values to int64 keys with the same order"""
+    bits = np.asarray(x, dtype=np.float64).view(np.int64)
+    return np.where(bits < 0, np.int64(-2**63) - bits, bits)
+
+
+def _key_floats(keys):
+    """Inverse of _float_keys"""
+    keys = np.asarray(keys, dtype=np.int64)
+    return np.where(keys < 0, np.int64(-2**63) - keys, keys).view(np.float64)
+
+
+def fold_scaler(thresholds, features, scaler):
+    """
+    Split thresholds on raw feature values, equivalent to scaling first
+    
+    The forest goes left if float32((x - mean) / scale) <= threshold. That
+    is monotone in x, so it holds exactly up to some largest raw value; a
+    bisection over the float64 values finds it per split. The raw threshold
+    then routes every finite input as the scaler and model together would.
+    """
+    mean = np.zeros(scaler.n_features_in_) if scaler.mean_ is None else scaler.mean_
+    scale = np.ones(scaler.n_features_in_) if scaler.scale_ is None else scaler.scale_
+    mean, scale = mean[features], scale[features]
+    
+    def goes_left(keys):
+        # Extreme raw values overflow to +-inf, which keeps the order
+        with np.errstate(over='ignore', invalid='ignore'):
+            return ((_key_floats(keys) - mean) / scale).astype(np.float32) <= thresholds
+    
+    finfo = np.finfo(np.float64)
+    lo = np.full(len(thresholds), _float_keys(finfo.min))
+    hi = np.full(len(thresholds), _float_keys(finfo.max))
+    all_left, none_left = goes_left(hi), ~goes_left(lo)
+    # Invariant: lo goes left, hi goes right
+    while True:
+        open_range = (lo < hi - 1) & ~all_left & ~none_left
+        if not open_range.any():
+            break
+        # Midpoint without overflowing int64 (keys span its whole range)
+        mid = lo // 2 + hi // 2 + (lo % 2 + hi % 2) // 2
+        left = goes_left(mid)
+        lo = np.where(open_range & left, mid, lo)
+        hi = np.where(open_range & ~left, mid, hi)
+    
+    folded = _key_floats(lo)
+    folded[all_left] = np.inf
+    folded[none_left] = -np.inf
+    return folded
+
+
+def _manifest_files(output_dir):
+    """Array files referenced by the manifest currently installed in output_dir"""
+    try:
+        with open(Path(output_dir) / MANIFEST_FILE) as f:
+            return {spec['file'] for spec in json.load(f)['arrays'].values()}
+    except (OSError, ValueError, KeyError):
+        return set()
+
+
+def export_forest(model, scaler, feature_names, output_dir, metadata=None):
+    """
+    Flatten a fitted Isolation Forest and its scaler into a model directory
+    
+    All trees are concatenated into one node table laid out breadth-first so
+    that siblings are adjacent: a sample at node n moves to left[n] if
+    x[feature[n]] <= threshold[n], else to left[n] + 1. Leaves point to
+    themselves with an infinite threshold, so depth[t] steps from roots[t]
+    always end in a leaf, whose leaf_value is the path length it adds (depth
+    plus the average path length of its training samples). The scaler is
+    folded into the thresholds, so the table scores raw feature vectors. The
+    detector scores with this table without sklearn (docker/detection/forest.py);
+    scores match model.score_samples(scaler.transform(X)).
+    
+    The directory holds one .npy file per array, which the detector memory-maps,
+    and manifest.json with the feature order, score threshold and training
+    metadata. Array files are named after a digest of their content and the
+    manifest is replaced last, so a detector never sees a half-written model.
+    The arrays of the replaced manifest are kept until the next export, so a
+    detector that read it just before the swap can still load them.
+    
+    Args:
+        model: Fitted IsolationForest
+        scaler: Fitted StandardScaler
+        feature_names: Feature order of the model
+        output_dir: Model directory (created if needed)
+        metadata: Training metadata stored in the manifest (e.g. window_seconds)
+    """
+    features, thresholds, lefts, leaf_values, roots, depths = [], [], [], [], [], []
+    offset = 0
+    for estimator, estimator_features in zip(model.estimators_, model.estimators_features_):
+        tree = estimator.tree_
+        leaf = tree.children_left == -1
+        average_path = _average_path_length(tree.n_node_samples)
+        
+        # Breadth-first renumbering, children of a node get consecutive ids
+        order, depth = [0], {0: 0}
+        new_id = {0: 0}
+        for node in order:
+            if not leaf[node]:
+                for child in (tree.children_left[node], tree.children_right[node]):
+                    new_id[child] = len(order)
+                    depth[child] = depth[node] + 1
+                    order.append(child)
+        
+        order = np.array(order)
+        is_leaf = leaf[order]
+        node_depth = np.array([depth[node] for node in order], dtype=np.float64)
+        left = np.array([offset + (i if is_leaf[i] else new_id[tree.children_left[node]])
+                         for i, node in enumerate(order)])
+        
+        split_feature = np.where(is_leaf, 0, np.asarray(estimator_features)[tree.feature[order]])
+        features.append(split_feature)
+        thresholds.append(np.where(is_leaf, np.inf, fold_scaler(tree.threshold[order], split_feature, scaler)))
+        lefts.append(left)
+        # Same terms as score_samples: decision path length + average path length - 1
+        leaf_values.append(np.where(is_leaf, (node_depth + 1.0) + average_path[order] - 1.0, 0.0))
+        roots.append(offset)
+        depths.append(int(node_depth.max()))
+        offset += tree.node_count
+    
+    n_features = len(feature_names)
+    arrays = {
+        # Training distribution, for reference only: already folded into threshold
+        'scaler_mean': np.zeros(n_features) if scaler.mean_ is None else scaler.mean_.astype(np.float64),
+        'scaler_scale': np.ones(n_features) if scaler.scale_ is None else scaler.scale_.astype(np.float64),
+        'feature': np.concatenate(features).astype(np.int32),
+        'threshold': np.concatenate(thresholds).astype(np.float64),
+        'left': np.concatenate(lefts).astype(np.int32),
+        'leaf_value': np.concatenate(leaf_values).astype(np.float64),
+        'roots': np.array(roots, dtype=np.int32),
+        'depth': np.array(depths, dtype=np.int32),
+    }
+    
+    digest = hashlib.sha256(json.dumps(list(feature_names)).encode())
+    for name in sorted(arrays):
+        digest.update(name.encode())
+        digest.update(arrays[name].tobytes())
+    model_id = digest.hexdigest()[:16]
+    
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    files = {}
+    for name, array in arrays.items():
+        file_name = f'{name}-{model_id}.npy'
+        # Same digest, same content: never rewrite a file a detector may have mapped
+        if not (output_dir / file_name).exists():
+            np.save(output_dir / file_name, np.ascontiguousarray(array))
+        files[name] = {'file': file_name, 'dtype': str(array.dtype), 'shape': list(array.shape)}
+    
+    metadata = metadata or {}
+    manifest = {
+        'format': 'isolation-forest',
+        'format_version': FOREST_FORMAT_VERSION,
+        'model_id': model_id,
+        'feature_names': list(feature_names),
+        # Scores below this are anomalies at the training contamination
+        'score_threshold': float(model.offset_),
+        'window_seconds': metadata.get('window_seconds'),
+        'n_trees': len(roots),
+        'n_nodes': offset,
+        'denominator': float(len(model.estimators_) * _average_path_length([model.max_samples_])[0]),
+        'training': {
+            **{key: value for key, value in metadata.items() if key != 'window_seconds'},
+            'n_estimators': len(model.estimators_),
+            'max_samples': int(model.max_samples_),
+            'contamination': model.contamination,
+            'exported_at': datetime.now().isoformat(),
+        },
+        'arrays': files,
+    }
+    # A detector may have read the current manifest and not loaded its arrays yet
+    referenced = {spec['file'] for spec in files.values()} | _manifest_files(output_dir)
+    
+    manifest_tmp = output_dir / f'{MANIFEST_FILE}.tmp'
+    with open(manifest_tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_tmp, output_dir / MANIFEST_FILE)
+    
+    # Arrays of older exports; a detector that mapped them keeps its mapping
+    for stale in output_dir.glob('*.npy'):
+        if stale.name not in referenced:
+            stale.unlink()
+    
+    logger.info(f"Compiled forest {model_id} saved to {output_dir}: {len(roots)} trees, {offset:,} nodes")
+
+
+def compiled_model_dir(model_file):
+    """Compiled forest directory exported next to a model pickle"""
+    return Path(model_file).with_suffix('.forest')
+
+
+def export_model_file(model_file, window_seconds=None):
+    """Export the compiled forest of an already trained model pickle"""
+    model_data = joblib.load(model_file)
+    feature_names = model_data.get('feature_columns') or model_data.get('feature_names')
+    export_forest(model_data['model'], model_data['scaler'], feature_names, compiled_model_dir(model_file),
+                  {'window_seconds': window_seconds, 'model_file': str(model_file)})
+
+
+def features_window_seconds(features_path):
+    """Window size recorded by extract_features.py next to a features CSV, if any"""
+    metadata_file = Path(features_path).parent / 'extraction_metadata.json'
+    if not metadata_file.exists():
+        return None
+    with open(metadata_file) as f:
+        return json.load(f).get('time_window_seconds')
+
+
+def save_model(model, scaler, feature_names, output_path, metadata=None):
     """Save trained model for production use"""
     output_dir = Path(output_path)
     
@@ -175,6 +404,9 @@ def save_model(model, scaler, feature_names, output_path):
     }, model_file)
     
     logger.info("Model saved!")
+    
+    # Dependency-light copy for the detector
+    export_forest(model, scaler, feature_names, compiled_model_dir(model_file), metadata)
 
 
 def main():
@@ -183,6 +415,7 @@ def main():
     )
     parser.add_argument(
         'features_path',
+        nargs='?',
         help='Path to features CSV'
     )
     parser.add_argument(
@@ -203,8 +436,26 @@ def main():
         help='Number of trees'
     )
     
+    parser.add_argument(
+        '--export-only',
+        metavar='MODEL',
+        help='Only export the compiled forest of a trained model pickle'
+    )
+    parser.add_argument(
+        '--window',
+        type=int,
+        default=None,
+        help='Window size of the features in seconds (default: from extraction_metadata.json)'
+    )
+    
     args = parser.parse_args()
     
+    if args.export_only:
+        export_model_file(args.export_only, args.window)
+        return 0
+    if not args.features_path:
+        parser.error('features_path is required unless --export-only is given')
+    
     try:
         logger.info("="*70)
         logger.info("Anomaly Detection Training")
@@ -232,7 +483,12 @@ def main():
         
         # Save
         save_results(df, args.output)
-        save_model(model, scaler, feature_cols, args.output)
+        save_model(model, scaler, feature_cols, args.output, {
+            'window_seconds': args.window or features_window_seconds(args.features_path),
+            'features_path': str(args.features_path),
+            'n_samples': int(len(X)),
+            'trained_at': datetime.now().isoformat(),
+        })
         
         logger.info("\n" + "="*70)
         logger.info("Training Complete!")
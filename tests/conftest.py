@@ -0,0 +1,13 @@
+"""
+Shared test setup
+The detection service and the training scripts are flat modules, imported
+the way the detection image and the ML container run them.
+"""
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+for path in (ROOT / 'scripts', ROOT / 'docker' / 'detection'):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
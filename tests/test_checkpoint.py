@@ -0,0 +1,139 @@
+"""Checkpoints: data-only snapshots and the state rebuilt from them"""
+
+import pickle
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from checkpoint import CheckpointStore
+from early_warning import EarlyWarnings
+from feature_library import TemporalContext
+from score_quantiles import PairQuantiles
+from windowing import EventTimeWindower, WindowRecords
+
+
+class _Payload:
+    """Pickled object that leaves a marker file when it is unpickled"""
+
+    def __init__(self, marker: Path):
+        self.marker = marker
+
+    def __reduce__(self):
+        return Path.touch, (self.marker,)
+
+
+def _records(start: float, n: int, seed: int = 0) -> WindowRecords:
+    rng = np.random.default_rng(seed)
+    ts = start + np.sort(rng.uniform(0, 50, n))
+    src = np.array(['10.0.0.1', '10.0.0.3'], dtype=object)[rng.integers(0, 2, n)]
+    return WindowRecords(
+        ts=ts,
+        src=src,
+        dst=np.full(n, '10.0.0.2', dtype=object),
+        address=rng.integers(40001, 40005, n).astype(np.float64),
+        value=rng.integers(0, 20, n).astype(np.float64),
+    )
+
+
+def _roundtrip(tmp_path, state):
+    store = CheckpointStore(tmp_path / 'detector.ckpt')
+    store.save(state)
+    return store.load()
+
+
+def test_snapshot_is_json_and_arrays_only(tmp_path):
+    state = {'counts': np.arange(6, dtype=np.uint32).reshape(2, 3), 'offset': np.int64(7),
+             'pairs': [('a', 'b')], 'nested': {'ts': np.nan, 'none': None}}
+    loaded = _roundtrip(tmp_path, state)
+
+    np.testing.assert_array_equal(loaded['counts'], state['counts'])
+    assert loaded['counts'].dtype == np.uint32
+    assert loaded['offset'] == 7 and loaded['pairs'] == [['a', 'b']]
+    assert np.isnan(loaded['nested']['ts']) and loaded['nested']['none'] is None
+    with np.load(tmp_path / 'detector.ckpt', allow_pickle=False) as archive:
+        assert archive.files == ['manifest.json', 'a0']
+
+
+def test_objects_are_refused_on_save(tmp_path):
+    store = CheckpointStore(tmp_path / 'detector.ckpt')
+    for state in ({'model': object()}, {'keys': {(1, 2): 3}}, {'src': np.array(['a'], dtype=object)}):
+        with pytest.raises(TypeError):
+            store.save(state)
+    assert not (tmp_path / 'detector.ckpt').exists()
+
+
+def test_pickled_checkpoint_is_never_unpickled(tmp_path):
+    marker = tmp_path / 'unpickled'
+    path = tmp_path / 'detector.ckpt'
+    path.write_bytes(pickle.dumps({'version': 12, 'payload': _Payload(marker)}))
+
+    assert CheckpointStore(path).load() is None
+    assert not marker.exists()
+
+
+def test_windower_resumes_identically(tmp_path):
+    first, second = _records(0, 400, seed=1), _records(55, 400, seed=2)
+    reference = EventTimeWindower(window_seconds=30, allowed_lateness=5, idle_timeout=None)
+    reference.add(first)
+
+    restored = EventTimeWindower(window_seconds=30, allowed_lateness=5, idle_timeout=None)
+    restored.restore(_roundtrip(tmp_path, {'windower': reference.state()})['windower'])
+    assert restored.open_windows == reference.open_windows
+    assert restored.watermark == reference.watermark
+
+    expected = reference.add(second) + reference.flush()
+    actual = restored.add(second) + restored.flush()
+    assert [window_id for window_id, _ in actual] == [window_id for window_id, _ in expected]
+    for (_, a), (_, b) in zip(actual, expected):
+        pd.testing.assert_frame_equal(a.features(30), b.features(30))
+
+
+def test_temporal_context_and_sketches_resume(tmp_path):
+    context = TemporalContext()
+    window = pd.DataFrame({'src': ['a', 'c'], 'dst': ['b', 'd'], 'value_mean_mean': [1.0, 2.0],
+                           'read_count_sum': [10.0, 20.0], 'value_change_rate_mean': [0.1, 0.2]})
+    for _ in range(3):
+        context.add(window)
+    quantiles = PairQuantiles(0.1, min_windows=2)
+    for score in (-0.5, -0.6, -0.7):
+        quantiles.record('m1', [('a', 'b')], np.array([score]))
+
+    loaded = _roundtrip(tmp_path, {'context': context.state(), 'quantiles': quantiles.state()})
+    restored_context = TemporalContext()
+    restored_context.restore(loaded['context'])
+    restored_quantiles = PairQuantiles(0.1, min_windows=2)
+    restored_quantiles.restore(loaded['quantiles'])
+
+    pd.testing.assert_frame_equal(restored_context.add(window), context.add(window))
+    assert restored_quantiles.describe('m1', -0.5) == quantiles.describe('m1', -0.5)
+    restored_quantiles.record('m1', [('a', 'b'), ('x', 'y')], np.array([-0.4, -0.3]))
+    assert len(restored_quantiles.sketches['m1']) == 2
+
+
+def test_sketches_are_only_kept_when_adaptive_thresholds_are_enabled(tmp_path):
+    enabled = PairQuantiles(0.1, min_windows=2)
+    enabled.record('m1', [('a', 'b')], np.array([-0.5]))
+    disabled = PairQuantiles(None)
+    disabled.record('m1', [('a', 'b')], np.array([-0.5]))
+
+    assert not disabled.sketches and disabled.state() == {}
+    assert disabled.get_status('m1')['bytes'] == 0
+    # A checkpoint written with adaptive thresholds on is not restored into a detector with them off
+    disabled.restore(_roundtrip(tmp_path, {'quantiles': enabled.state()})['quantiles'])
+    assert not disabled.sketches
+    np.testing.assert_array_equal(disabled.thresholds('m1', [('a', 'b')], -0.6), [-0.6])
+
+
+def test_pending_early_warning_resolves_after_restore(tmp_path):
+    warnings = EarlyWarnings(interval=5, threshold=-0.6)
+    warnings.raise_alert(60, 3, 'a', 'b', score=-0.7, event_ts=200.0, elapsed=20.0)
+
+    restored = EarlyWarnings(interval=5, threshold=-0.6)
+    restored.restore(_roundtrip(tmp_path, {'early_warnings': warnings.state()})['early_warnings'])
+    resolved = restored.resolve_window(60, 3, {('a', 'b'): -0.75}, {('a', 'b')})
+
+    assert [alert['status'] for alert in resolved] == ['confirmed']
+    assert restored.recent[0]['status'] == 'confirmed'
+    assert not restored.pending
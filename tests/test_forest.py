@@ -0,0 +1,138 @@
+"""Compiled forest: scores identical to the sklearn scaler + IsolationForest"""
+
+import json
+
+import numpy as np
+import pytest
+
+pytest.importorskip('sklearn')
+from sklearn.ensemble import IsolationForest  # noqa: E402
+from sklearn.preprocessing import StandardScaler  # noqa: E402
+
+import forest  # noqa: E402
+from forest import CompiledForest  # noqa: E402
+from feature_library import FEATURE_COLUMNS  # noqa: E402
+from train_model import _float_keys, _key_floats, export_forest, fold_scaler  # noqa: E402
+
+KERNELS = ['numpy', pytest.param('numba', marks=pytest.mark.skipif(forest.numba is None,
+                                                                   reason='Numba is not installed'))]
+
+
+def _features(n: int = 600, seed: int = 0) -> np.ndarray:
+    """Feature frame with the spread of real ones: counts, rates and constant columns"""
+    rng = np.random.default_rng(seed)
+    X = rng.lognormal(mean=2.0, sigma=1.5, size=(n, len(FEATURE_COLUMNS)))
+    X[:, ::4] = rng.integers(0, 50, size=(n, len(FEATURE_COLUMNS[::4])))
+    X[:, 5] = 3.0
+    return X
+
+
+@pytest.fixture(scope='module')
+def fitted():
+    X = _features()
+    scaler = StandardScaler().fit(X)
+    iforest = IsolationForest(n_estimators=25, max_samples=256, random_state=0).fit(scaler.transform(X))
+    return X, scaler, iforest
+
+
+@pytest.fixture
+def compiled(tmp_path, fitted):
+    _, scaler, iforest = fitted
+    export_forest(iforest, scaler, FEATURE_COLUMNS, tmp_path / 'anomaly_detector.forest', {'window_seconds': 60})
+    return CompiledForest.load(tmp_path / 'anomaly_detector.forest')
+
+
+def _split_values(iforest, scaler) -> np.ndarray:
+    """Raw feature vectors lying exactly on, and one float step around, the trees' split thresholds"""
+    rows = []
+    for estimator, estimator_features in zip(iforest.estimators_, iforest.estimators_features_):
+        tree = estimator.tree_
+        for node in np.flatnonzero(tree.children_left != -1)[:8]:
+            feature = estimator_features[tree.feature[node]]
+            on_split = tree.threshold[node] * scaler.scale_[feature] + scaler.mean_[feature]
+            for value in (np.nextafter(on_split, -np.inf), on_split, np.nextafter(on_split, np.inf)):
+                row = scaler.mean_.copy()
+                row[feature] = value
+                rows.append(row)
+    return np.array(rows)
+
+
+@pytest.mark.parametrize('kernel', KERNELS)
+def test_scores_match_sklearn(monkeypatch, fitted, compiled, kernel):
+    X, scaler, iforest = fitted
+    monkeypatch.setattr(forest, 'USE_NUMBA', kernel == 'numba')
+    unseen = _features(n=300, seed=1)
+    for samples in (X, unseen, _split_values(iforest, scaler)):
+        np.testing.assert_array_equal(compiled.score_samples(samples),
+                                      iforest.score_samples(scaler.transform(samples)))
+
+
+def test_kernels_agree(fitted, compiled):
+    if forest.numba is None:
+        pytest.skip('Numba is not installed')
+    X = np.vstack([fitted[0], _split_values(fitted[2], fitted[1])])
+    arrays = (compiled.feature, compiled.threshold, compiled.left, compiled.leaf_value, compiled.roots, compiled.depth)
+    np.testing.assert_array_equal(forest.path_lengths_numba(X, *arrays), forest.path_lengths_numpy(X, *arrays))
+
+
+def test_folded_threshold_is_the_last_raw_value_going_left():
+    scaler = StandardScaler().fit(np.array([[0.0, 10.0], [3.0, 1e6], [7.0, -4.5]]))
+    # float32 tree thresholds, as sklearn stores them, including ones on representable raw values
+    thresholds = np.array([0.25, -1.0, 0.0, 1.5, -0.125], dtype=np.float32).astype(np.float64)
+    features = np.array([0, 0, 1, 1, 1])
+    folded = fold_scaler(thresholds, features, scaler)
+
+    def goes_left(x):
+        scaled = (x - scaler.mean_[features]) / scaler.scale_[features]
+        return scaled.astype(np.float32) <= thresholds
+
+    assert goes_left(folded).all()
+    assert not goes_left(np.nextafter(folded, np.inf)).any()
+    # Keys order floats as the floats themselves, including across zero
+    values = np.array([-np.inf, -1.0, -0.0, 0.0, 5e-324, 2.0, np.inf])
+    assert (np.diff(_float_keys(values)) >= 0).all()
+    np.testing.assert_array_equal(_key_floats(_float_keys(values)), values)
+
+
+def _export(fitted, output_dir, seed) -> str:
+    X, scaler, _ = fitted
+    iforest = IsolationForest(n_estimators=5, random_state=seed).fit(scaler.transform(X))
+    export_forest(iforest, scaler, FEATURE_COLUMNS, output_dir)
+    return _manifest(output_dir)['model_id']
+
+
+def _manifest(output_dir) -> dict:
+    return json.loads((output_dir / forest.MANIFEST_FILE).read_text())
+
+
+def test_export_keeps_the_arrays_of_the_replaced_manifest(tmp_path, fitted):
+    output_dir = tmp_path / 'anomaly_detector.forest'
+    _export(fitted, output_dir, seed=1)
+    # A detector read this manifest, then the next export swapped it before the arrays were loaded
+    read_before_swap = _manifest(output_dir)
+    second = _export(fitted, output_dir, seed=2)
+    for spec in read_before_swap['arrays'].values():
+        np.load(output_dir / spec['file'], mmap_mode='r', allow_pickle=False)
+
+    # One export later, only the current and the previous model remain
+    third = _export(fitted, output_dir, seed=3)
+    ids = {path.stem.rsplit('-', 1)[1] for path in output_dir.glob('*.npy')}
+    assert ids == {second, third}
+    assert CompiledForest.load(output_dir).model_id == third
+
+
+def test_load_rereads_the_manifest_when_exports_removed_its_arrays(monkeypatch, tmp_path, fitted):
+    output_dir = tmp_path / 'anomaly_detector.forest'
+    _export(fitted, output_dir, seed=1)
+    np_load = np.load
+    exported = []
+
+    def load_during_two_exports(*args, **kwargs):
+        # Two exports between reading the manifest and loading its first array
+        if not exported:
+            exported.append(_export(fitted, output_dir, seed=2))
+            exported.append(_export(fitted, output_dir, seed=3))
+        return np_load(*args, **kwargs)
+
+    monkeypatch.setattr(forest.np, 'load', load_during_two_exports)
+    assert CompiledForest.load(output_dir).model_id == exported[-1]
@@ -0,0 +1,69 @@
+"""Register value kernels: the Numba kernel matches the NumPy implementation"""
+
+import numpy as np
+import pytest
+
+import modbus_kernels
+from modbus_features import ENTROPY_BINS, OUTLIER_MIN_READS, _histogram
+from modbus_kernels import STAT_NAMES, histogram_stats_numpy
+
+EXACT = ['min', 'max', 'unique', 'outlier_count']
+
+# Rows without reads give inf - inf bin edges in the NumPy kernel; their stats are masked out
+pytestmark = pytest.mark.filterwarnings('ignore:invalid value encountered:RuntimeWarning')
+
+
+def _segmented_histogram(seed: int):
+    """(row, value, count) histogram as RegisterAggregates keeps it, with edge-case registers"""
+    rng = np.random.default_rng(seed)
+    rows, values = [], []
+    for row in range(60):
+        kind = row % 6
+        if kind == 0:  # Constant register
+            n, register = rng.integers(1, 40), np.full(1, float(rng.integers(0, 1000)))
+        elif kind == 1:  # At or below the outlier threshold
+            n, register = rng.integers(1, OUTLIER_MIN_READS + 1), rng.integers(0, 5, size=3).astype(float)
+        elif kind == 2:  # Mostly stable with spikes: z-score outliers
+            n, register = 200, np.r_[np.full(50, 100.0), [5000.0, -3000.0]]
+        elif kind == 3:  # Row with no reads (evicted or empty)
+            continue
+        else:
+            n, register = rng.integers(2, 300), rng.normal(rng.uniform(-1e3, 1e3), rng.uniform(0.1, 200), 40).round(2)
+        rows.append(np.full(n, row))
+        values.append(rng.choice(register, size=n))
+    rows, values = np.concatenate(rows), np.concatenate(values)
+    hist_rows, hist_values, hist_counts = _histogram(rows, values, np.ones(len(rows)))
+    reads = np.bincount(hist_rows, weights=hist_counts, minlength=60)
+    return hist_rows, hist_values, hist_counts, reads
+
+
+def _assert_same_stats(actual, expected):
+    for name in STAT_NAMES:
+        if name in EXACT:
+            np.testing.assert_array_equal(actual[name], expected[name], err_msg=name)
+        else:
+            np.testing.assert_allclose(actual[name], expected[name], rtol=1e-12, atol=1e-12, err_msg=name)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_loop_matches_numpy(seed):
+    histogram = _segmented_histogram(seed)
+    out = modbus_kernels._histogram_stats_loop(*histogram, ENTROPY_BINS, OUTLIER_MIN_READS)
+    _assert_same_stats(dict(zip(STAT_NAMES, out)), histogram_stats_numpy(*histogram, ENTROPY_BINS, OUTLIER_MIN_READS))
+
+
+@pytest.mark.skipif(modbus_kernels.numba is None, reason='Numba is not installed')
+@pytest.mark.parametrize('seed', range(5))
+def test_numba_matches_numpy(seed):
+    histogram = _segmented_histogram(seed)
+    _assert_same_stats(modbus_kernels.histogram_stats_numba(*histogram, ENTROPY_BINS, OUTLIER_MIN_READS),
+                       histogram_stats_numpy(*histogram, ENTROPY_BINS, OUTLIER_MIN_READS))
+
+
+def test_edge_case_registers_are_covered():
+    hist_rows, hist_values, hist_counts, reads = _segmented_histogram(0)
+    stats = histogram_stats_numpy(hist_rows, hist_values, hist_counts, reads, ENTROPY_BINS, OUTLIER_MIN_READS)
+    assert (stats['unique'][::6] == 1).all() and (stats['std'][::6] == 0).all()
+    assert (stats['max_z'][1::6] == 0).all()
+    assert (stats['outlier_count'][2::6] > 0).all()
+    assert (reads[3::6] == 0).all()
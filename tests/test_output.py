@@ -0,0 +1,33 @@
+"""Anomaly output files of the detector"""
+
+from unittest import mock
+
+import pandas as pd
+
+from detector import write_anomalies
+
+
+def _anomaly(window_id: int, src: str) -> dict:
+    return {'time_window': window_id, 'window_seconds': 60, 'src': src, 'dst': '192.168.0.11',
+            'anomaly_score': -0.7, 'model_id': 'test'}
+
+
+def test_saves_within_one_second_do_not_overwrite(tmp_path):
+    # Freeze the wall clock so both saves fall in the same second
+    frozen = pd.Timestamp('2025-11-08 10:25:00').to_pydatetime()
+    with mock.patch('detector.datetime') as clock:
+        clock.now.return_value = frozen
+        first = write_anomalies(tmp_path, [_anomaly(100, '192.168.0.21')])
+        second = write_anomalies(tmp_path, [_anomaly(100, '192.168.0.22'), _anomaly(100, '192.168.0.23')])
+
+    assert first != second
+    files = sorted(tmp_path.glob('anomalies_*.parquet'))
+    assert len(files) == 2
+    saved = pd.concat([pd.read_parquet(f) for f in files])
+    assert sorted(saved['src']) == ['192.168.0.21', '192.168.0.22', '192.168.0.23']
+
+
+def test_file_name_identifies_window(tmp_path):
+    path = write_anomalies(tmp_path, [_anomaly(5875290, '192.168.0.21')])
+    assert path.name.startswith('anomalies_')
+    assert '_60s_5875290_' in path.name
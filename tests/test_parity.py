@@ -0,0 +1,47 @@
+"""Train/serve parity: training and the detector compute identical features"""
+
+import logging
+import pickle
+
+import pytest
+
+import extract_features
+from benchmark import synthetic_modbus_log
+from feature_library import FEATURE_COLUMNS, KEY_COLUMNS, modbus_features
+from parity import compare, reference_register_features, serving_features
+
+WINDOW_SECONDS = 60
+
+
+def _assert_identical(result):
+    assert result['rows'] > 0
+    assert (result['only_expected'], result['only_actual'], result['mismatches']) == (0, 0, {})
+
+
+@pytest.mark.parametrize('fmt', ['json', 'tsv'])
+def test_offline_and_detector_features_match(tmp_path, fmt):
+    # A model is needed to run the detector; its scores are not compared
+    ensemble = pytest.importorskip('sklearn.ensemble')
+    preprocessing = pytest.importorskip('sklearn.preprocessing')
+
+    log = tmp_path / 'modbus_detailed.log'
+    log.write_bytes(synthetic_modbus_log(6000, fmt=fmt))
+    df = extract_features.load_detailed_logs(str(log))
+
+    registers = extract_features.extract_register_features(df.copy(), WINDOW_SECONDS)
+    offline = extract_features.add_temporal_context(extract_features.aggregate_to_device_pairs(registers))
+    _assert_identical(compare(reference_register_features(df, WINDOW_SECONDS), registers,
+                              ['time_window', 'src', 'dst', 'address'], modbus_features.REGISTER_FEATURES))
+
+    X = offline[FEATURE_COLUMNS].to_numpy(dtype=float)
+    scaler = preprocessing.StandardScaler().fit(X)
+    model = ensemble.IsolationForest(n_estimators=10, random_state=0).fit(scaler.transform(X))
+    model_path = tmp_path / 'anomaly_detector.pkl'
+    model_path.write_bytes(pickle.dumps({'model': model, 'scaler': scaler, 'feature_columns': FEATURE_COLUMNS}))
+
+    logging.disable(logging.WARNING)
+    try:
+        serving = serving_features([log], str(model_path), WINDOW_SECONDS, batch_records=700)
+    finally:
+        logging.disable(logging.NOTSET)
+    _assert_identical(compare(offline, serving, KEY_COLUMNS, FEATURE_COLUMNS))
@@ -0,0 +1,44 @@
+"""JSON log parsers: the Arrow fast path and the reference parser agree"""
+
+import pandas as pd
+
+from parsers import ArrowJsonParser, JsonLinesParser
+
+LINES = [
+    b'{"ts": 1700000000.5, "id.orig_h": "10.0.0.1", "id.resp_h": "10.0.0.2", "address": 40001, '
+    b'"response_values": [3, 7], "extra": {"ignored": true}}',
+    b'{"ts": 1700000001, "id.orig_h": "10.0.0.1", "id.resp_h": "10.0.0.2", "address": 40002}',
+    b'not json at all',
+    b'{"ts": 1700000002, "id.orig_h": "10.0.0.1"',
+    # Mistyped: string address, ISO timestamp, float count, number as host, string register value
+    b'{"ts": 1700000003, "id.orig_h": "10.0.0.1", "id.resp_h": "10.0.0.2", "address": "40003"}',
+    b'{"ts": "2023-11-14T22:13:24Z", "id.orig_h": "10.0.0.1", "id.resp_h": "10.0.0.2", "address": 40004}',
+    b'{"ts": 1700000005, "id.orig_h": 7, "id.resp_h": "10.0.0.2", "quantity": 2.0, '
+    b'"response_values": [1, "2"]}',
+    # Not coercible: becomes null like an unset field
+    b'{"ts": "yesterday", "id.orig_h": "10.0.0.1", "address": "high"}',
+    b'[1, 2, 3]',
+    b'',
+    b'{"ts": 1700000006, "id.orig_h": "10.0.0.3", "id.resp_h": "10.0.0.4", "response_values": []}',
+]
+DATA = b'\n'.join(LINES) + b'\n'
+
+
+def test_arrow_and_reference_parsers_agree_on_mixed_lines():
+    arrow, reference = ArrowJsonParser(), JsonLinesParser()
+    expected = reference.parse(DATA)
+    result = arrow.parse(DATA)
+
+    pd.testing.assert_frame_equal(result, expected)
+    assert arrow.malformed == reference.malformed == 3
+    assert len(result) == 7
+
+
+def test_mistyped_fields_are_coerced_not_dropped():
+    df = ArrowJsonParser().parse(DATA)
+    assert df['address'].tolist()[:4] == [40001, 40002, 40003, 40004]
+    assert df['ts'].iloc[3] == 1700000004.0
+    assert df['src'].iloc[4] == '7'
+    assert df['quantity'].iloc[4] == 2
+    assert list(df['response_values'].iloc[4]) == [1, 2]
+    assert pd.isna(df['ts'].iloc[5]) and pd.isna(df['address'].iloc[5])
@@ -0,0 +1,57 @@
+"""Score cache: scores from known cells and hit/miss accounting per row"""
+
+import numpy as np
+
+from score_cache import ScoreCache
+
+
+class _Version:
+    """Model version that scores by the first feature and counts the rows it scored"""
+
+    model_id = 'm1'
+
+    def __init__(self, n_features: int):
+        self.mean = np.zeros(n_features)
+        self.scale = np.ones(n_features)
+        self.scored = 0
+
+    def score(self, X: np.ndarray) -> np.ndarray:
+        self.scored += len(X)
+        return -np.abs(X[:, 0])
+
+
+def _cache(capacity: int = 100) -> ScoreCache:
+    cache = ScoreCache(capacity, precision=0.1)
+    cache.invalidate(_Version.model_id)
+    return cache
+
+
+def test_rows_sharing_a_new_cell_are_scored_once_and_all_count_as_misses():
+    cache, version = _cache(), _Version(2)
+    X = np.array([[0.5, 1.0], [0.5, 1.0], [0.501, 1.0], [0.9, 2.0]])
+
+    np.testing.assert_array_equal(cache.score(version, X), [-0.5, -0.5, -0.5, -0.9])
+    assert version.scored == 2
+    assert (cache.hits, cache.misses) == (0, 4)
+
+    # Next window: every cell is known
+    np.testing.assert_array_equal(cache.score(version, X[[0, 3, 3]]), [-0.5, -0.9, -0.9])
+    assert version.scored == 2
+    status = cache.get_status()
+    assert (status['hits'], status['misses'], status['hit_rate']) == (3, 4, round(3 / 7, 4))
+
+
+def test_mixed_batch_counts_each_row_once():
+    cache, version = _cache(), _Version(1)
+    cache.score(version, np.array([[0.2]]))
+    cache.score(version, np.array([[0.2], [0.7], [0.7], [0.2]]))
+    assert (cache.hits, cache.misses) == (2, 3)
+    assert cache.hits + cache.misses == 5
+
+
+def test_other_model_and_non_finite_rows_bypass_the_cache():
+    cache, version = _cache(), _Version(1)
+    version.model_id = 'm2'
+    cache.score(version, np.array([[0.2], [0.2]]))
+    cache.score(_Version(1), np.array([[np.nan]]))
+    assert (cache.hits, cache.misses) == (0, 0) and cache.get_status()['hit_rate'] is None
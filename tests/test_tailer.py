@@ -0,0 +1,80 @@
+"""Log tailer: truncation, refill and checkpoint restore"""
+
+import os
+
+from tailer import LogTailer
+
+
+def _lines(prefix: str, n: int) -> bytes:
+    return b''.join(f'{{"ts": {i}, "src": "{prefix}"}}\n'.encode() for i in range(n))
+
+
+def _rewrite(path, content: bytes):
+    """copytruncate: same inode, new content"""
+    with open(path, 'r+b') as f:
+        f.truncate(0)
+        f.write(content)
+
+
+def test_truncate_refilled_past_offset_restarts_from_head(tmp_path):
+    log = tmp_path / 'modbus_detailed.log'
+    log.write_bytes(_lines('old', 10))
+    tailer = LogTailer(log, start_at_end=False, use_inotify=False)
+    assert tailer.read().count(b'\n') == 10
+
+    # More new content than the old offset before the next read
+    new = _lines('new', 30)
+    _rewrite(log, new)
+    assert os.path.getsize(log) > tailer.position
+
+    assert tailer.read() == new
+    tailer.close()
+
+
+def test_size_drop_is_a_reset_even_ahead_of_offset(tmp_path):
+    log = tmp_path / 'modbus_detailed.log'
+    log.write_bytes(_lines('a', 5))
+    tailer = LogTailer(log, start_at_end=False, use_inotify=False)
+    tailer.read()
+    with open(log, 'ab') as f:
+        f.write(_lines('b', 50))
+    tailer.read(max_bytes=64)  # Size seen, most of it not read yet
+
+    rewritten = _lines('c', 20)
+    _rewrite(log, rewritten)
+    assert tailer.read() == rewritten
+    tailer.close()
+
+
+def test_restore_does_not_resume_a_rewritten_file(tmp_path):
+    log = tmp_path / 'modbus_detailed.log'
+    log.write_bytes(_lines('old', 10))
+    tailer = LogTailer(log, start_at_end=False, use_inotify=False)
+    tailer.read()
+    state = tailer.state()
+    tailer.close()
+
+    new = _lines('new', 30)
+    _rewrite(log, new)
+
+    restored = LogTailer(log, start_at_end=True, use_inotify=False)
+    assert not restored.restore(state)
+    assert restored.read() == new
+    restored.close()
+
+
+def test_restore_resumes_an_appended_file(tmp_path):
+    log = tmp_path / 'modbus_detailed.log'
+    log.write_bytes(_lines('old', 10))
+    tailer = LogTailer(log, start_at_end=False, use_inotify=False)
+    tailer.read()
+    state = tailer.state()
+    tailer.close()
+
+    with open(log, 'ab') as f:
+        f.write(_lines('more', 3))
+
+    restored = LogTailer(log, start_at_end=True, use_inotify=False)
+    assert restored.restore(state)
+    assert restored.read() == _lines('more', 3)
+    restored.close()
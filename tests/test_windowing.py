@@ -0,0 +1,71 @@
+"""Event-time windowing across several sources"""
+
+from unittest import mock
+
+import numpy as np
+
+from windowing import EventTimeWindower, WindowRecords
+
+
+def _records(ts: np.ndarray, src: str) -> WindowRecords:
+    n = len(ts)
+    return WindowRecords(ts=ts.astype(np.float64), src=np.full(n, src, dtype=object),
+                         dst=np.full(n, '192.168.0.11', dtype=object),
+                         address=np.zeros(n), value=np.arange(n, dtype=np.float64))
+
+
+def _reads(windows) -> int:
+    return sum(aggregates.reads for _, aggregates in windows)
+
+
+def test_fast_source_does_not_drop_slow_source_records():
+    windower = EventTimeWindower(window_seconds=60, allowed_lateness=10, idle_timeout=60)
+    windower.expect_sources(['fast.log', 'slow.log'])
+    fast_ts = np.arange(0, 3600, 0.5)  # Large backlog, read in big batches
+    slow_ts = np.arange(0, 3600, 2.0)  # Same hour, read in small batches
+
+    closed = []
+    fast_batches = np.array_split(fast_ts, 20)
+    slow_batches = np.array_split(slow_ts, 200)
+    for i, slow in enumerate(slow_batches):
+        if i < len(fast_batches):
+            closed += windower.add(_records(fast_batches[i], '192.168.0.21'),
+                                   {'fast.log': float(fast_batches[i].max())})
+        closed += windower.add(_records(slow, '192.168.0.22'), {'slow.log': float(slow.max())})
+    closed += windower.flush()
+
+    assert windower.late_records == 0
+    assert _reads(closed) == len(fast_ts) + len(slow_ts)
+    assert [window_id for window_id, _ in closed] == list(range(60))
+
+
+def test_watermark_follows_slowest_active_source():
+    windower = EventTimeWindower(window_seconds=60, allowed_lateness=10, idle_timeout=60)
+    with mock.patch('windowing.time.monotonic', return_value=1000.0):
+        windower.add(_records(np.array([500.0]), 'a'), {'a.log': 500.0})
+        windower.add(_records(np.array([100.0]), 'b'), {'b.log': 100.0})
+        assert windower.watermark == 90.0
+
+    # b.log has been silent for longer than the idle timeout: a.log alone moves the watermark
+    with mock.patch('windowing.time.monotonic', return_value=1061.0):
+        windower.add(_records(np.array([600.0]), 'a'), {'a.log': 600.0})
+        assert windower.watermark == 590.0
+
+
+def test_expected_source_holds_watermark_until_idle():
+    windower = EventTimeWindower(window_seconds=60, allowed_lateness=10, idle_timeout=60)
+    with mock.patch('windowing.time.monotonic', return_value=1000.0):
+        windower.expect_sources(['a.log', 'b.log'])
+        assert windower.add(_records(np.arange(0, 300, 1.0), 'a'), {'a.log': 299.0}) == []
+        assert windower.watermark is None
+
+    with mock.patch('windowing.time.monotonic', return_value=1061.0):
+        closed = windower.add(_records(np.array([300.0]), 'a'), {'a.log': 300.0})
+    assert [window_id for window_id, _ in closed] == [0, 1, 2, 3]
+
+
+def test_single_source_watermark_unchanged():
+    windower = EventTimeWindower(window_seconds=60, allowed_lateness=10, idle_timeout=None)
+    closed = windower.add(_records(np.arange(0, 200, 1.0), 'a'))
+    assert windower.watermark == 189.0
+    assert [window_id for window_id, _ in closed] == [0, 1, 2]
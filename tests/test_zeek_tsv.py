@@ -0,0 +1,47 @@
+"""Zeek TSV logs: training and the detector decode them identically"""
+
+import pandas as pd
+import pyarrow as pa
+
+import extract_features
+from parsers import COLUMN_RENAMES, ZeekTsvParser
+
+HEADER = (
+    '#separator \\x09\n'
+    '#set_separator\t,\n'
+    '#empty_field\t(empty)\n'
+    '#unset_field\t-\n'
+    '#fields\tts\tid.orig_h\tid.resp_h\tid.resp_p\tis_orig\taddress\tresponse_values\n'
+    '#types\ttime\taddr\taddr\tport\tbool\tcount\tvector[count]\n'
+)
+ROWS = (
+    '1700000000.5\t10.0.0.1\t10.0.0.2\t502\tT\t40001\t3,7\n'
+    '1700000001.0\t10.0.0.1\t10.0.0.2\t502\tF\t-\t(empty)\n'
+    '1700000002.0\t10.0.0.1\t10.0.0.2\t502\t-\t40002\t-\n'
+    'truncated row\n'
+)
+# A rotated log appends a second header block; #close ends each block
+LOG = HEADER + ROWS + '#close\t2023-11-14-22-13-24\n' + HEADER + ROWS
+
+
+def test_training_loader_matches_detector_parser(tmp_path):
+    log = tmp_path / 'modbus_detailed.log'
+    log.write_text(LOG)
+
+    training = extract_features.load_zeek_tsv(log).rename(columns=COLUMN_RENAMES)
+    parser = ZeekTsvParser()
+    detector = parser.parse(log.read_bytes())
+
+    pd.testing.assert_frame_equal(training, detector)
+    assert len(detector) == 6 and parser.malformed == 2
+    assert detector['is_orig'].tolist()[:3] == [True, False, None]
+    assert pa.array(detector['response_values'][:3]).to_pylist() == [[3, 7], [], None]
+
+
+def test_whole_file_read_in_chunks_matches_one_buffer(tmp_path):
+    log = tmp_path / 'modbus_detailed.log'
+    log.write_text(LOG)
+
+    chunked = extract_features.modbus_features.ZeekTsvReader().read_file(log, chunk_bytes=64)
+    whole = ZeekTsvParser().parse_table(log.read_bytes())
+    assert chunked.equals(whole)